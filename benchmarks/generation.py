@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+"""
+Benchmarks of user agent generation, same as `ua bench` command
+
+    python benchmarks/generation.py -n 10000 -o results.json
+    python benchmarks/generation.py -n 10000 -b results.json
+"""
+from user_agent.bench import main
+
+if __name__ == "__main__":
+    main()
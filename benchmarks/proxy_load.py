@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Throughput and added latency of `ua proxy`
+
+Starts local upstream stub server and the proxy in the same event loop,
+then sends the same load directly to the stub and through the proxy:
+
+    python benchmarks/proxy_load.py --connections 20 --requests 20000
+"""
+from argparse import ArgumentParser
+import asyncio
+import time
+
+from user_agent.proxy import UserAgentProxy
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok"
+
+
+async def handle_upstream(reader, writer):
+    try:
+        while True:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(RESPONSE)
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+        writer.close()
+
+
+async def worker(port, target, num_requests, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = b"GET %s HTTP/1.1\r\nHost: stub\r\nUser-Agent: bench\r\n\r\n" % target
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        writer.write(request)
+        await reader.readuntil(b"\r\n\r\n")
+        await reader.readexactly(2)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def measure(name, port, target, opts):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            worker(port, target, opts.requests // opts.connections, latencies)
+            for _ in range(opts.connections)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        "%s: %.0f req/sec, p50 %.3f ms, p99 %.3f ms"
+        % (
+            name,
+            len(latencies) / elapsed,
+            latencies[len(latencies) // 2] * 1000,
+            latencies[len(latencies) * 99 // 100] * 1000,
+        )
+    )
+
+
+async def run(opts):
+    upstream = await asyncio.start_server(handle_upstream, "127.0.0.1", 0)
+    up_port = upstream.sockets[0].getsockname()[1]
+    proxy = UserAgentProxy(sticky=opts.sticky)
+    proxy_server = await proxy.start("127.0.0.1", 0)
+    proxy_port = proxy_server.sockets[0].getsockname()[1]
+    await measure("direct", up_port, b"/", opts)
+    await measure(
+        "proxy", proxy_port, b"http://127.0.0.1:%d/" % up_port, opts
+    )
+    print("upstream connections opened: %d" % proxy.stats["upstream_connections"])
+    proxy.close_idle()
+    proxy_server.close()
+    upstream.close()
+    await asyncio.sleep(0.1)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("-c", "--connections", type=int, default=20)
+    parser.add_argument("-n", "--requests", type=int, default=20000)
+    parser.add_argument("-s", "--sticky", default="connection")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
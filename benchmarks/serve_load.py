@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Load test of `ua serve` service
+
+Start the service with `ua serve` then run:
+
+    python benchmarks/serve_load.py --port 8000 --connections 50 --requests 100000
+
+Every connection sends requests one by one over keep-alive connection.
+"""
+from argparse import ArgumentParser
+import asyncio
+import time
+
+
+async def worker(host, port, path, num_requests, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = ("GET %s HTTP/1.1\r\nHost: %s\r\n\r\n" % (path, host)).encode()
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        writer.write(request)
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def run(opts):
+    latencies = []
+    per_conn = opts.requests // opts.connections
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            worker(opts.host, opts.port, opts.path, per_conn, latencies)
+            for _ in range(opts.connections)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print("requests: %d" % len(latencies))
+    print("elapsed: %.2f sec" % elapsed)
+    print("throughput: %.0f req/sec" % (len(latencies) / elapsed))
+    for perc in (50, 90, 99):
+        idx = min(len(latencies) - 1, len(latencies) * perc // 100)
+        print("p%d latency: %.3f ms" % (perc, latencies[idx] * 1000))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8000)
+    parser.add_argument("--path", default="/?os=win,linux&navigator=chrome")
+    parser.add_argument("-c", "--connections", type=int, default=50)
+    parser.add_argument("-n", "--requests", type=int, default=100000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+import io
+from random import Random
+
+import pytest
+
+from user_agent import base
+from user_agent.anonymize import Anonymizer, anonymize_log, main
+from user_agent.learn import (
+    classify_user_agent, extract_user_agent, find_user_agent)
+
+LINE = '10.0.0.%d - - [10/Oct/2020:13:55:36 +0000] "GET / HTTP/1.1" 200 5 "-" "%s"\n'
+AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+         ' (KHTML, like Gecko) Chrome/80.0.3987.149 Safari/537.36')
+
+
+def build_log(count):
+    rng = Random(1)
+    agents = [x['user_agent'] for x in
+              base.generate_batch(50, device_type='all', rng=rng)]
+    agents += ['curl/7.68.0', '-']
+    return ''.join(LINE % (idx % 256, rng.choice(agents))
+                   for idx in range(count))
+
+
+def test_anonymizer_consistent():
+    anonymizer = Anonymizer('secret', cache_size=10)
+    navs = base.generate_batch(100, device_type='all', rng=Random(2))
+    for nav in navs:
+        fake = anonymizer.replace(nav['user_agent'])
+        assert fake != nav['user_agent']
+        assert classify_user_agent(fake)[:3] == \
+            classify_user_agent(nav['user_agent'])[:3]
+        assert Anonymizer('secret').replace(nav['user_agent']) == fake
+    assert len(anonymizer._cache) == 10 # pylint: disable=protected-access
+    agent = navs[0]['user_agent']
+    assert Anonymizer('other').replace(agent) != anonymizer.replace(agent)
+    assert anonymizer.replace('-') == '-'
+    assert classify_user_agent(anonymizer.replace('curl/7.68.0'))[0] == \
+        'desktop'
+
+
+def test_anonymize_log(tmpdir):
+    data = build_log(500)
+    source = tmpdir.join('access.log')
+    source.write_binary(data.encode('utf-8')
+                        + b'\xff - - [x] "GET /\xff" 200 5 "-" "Wget/1.20"\r\n')
+    target = tmpdir.join('shared.log')
+    assert anonymize_log(str(source), str(target), key='k', jobs=1,
+                         chunk_size=1000) == 501
+    res = target.read_binary()
+    assert res.endswith(b'\r\n')
+    assert b'\n\xff - - [x] "GET /\xff" 200 5 "-" "' in res
+    assert b'Wget' not in res
+    lines = res.decode('utf-8', 'replace').splitlines()
+    mapping = {}
+    for orig, line in zip(data.splitlines(), lines):
+        assert orig.rsplit('"', 2)[0] == line.rsplit('"', 2)[0]
+        real, fake = extract_user_agent(orig), extract_user_agent(line)
+        assert mapping.setdefault(real, fake) == fake
+        if real != '-':
+            assert fake != real
+    assert mapping['-'] == '-'
+
+    pytest.importorskip('concurrent.futures')
+    out = io.BytesIO()
+    anonymize_log(io.BytesIO(data.encode('utf-8')), out, key='k', jobs=2,
+                  chunk_size=1000)
+    assert out.getvalue().decode('utf-8').splitlines() == lines[:500]
+
+
+def test_log_formats():
+    anonymizer = Anonymizer('k')
+    # combined format with X-Forwarded-For appended
+    xff = ('10.0.0.1 - - [10/Oct/2020:13:55:36 +0000] "GET / HTTP/1.1"'
+           ' 200 5 "-" "%s" "203.0.113.7, 10.0.0.2"\n' % AGENT)
+    # common log format has no user agent
+    common = '10.0.0.1 - - [10/Oct/2020:13:55:36 +0000] "GET / HTTP/1.1" 200 5\n'
+    unquoted = '%s\n' % AGENT
+    escaped = ('10.0.0.1 - - [10/Oct/2020:13:55:36 +0000] "GET / HTTP/1.1"'
+               ' 200 5 "-" "%s \\"x\\"" "-"\n' % AGENT)
+    assert extract_user_agent(xff) == AGENT
+    assert find_user_agent(common) is None
+    assert find_user_agent(unquoted) is None
+    assert extract_user_agent(escaped) == AGENT + ' \\"x\\"'
+    res = anonymizer.anonymize_lines(
+        [x.encode('utf-8') for x in (xff, common, unquoted, escaped)])
+    res = [x.decode('utf-8') for x in res]
+    assert res[0].endswith('" "203.0.113.7, 10.0.0.2"\n')
+    assert AGENT not in res[0]
+    assert classify_user_agent(extract_user_agent(res[0]))[:3] == \
+        ('desktop', 'win', 'chrome')
+    assert res[1:3] == [common, unquoted]
+    assert res[3].endswith('" "-"\n')
+    assert AGENT not in res[3]
+    # other field index
+    line = '"%s" 10.0.0.1 "GET /"\n' % AGENT
+    assert extract_user_agent(line, 1) == AGENT
+    fake = Anonymizer('k', field=1).anonymize_lines([line.encode('utf-8')])[0]
+    assert fake.endswith(b'" 10.0.0.1 "GET /"\n')
+    assert AGENT.encode('utf-8') not in fake
+
+
+def test_cli(tmpdir):
+    source = tmpdir.join('access.log')
+    source.write(build_log(20))
+    target = tmpdir.join('shared.log')
+    main([str(source), str(target), '--key', 'k', '--jobs', '1'])
+    out = io.BytesIO()
+    anonymize_log(str(source), out, key='k', jobs=1)
+    assert target.read_binary() == out.getvalue()
@@ -0,0 +1,47 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+import json
+from subprocess import check_output
+
+import pytest
+
+pytest.importorskip('tracemalloc')
+from user_agent.bench import run_benchmarks, compare_results # noqa pylint: disable=wrong-import-position
+
+
+def test_run_benchmarks():
+    res = run_benchmarks(number=20)
+    names = set(res['results'])
+    assert 'generate_navigator[desktop-win-ie]' in names
+    assert 'generate_navigator_js[tablet-android-chrome]' in names
+    assert 'stage:fix_chrome_mac_platform' in names
+    assert 'stage:format_template[firefox]' in names
+    for item in res['results'].values():
+        assert item['calls'] == 20
+        assert item['p50_ns'] <= item['p99_ns']
+        assert item['ops_per_sec'] > 0
+    assert res['memory_per_profile']['generate_navigator'] > 0
+
+
+def test_compare_results():
+    res = run_benchmarks(number=10, pattern='stage:get_', memory=False)
+    assert len(res['results']) == 3
+    baseline = json.loads(json.dumps(res))
+    name = 'stage:get_chrome_build'
+    baseline['results'][name]['ops_per_sec'] *= 2
+    rows, regressions = compare_results(res, baseline)
+    assert regressions == [name]
+    assert rows[0][0] == name
+    assert abs(rows[0][3] + 0.5) < 1e-9
+
+
+def test_ua_bench_script(tmpdir):
+    path = str(tmpdir.join('res.json'))
+    check_output(['ua', 'bench', '-n', '10', '-k', 'stage:get_ie',
+                  '--no-memory', '-o', path])
+    with open(path) as inp:
+        data = json.load(inp)
+    assert list(data['results']) == ['stage:get_ie_build']
+    out = check_output(['ua', 'bench', '-n', '10', '-k', 'stage:get_ie',
+                        '--no-memory', '-b', path, '--threshold', '100'])
+    assert b'Comparison with' in out
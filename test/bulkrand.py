@@ -0,0 +1,77 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+from collections import Counter
+
+import pytest
+
+from user_agent import base, generate_navigator, generate_batch
+from user_agent.bulkrand import BulkRandom
+
+
+def test_reproducible():
+    values = [BulkRandom(5).randrange(1000) for _ in range(3)]
+    assert values[0] == values[1] == values[2]
+    first, second = BulkRandom(5, block_size=16), BulkRandom(5, block_size=16)
+    assert ([first.randint(1, 6) for _ in range(100)]
+            == [second.randint(1, 6) for _ in range(100)])
+    assert generate_navigator(rng=BulkRandom(7)) == \
+        generate_navigator(rng=BulkRandom(7))
+
+
+def test_state_restored_inside_block():
+    rng = BulkRandom(1, block_size=8)
+    for _ in range(13):
+        rng.random()
+    state = rng.getstate()
+    values = [rng.randbelow(100) for _ in range(30)]
+    rng.setstate(state)
+    assert [rng.randbelow(100) for _ in range(30)] == values
+    with pytest.raises(ValueError):
+        BulkRandom(1, block_size=16).setstate(state)
+
+
+def test_bounds():
+    rng = BulkRandom(2, block_size=32)
+    counts = Counter(rng.randbelow_many(3, 30000))
+    assert sorted(counts) == [0, 1, 2]
+    assert all(9000 < x < 11000 for x in counts.values())
+    values = rng.randbelow_each([1, 2, 5, 1000] * 100)
+    assert all(x < y for x, y in zip(values, [1, 2, 5, 1000] * 100))
+    assert all(0 <= x < 1 for x in rng.random_many(100))
+    assert 0 <= rng.randbelow(2 ** 70) < 2 ** 70
+    assert rng.randrange(10, 12) in (10, 11)
+    assert rng.randrange(0, 10, 5) in (0, 5)
+    with pytest.raises(ValueError):
+        rng.randbelow(0)
+    with pytest.raises(ValueError):
+        rng.randrange(5, 5)
+    with pytest.raises(IndexError):
+        rng.choice([])
+
+
+def test_random_methods():
+    rng = BulkRandom(3)
+    items = list(range(10))
+    rng.shuffle(items)
+    assert sorted(items) == list(range(10))
+    assert len(set(rng.sample(range(100), 10))) == 10
+    assert rng.getrandbits(64) < 2 ** 64
+    assert rng.getrandbits(100) < 2 ** 100
+
+
+def test_generate_batch():
+    batch = generate_batch(300, device_type='all', rng=BulkRandom(11))
+    assert batch == generate_batch(300, device_type='all', rng=BulkRandom(11))
+    assert len(batch) == 300
+    assert set(x['os_id'] for x in batch) == set(['win', 'mac', 'linux',
+                                                  'android'])
+    for nav in batch:
+        if nav['navigator_id'] == 'chrome' and nav['os_id'] == 'mac':
+            ver, minor = nav['oscpu'].rsplit(' ', 1)[1].rsplit('_', 1)
+            low, high = base.MACOSX_CHROME_BUILD_RANGE[ver.replace('_', '.')]
+            assert low <= int(minor) < high
+    # random module has no bulk methods
+    assert len(generate_batch(10, navigator='firefox', version_decay=300)) == 10
+    batch = generate_batch(50, navigator='ie', version_decay=300,
+                           rng=BulkRandom(1))
+    assert all(x['navigator_id'] == 'ie' for x in batch)
@@ -0,0 +1,68 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+import io
+
+import pytest
+
+from user_agent import generate_batch, InvalidOption
+from user_agent.bulkrand import BulkRandom
+from user_agent.error import InvalidData
+from user_agent.export import (export_navigators, read_columns,
+                               ColumnarWriter, FIELDS)
+
+
+def get_rows(groups):
+    return [dict((x, group[x][idx]) for x in group)
+            for group in groups for idx in range(len(group['os_id']))]
+
+
+def test_export_read(tmpdir):
+    path = str(tmpdir.join('navs.uac'))
+    export_navigators(path, 250, row_group_size=100, rng=BulkRandom(1),
+                      device_type='all')
+    groups = list(read_columns(path))
+    assert [len(x['user_agent']) for x in groups] == [100, 100, 50]
+    assert set(groups[0]) == set(FIELDS)
+    rng = BulkRandom(1)
+    expected = []
+    for count in (100, 100, 50):
+        expected.extend(generate_batch(count, rng=rng, device_type='all'))
+    assert get_rows(groups) == expected
+
+
+def test_dictionary_encoding():
+    navs = generate_batch(1000, navigator='ie')
+    out = io.BytesIO()
+    writer = ColumnarWriter(out, fields=('navigator_id', 'product_sub',
+                                         'build_id', 'app_name'))
+    writer.write_many(navs)
+    writer.close()
+    # one dictionary value, 2-byte codes
+    assert len(out.getvalue()) < 1000 * (2 + 2 + 4 + 2) + 200
+    out.seek(0)
+    group = next(read_columns(out))
+    assert group['navigator_id'] == ['ie'] * 1000
+    assert group['product_sub'] == [None] * 1000
+    assert group['build_id'] == [None] * 1000
+
+
+def test_invalid():
+    with pytest.raises(InvalidData):
+        list(read_columns(io.BytesIO(b'XXXX')))
+    out = io.BytesIO()
+    export_navigators(out, 10)
+    with pytest.raises(InvalidData):
+        list(read_columns(io.BytesIO(out.getvalue()[:-1])))
+    with pytest.raises(InvalidOption):
+        export_navigators(io.BytesIO(), 10, os='win', navigator='safari')
+    with pytest.raises(ValueError):
+        export_navigators(io.BytesIO(), 10, fmt='csv')
+
+
+def test_parquet(tmpdir):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmpdir.join('navs.parquet'))
+    export_navigators(path, 300, fmt='parquet', row_group_size=100)
+    table = parquet.read_table(path)
+    assert table.num_rows == 300
+    assert str(table.schema.field('os_id').type).startswith('dictionary')
@@ -0,0 +1,71 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+
+from random import Random
+
+from user_agent import (
+    generate_navigator, generate_user_agent, generate_navigator_js, base)
+from user_agent.instrument import (
+    enable_instrumentation, disable_instrumentation, get_snapshot,
+    reset_instrumentation, format_prometheus, STAGES)
+
+
+def test_instrumentation_disabled():
+    assert base._INSTRUMENTATION is None # pylint: disable=protected-access
+    generate_user_agent()
+    assert get_snapshot() == {}
+
+
+def test_instrumentation_counts():
+    enable_instrumentation()
+    try:
+        for _ in range(10):
+            generate_user_agent(os='linux', navigator='chrome')
+        for _ in range(5):
+            nav = generate_navigator_js(os='win', navigator='ie')
+            assert nav['userAgent'].startswith('Mozilla/5.0')
+        snap = get_snapshot()
+        assert set(snap) == set(STAGES)
+        assert snap['render']['desktop-linux-chrome']['calls'] == 10
+        assert snap['choose_variant']['desktop-win-ie']['calls'] == 5
+        assert snap['render']['desktop-win-ie']['total_ns'] > 0
+        reset_instrumentation()
+        assert get_snapshot() == dict((x, {}) for x in STAGES)
+    finally:
+        disable_instrumentation()
+    assert base._INSTRUMENTATION is None # pylint: disable=protected-access
+
+
+def test_instrumentation_same_configs():
+    expected = [generate_navigator(rng=Random(x), device_type='all')
+                for x in range(20)]
+    enable_instrumentation()
+    try:
+        res = [generate_navigator(rng=Random(x), device_type='all')
+               for x in range(20)]
+    finally:
+        disable_instrumentation()
+    assert res == expected
+
+
+def test_instrumentation_callback():
+    calls = []
+    enable_instrumentation(callback=lambda *args: calls.append(args))
+    try:
+        generate_user_agent(os='mac', navigator='firefox')
+    finally:
+        disable_instrumentation()
+    assert len(calls) == 1
+    variant, timings = calls[0]
+    assert variant == 'desktop-mac-firefox'
+    assert [x[0] for x in timings] == list(STAGES)
+
+
+def test_format_prometheus():
+    snap = {'format': {'desktop-win-ie': {'calls': 3, 'total_ns': 900}}}
+    text = format_prometheus(snap)
+    assert ('user_agent_stage_calls_total{stage="format",'
+            'variant="desktop-win-ie"} 3') in text
+    assert ('user_agent_stage_duration_nanoseconds_total{stage="format",'
+            'variant="desktop-win-ie"} 900') in text
+    assert '# TYPE user_agent_stage_calls_total counter' in text
@@ -0,0 +1,82 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+from datetime import date, timedelta
+import json
+import os
+
+import pytest
+
+from user_agent import base, generate_navigator
+from user_agent.bulkrand import BulkRandom
+from user_agent.error import InvalidData
+from user_agent.journal import (ProfileGenerator, read_journal,
+                                replay_journal, get_tables_fingerprint,
+                                RECORD, HEADER_SIZE)
+
+
+def test_same_as_generate_navigator():
+    rng = BulkRandom(3)
+    gen = ProfileGenerator(seed=3, device_type='all')
+    assert [next(gen) for _ in range(50)] == \
+        [generate_navigator(device_type='all', rng=rng) for _ in range(50)]
+
+
+def test_checkpoint_restore(tmpdir):
+    path = str(tmpdir.join('run.uaj'))
+    gen = ProfileGenerator(seed=5, journal=path, device_type='all',
+                           min_chrome=80)
+    first = [next(gen) for _ in range(100)]
+    state = json.loads(json.dumps(gen.checkpoint()))
+    expected = [next(gen) for _ in range(30)]
+    gen.close()
+    assert os.path.getsize(path) == HEADER_SIZE + 130 * RECORD.size
+    assert RECORD.size <= 11
+
+    gen = ProfileGenerator.restore(state, journal=path)
+    assert gen.position == 100
+    # records written after the checkpoint are removed
+    assert os.path.getsize(path) == HEADER_SIZE + 100 * RECORD.size
+    assert [next(gen) for _ in range(30)] == expected
+    gen.close()
+    assert list(replay_journal(path)) == first + expected
+    assert len(list(read_journal(path))) == 130
+
+
+def test_checkpoint_release_window():
+    gen = ProfileGenerator(seed=2, as_of=date(2020, 6, 1),
+                           max_age=timedelta(days=90), version_decay=30)
+    next(gen)
+    state = json.loads(json.dumps(gen.checkpoint()))
+    assert state['filters']['as_of'] == '2020-06-01'
+    assert state['filters']['max_age'] == 90 * 86400
+    expected = [next(gen) for _ in range(20)]
+    gen = ProfileGenerator.restore(state)
+    assert [next(gen) for _ in range(20)] == expected
+    # window without as_of is fixed at creation
+    gen = ProfileGenerator(seed=2, max_age=timedelta(days=90))
+    state = json.loads(json.dumps(gen.checkpoint()))
+    assert state['filters']['as_of']
+    state['filters']['max_age'] = 'x'
+    with pytest.raises(InvalidData):
+        ProfileGenerator.restore(state)
+
+
+def test_tables_changed(tmpdir, monkeypatch):
+    path = str(tmpdir.join('run.uaj'))
+    gen = ProfileGenerator(seed=1, journal=path)
+    next(gen)
+    state = gen.checkpoint()
+    gen.close()
+    fingerprint = get_tables_fingerprint()
+    monkeypatch.setattr(base, 'CHROME_BUILD', base.CHROME_BUILD[:-1])
+    assert get_tables_fingerprint() != fingerprint
+    with pytest.raises(InvalidData):
+        ProfileGenerator.restore(state)
+    with pytest.raises(InvalidData):
+        list(replay_journal(path))
+    monkeypatch.undo()
+    assert get_tables_fingerprint() == fingerprint
+    assert len(list(replay_journal(path))) == 1
+    state['position'] = 10
+    with pytest.raises(InvalidData):
+        ProfileGenerator.restore(state, journal=path)
@@ -0,0 +1,143 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+from collections import Counter
+import io
+import json
+from random import Random
+
+import pytest
+
+from user_agent import generate_navigator, base
+from user_agent.bulkrand import BulkRandom
+from user_agent.error import InvalidOption
+from user_agent.learn import (
+    classify_user_agent, learn_weights, load_weights, main, LogLearner)
+from user_agent.metrics import enable_metrics, disable_metrics
+
+
+def test_learner_matches_metrics():
+    registry = enable_metrics()
+    try:
+        rng = Random(1)
+        navs = [generate_navigator(device_type='all', rng=rng)
+                for _ in range(3000)]
+        snap = registry.snapshot()
+    finally:
+        disable_metrics()
+    learner = LogLearner(cache_size=100)
+    for nav in navs:
+        learner.add(nav['user_agent'])
+    res = learner.result()
+    assert res['total'] == 3000
+    assert res['unclassified'] == 0
+    for key in ('variant', 'platform_version', 'build_version'):
+        assert res[key] == snap[key]
+
+
+def test_classify_user_agent():
+    assert classify_user_agent(
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        ' (KHTML, like Gecko) Chrome/80.0.3987.149 Safari/537.36'
+    ) == ('desktop', 'win', 'chrome', 'Windows NT 10.0', '80')
+    assert classify_user_agent(
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:81.0)'
+        ' Gecko/20100101 Firefox/81.0'
+    ) == ('desktop', 'mac', 'firefox', 'Macintosh; Intel Mac OS X 10.15',
+          '81')
+    assert classify_user_agent(
+        'Mozilla/5.0 (Windows NT 6.1; Trident/7.0; rv:11.0) like Gecko'
+    ) == ('desktop', 'win', 'ie', 'Windows NT 6.1', 'MSIE 11.0')
+    assert classify_user_agent(
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        ' (KHTML, like Gecko) Chrome/80.0.3987.149 Safari/537.36'
+        ' Edg/80.0.361.69'
+    ) is None
+    assert classify_user_agent(
+        'Mozilla/5.0 (iPhone; CPU iPhone OS 13_3 like Mac OS X)'
+        ' AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148'
+    ) is None
+    assert classify_user_agent('curl/7.68.0') is None
+
+
+def test_learn_from_log(tmpdir):
+    log = tmpdir.join('access.log')
+    chrome = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36'
+              ' (KHTML, like Gecko) Chrome/81.0.4044.92 Safari/537.36')
+    firefox = ('Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:80.0)'
+               ' Gecko/20100101 Firefox/80.0')
+    line = ('127.0.0.1 - - [10/Oct/2020:13:55:36 +0000] "GET / HTTP/1.1"'
+            ' 200 2326 "-" "%s"\n')
+    log.write(line % chrome * 3 + line % firefox + line % 'curl/7.68.0'
+              + 'garbage "\n')
+    out = tmpdir.join('weights.json')
+    main([str(log), '-o', str(out)])
+    res = json.loads(out.read())
+    assert res == learn_weights([io.StringIO(log.read_text('utf-8'))])
+    assert res['total'] == 5
+    assert res['unclassified'] == 1
+    assert res['variant'] == {'desktop-linux-chrome': 3,
+                              'desktop-linux-firefox': 1}
+    assert res['platform_version'] == {
+        'linux': {'X11; Linux': 3, 'X11; Ubuntu; Linux': 1}}
+    assert res['build_version'] == {'chrome': {'81': 3},
+                                    'firefox': {'80': 1}}
+
+    weights = load_weights(str(out))
+    assert set(weights) == {'variant', 'build_version'}
+    navs = [generate_navigator(weights=weights) for _ in range(50)]
+    assert set(x['os_id'] for x in navs) == {'linux'}
+    assert set(x['build_version'] for x in navs
+               if x['navigator_id'] == 'firefox') <= {'80.0', '80.0.1'}
+    assert set(x['build_version'].split('.')[0] for x in navs
+               if x['navigator_id'] == 'chrome') <= {'81'}
+
+
+def test_learn_versions_out_of_tables():
+    learner = LogLearner()
+    learner.add('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+                ' (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    learner.add('Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0)'
+                ' Gecko/20100101 Firefox/121.0')
+    learner.add('Mozilla/5.0 (compatible; MSIE 7.0; Windows NT 5.1;'
+                ' Trident/4.0)')
+    res = learner.result()
+    newest_chrome = str(base.CHROME_BUILD[-1][0])
+    newest_firefox = base.FIREFOX_VERSION[-1][0].split('.')[0]
+    assert res['build_version'] == {'chrome': {newest_chrome: 1},
+                                    'firefox': {newest_firefox: 1},
+                                    'ie': {'MSIE 8.0': 1}}
+    weights = {'build_version': res['build_version']}
+    nav = generate_navigator(weights=weights, navigator='firefox')
+    assert nav['build_version'].split('.')[0] == newest_firefox
+
+
+def test_weights_option():
+    weights = {'variant': {'desktop-win-chrome': 3, 'desktop-linux-chrome': 1},
+               'build_version': {'chrome': {'80': 1, '81': 1}}}
+    rng = Random(3)
+    counts = Counter(
+        generate_navigator(weights=weights, rng=rng)['os_id']
+        for _ in range(2000))
+    assert set(counts) == {'win', 'linux'}
+    assert 0.7 < counts['win'] / 2000.0 < 0.8
+    batch = base.generate_batch(500, rng=BulkRandom(1), weights=weights)
+    assert set(x['build_version'].split('.')[0] for x in batch) == \
+        {'80', '81'}
+    # versions excluded by filters leave no variant
+    with pytest.raises(InvalidOption):
+        generate_navigator(weights=weights, min_chrome=82)
+    # weights combine with other filters
+    assert generate_navigator(weights=weights, os='linux')['os_id'] == 'linux'
+
+
+def test_weights_option_invalid():
+    for value in ({'foo': {}}, {'variant': {'desktop-win-chrome': -1}},
+                  {'variant': []}, {'build_version': {'chrome': 'x'}}, 5):
+        with pytest.raises(InvalidOption):
+            generate_navigator(weights=value)
+    with pytest.raises(InvalidOption, match='selects no versions'):
+        generate_navigator(weights={'build_version': {'chrome': {'999': 1}}},
+                           navigator='chrome')
+    with pytest.raises(InvalidOption, match='selects no config variants'):
+        generate_navigator(weights={'variant': {'desktop-win-ie': 1}},
+                           navigator='chrome')
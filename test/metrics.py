@@ -0,0 +1,126 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+from random import Random
+
+from user_agent import generate_navigator, generate_user_agent, base
+from user_agent.metrics import (
+    enable_metrics, disable_metrics, get_metrics, HyperLogLog)
+from user_agent.instrument import (
+    enable_instrumentation, disable_instrumentation)
+from user_agent.provider import install_tables, load_tables, reset_tables
+
+
+def test_metrics_counts():
+    registry = enable_metrics()
+    try:
+        assert get_metrics() is registry
+        for _ in range(30):
+            generate_user_agent(os='win', navigator='chrome')
+        for _ in range(20):
+            generate_navigator(os='android', navigator='firefox')
+        snap = registry.snapshot()
+    finally:
+        disable_metrics()
+    assert get_metrics() is None
+    assert snap['total'] == 50
+    assert snap['os_id'] == {'win': 30, 'android': 20}
+    assert snap['navigator_id'] == {'chrome': 30, 'firefox': 20}
+    assert snap['variant']['desktop-win-chrome'] == 30
+    assert sum(snap['device_type'].values()) == 50
+    assert sum(snap['platform_version']['win'].values()) == 30
+    assert set(snap['platform_version']['win']) <= set(base.OS_PLATFORM['win'])
+    assert sum(snap['build_version']['chrome'].values()) == 30
+    assert 'other' not in snap['build_version']['chrome']
+    assert 0 < snap['distinct_user_agents'] <= 50
+
+
+def test_metrics_reset():
+    registry = enable_metrics()
+    try:
+        generate_user_agent()
+        registry.reset()
+        snap = registry.snapshot()
+    finally:
+        disable_metrics()
+    assert snap['total'] == 0
+    assert snap['variant'] == {}
+    assert snap['distinct_user_agents'] == 0
+
+
+def test_metrics_with_instrumentation():
+    registry = enable_metrics()
+    enable_instrumentation()
+    try:
+        generate_user_agent(navigator='ie')
+    finally:
+        disable_instrumentation()
+        disable_metrics()
+    assert registry.snapshot()['navigator_id'] == {'ie': 1}
+
+
+def test_metrics_firefox_major():
+    registry = enable_metrics()
+    try:
+        for _ in range(50):
+            generate_navigator(navigator='firefox', min_firefox=80,
+                               max_firefox=80)
+        snap = registry.snapshot()
+    finally:
+        disable_metrics()
+    assert snap['build_version'] == {'firefox': {'80': 50}}
+
+
+def test_metrics_new_navigator_as_data(monkeypatch):
+    registry = enable_metrics()
+    try:
+        generate_navigator(navigator='chrome')
+        rules = dict(base.NAVIGATOR_RULES, edge=base.NAVIGATOR_RULES['chrome'])
+        monkeypatch.setattr(base, 'NAVIGATOR_RULES', rules)
+        monkeypatch.setattr(base, 'OS_NAVIGATOR', dict(
+            base.OS_NAVIGATOR, win=base.OS_NAVIGATOR['win'] + ('edge',)))
+        monkeypatch.setattr(base, 'DEVICE_TYPE_NAVIGATOR', dict(
+            base.DEVICE_TYPE_NAVIGATOR,
+            desktop=base.DEVICE_TYPE_NAVIGATOR['desktop'] + ('edge',)))
+        monkeypatch.setattr(base, 'NAVIGATOR_OS', dict(base.NAVIGATOR_OS,
+                                                       edge=('win',)))
+        for _ in range(5):
+            generate_navigator(navigator='edge')
+        snap = registry.snapshot()
+    finally:
+        disable_metrics()
+    assert snap['total'] == 6
+    assert snap['navigator_id']['edge'] == 5
+    assert sum(snap['navigator_id'].values()) == 6
+    assert sum(snap['build_version']['edge'].values()) == 5
+
+
+def test_metrics_install_tables(tmpdir):
+    path = tmpdir.join('tables.json')
+    path.write('{"CHROME_BUILD": [[90, 4430, 4430], [91, 4472, 4472]]}')
+    registry = enable_metrics()
+    try:
+        for _ in range(10):
+            generate_navigator(navigator='chrome', os='win', min_chrome=80,
+                               max_chrome=80)
+        install_tables(load_tables(str(path)))
+        for _ in range(10):
+            generate_navigator(navigator='chrome', os='win')
+        snap = registry.snapshot()
+    finally:
+        disable_metrics()
+        reset_tables()
+    builds = snap['build_version']['chrome']
+    assert builds['other'] == 10
+    assert sum(builds[x] for x in ('90', '91') if x in builds) == 10
+    assert snap['variant']['desktop-win-chrome'] == 20
+
+
+def test_hyperloglog():
+    hll = HyperLogLog()
+    values = ['value-%d' % x for x in range(40000)]
+    Random(1).shuffle(values)
+    for _ in range(3):
+        for val in values:
+            hll.add(val)
+    # 40000 distinct values with expected error about 1.6%
+    assert abs(hll.count() - 40000) < 40000 * 0.06
@@ -0,0 +1,43 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+
+import pytest
+
+from user_agent import InvalidOption
+from user_agent.parallel import generate_parallel
+
+
+def test_independent_of_jobs():
+    results = [
+        list(generate_parallel(230, jobs=jobs, seed=7, chunk_size=40,
+                               device_type='all'))
+        for jobs in (1, 2, 3)
+    ]
+    assert len(results[0]) == 230
+    assert results[0] == results[1] == results[2]
+    assert len(set(x['user_agent'] for x in results[0])) > 100
+    other = list(generate_parallel(230, jobs=1, seed=8, chunk_size=40,
+                                   device_type='all'))
+    assert other != results[0]
+    # number of CPUs by default
+    assert list(generate_parallel(230, seed=7, chunk_size=40,
+                                  device_type='all')) == results[0]
+
+
+def test_bounded_pending():
+    navs = generate_parallel(1000, jobs=2, seed='abc', chunk_size=10,
+                             max_pending=1, navigator='firefox')
+    first = [next(navs) for _ in range(25)]
+    navs.close()
+    assert all(x['navigator_id'] == 'firefox' for x in first)
+    assert first == list(generate_parallel(25, jobs=1, seed='abc',
+                                           chunk_size=10,
+                                           navigator='firefox'))
+
+
+def test_invalid_options():
+    with pytest.raises(InvalidOption):
+        generate_parallel(10, jobs=2, os='win', navigator='safari')
+    with pytest.raises(ValueError):
+        generate_parallel(10, chunk_size=0)
+    assert list(generate_parallel(0, jobs=2, seed=1)) == []
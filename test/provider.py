@@ -0,0 +1,166 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+import json
+import os
+import re
+import threading
+
+import pytest
+
+from user_agent import base, generate_user_agent, generate_navigator
+from user_agent.error import InvalidData
+from user_agent.provider import (DataProvider, load_tables, install_tables,
+                                 reload_tables, dump_tables, reset_tables)
+
+NEW_TABLES = {
+    'CHROME_BUILD': [[90, 4430, 4430], [91, 4472, 4472]],
+    'CHROME_RELEASE_DATE': {'90': '2021-04-14', '91': '2021-05-25'},
+    'OS_PLATFORM': {'android': ['Android 10', 'Android 11']},
+}
+
+
+@pytest.fixture(autouse=True)
+def restore_tables():
+    yield
+    reset_tables()
+
+
+def write_json(path, data):
+    with open(str(path), 'w') as out:
+        json.dump(data, out)
+
+
+def test_reload_tables(tmpdir):
+    path = tmpdir.join('tables.json')
+    write_json(path, NEW_TABLES)
+    assert generate_navigator(navigator='chrome', min_chrome=85)
+    reload_tables(str(path))
+    assert base.CHROME_BUILD == ((90, 4430, 4430), (91, 4472, 4472))
+    for _ in range(50):
+        nav = generate_navigator(navigator='chrome', min_chrome=85)
+        assert re.match(r'9[01]\.', nav['build_version'])
+        agent = generate_user_agent(os='android', navigator='firefox')
+        assert 'Android 1' in agent
+    # other tables are kept
+    assert base.OS_PLATFORM['win'][0] == 'Windows NT 5.1'
+    # Chrome on Android has no devices supporting Android 10+
+    with pytest.raises(base.InvalidOption):
+        generate_navigator(os='android', navigator='chrome')
+    reset_tables()
+    assert generate_navigator(os='android', navigator='chrome')
+
+
+def test_load_tables_directory(tmpdir):
+    write_json(tmpdir.join('1.json'), NEW_TABLES)
+    write_json(tmpdir.join('2.json'), {'CHROME_BUILD': [[92, 4515, 4515]]})
+    tmpdir.join('readme.txt').write('ignored')
+    tables = load_tables(str(tmpdir))
+    assert tables['CHROME_BUILD'] == ((92, 4515, 4515),)
+    assert tables['OS_PLATFORM']['android'] == ('Android 10', 'Android 11')
+
+
+def test_dump_tables(tmpdir):
+    path = str(tmpdir.join('tables.json'))
+    dump_tables(path)
+    tables = load_tables(path)
+    assert tables['FIREFOX_VERSION'] == base.FIREFOX_VERSION
+    assert tables['CHROME_RELEASE_DATE'] == base.CHROME_RELEASE_DATE
+    install_tables(tables)
+
+
+def test_reload_navigator_os(tmpdir):
+    path = tmpdir.join('tables.json')
+    write_json(path, {'NAVIGATOR_OS': {'chrome': ['win'], 'ie': ['win']}})
+    reload_tables(str(path))
+    assert base.NAVIGATOR_OS == {'chrome': ('win',), 'ie': ('win',)}
+    for _ in range(20):
+        assert generate_navigator(navigator='chrome')['os_id'] == 'win'
+    with pytest.raises(base.InvalidOption):
+        generate_navigator(os='linux', navigator='chrome')
+    with pytest.raises(base.InvalidOption):
+        generate_navigator(navigator='firefox')
+
+
+def test_invalid_tables(tmpdir):
+    orig = base.CHROME_BUILD
+    path = tmpdir.join('tables.json')
+    for data in ({'CHROME_BUILD': []},
+                 {'UNKNOWN': []},
+                 {'NAVIGATOR_OS': {'edge': ['win']}},
+                 {'FIREFOX_VERSION': [['90.0', '2021/01/01']]},
+                 {'OS_PLATFORM': {'mac': ['Macintosh; Intel Mac OS X 12.0']}}):
+        write_json(path, data)
+        with pytest.raises(InvalidData):
+            reload_tables(str(path))
+    path.write('{')
+    with pytest.raises(InvalidData):
+        reload_tables(str(path))
+    assert base.CHROME_BUILD is orig
+
+
+def test_data_provider(tmpdir):
+    path = tmpdir.join('tables.json')
+    write_json(path, {'CHROME_BUILD': [[90, 4430, 4430]]})
+    provider = DataProvider(str(path))
+    assert provider.check()
+    assert not provider.check()
+    assert base.CHROME_BUILD == ((90, 4430, 4430),)
+    write_json(path, {'CHROME_BUILD': [[91, 4472, 4472], [92, 4515, 4515]]})
+    os.utime(str(path), (1, 1))
+    assert provider.check()
+    assert provider.version == 2
+    assert len(base.CHROME_BUILD) == 2
+
+
+def test_data_provider_thread(tmpdir):
+    path = tmpdir.join('tables.json')
+    write_json(path, {'CHROME_BUILD': [[90, 4430, 4430]]})
+    provider = DataProvider(str(path), interval=0.01).start()
+    try:
+        for _ in range(500):
+            if base.CHROME_BUILD[0][0] == 90:
+                break
+            threading.Event().wait(0.01)
+        assert base.CHROME_BUILD == ((90, 4430, 4430),)
+        path.write('{')
+        os.utime(str(path), (1, 1))
+        for _ in range(500):
+            if provider.last_error is not None:
+                break
+            threading.Event().wait(0.01)
+        assert isinstance(provider.last_error, InvalidData)
+        assert base.CHROME_BUILD == ((90, 4430, 4430),)
+    finally:
+        provider.stop(5)
+
+
+def test_reload_during_generation():
+    new_tables = {
+        'CHROME_BUILD': ((90, 4430, 4430),),
+        'OS_PLATFORM': dict(base.OS_PLATFORM, mac=(
+            'Macintosh; Intel Mac OS X 11.0',)),
+    }
+    old_tables = dict((x, getattr(base, x)) for x in new_tables)
+    errors = []
+    done = threading.Event()
+
+    def generate():
+        try:
+            while not done.is_set():
+                nav = generate_navigator(os='mac', navigator='chrome',
+                                         min_chrome=85)
+                assert re.match(r'(8[5-7]|90)\.', nav['build_version'])
+        except Exception as ex: # pylint: disable=broad-except
+            errors.append(ex)
+
+    threads = [threading.Thread(target=generate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for idx in range(200):
+            install_tables(new_tables if idx % 2 else old_tables)
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join(5)
+    assert not errors
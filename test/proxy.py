@@ -0,0 +1,161 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+import socket
+import threading
+
+import pytest
+
+asyncio = pytest.importorskip('asyncio') # pylint: disable=invalid-name
+from six.moves import BaseHTTPServer, socketserver, http_client # noqa pylint: disable=wrong-import-position
+
+from user_agent.proxy import UserAgentProxy # noqa pylint: disable=wrong-import-position
+
+
+class UpstreamHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    agents = []
+
+    def do_GET(self): # pylint: disable=invalid-name
+        self.agents.append(self.headers['User-Agent'])
+        if self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in (b'hello ', b'world'):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        body = self.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self): # pylint: disable=invalid-name
+        self.agents.append(self.headers['User-Agent'])
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): # pylint: disable=arguments-differ
+        pass
+
+
+class UpstreamServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture(name='upstream_port')
+def fixture_upstream_port():
+    del UpstreamHandler.agents[:]
+    server = UpstreamServer(('127.0.0.1', 0), UpstreamHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def start_proxy(**kwargs):
+    loop = asyncio.new_event_loop()
+    proxy = UserAgentProxy(**kwargs)
+    server = loop.run_until_complete(proxy.start('127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever)
+    thread.daemon = True
+    thread.start()
+
+    def stop():
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        server.close()
+        # finish client handlers waiting for next request
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True))
+        proxy.close_idle()
+        loop.close()
+
+    return proxy, server.sockets[0].getsockname()[1], stop
+
+
+def test_proxy_connection_sticky(upstream_port):
+    proxy, port, stop = start_proxy(os='linux')
+    base = 'http://127.0.0.1:%d' % upstream_port
+    try:
+        conn = http_client.HTTPConnection('127.0.0.1', port, timeout=5)
+        for path in ('/a', '/b?x=1', '/c'):
+            conn.request('GET', base + path,
+                         headers={'User-Agent': 'legacy-scraper'})
+            assert conn.getresponse().read() == path.encode('utf-8')
+        conn.request('GET', base + '/chunked')
+        assert conn.getresponse().read() == b'hello world'
+        conn.request('POST', base + '/post', body=b'x' * 100000)
+        assert conn.getresponse().read() == b'x' * 100000
+        conn.close()
+        agents = UpstreamHandler.agents
+        assert len(agents) == 5
+        assert len(set(agents)) == 1
+        assert 'legacy-scraper' not in agents[0]
+        assert 'Linux' in agents[0]
+        # upstream connection is reused
+        assert proxy.stats['upstream_connections'] == 1
+        assert proxy.stats['requests'] == 5
+    finally:
+        stop()
+
+
+def test_proxy_host_sticky(upstream_port):
+    _, port, stop = start_proxy(sticky='host')
+    try:
+        for _ in range(3):
+            conn = http_client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', 'http://127.0.0.1:%d/' % upstream_port)
+            assert conn.getresponse().read() == b'/'
+            conn.close()
+        assert len(set(UpstreamHandler.agents)) == 1
+        assert len(UpstreamHandler.agents) == 3
+    finally:
+        stop()
+
+
+def test_proxy_bad_gateway():
+    _, port, stop = start_proxy()
+    try:
+        conn = http_client.HTTPConnection('127.0.0.1', port, timeout=5)
+        conn.request('GET', 'http://127.0.0.1:1/')
+        assert conn.getresponse().status == 502
+        conn.close()
+    finally:
+        stop()
+
+
+def test_proxy_bad_status_line():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(1)
+
+    def serve():
+        conn, _ = sock.accept()
+        conn.recv(65536)
+        conn.sendall(b'HTTP/1.1 OK\r\nContent-Length: 0\r\n\r\n')
+        conn.close()
+
+    thread = threading.Thread(target=serve)
+    thread.daemon = True
+    thread.start()
+    _, port, stop = start_proxy()
+    try:
+        conn = http_client.HTTPConnection('127.0.0.1', port, timeout=5)
+        conn.request('GET', 'http://127.0.0.1:%d/' % sock.getsockname()[1])
+        assert conn.getresponse().status == 502
+        conn.close()
+    finally:
+        stop()
+        thread.join(5)
+        sock.close()
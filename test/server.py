@@ -0,0 +1,131 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+import json
+import threading
+from subprocess import Popen, PIPE
+import socket
+import time
+
+import pytest
+
+asyncio = pytest.importorskip('asyncio') # pylint: disable=invalid-name
+from six.moves import http_client # pylint: disable=wrong-import-position
+
+from user_agent.server import UserAgentService, start_servers # noqa pylint: disable=wrong-import-position
+
+
+@pytest.fixture(name='server_port')
+def fixture_server_port():
+    loop = asyncio.new_event_loop()
+    service = UserAgentService(buffer_size=20)
+    servers = loop.run_until_complete(
+        start_servers(service, host='127.0.0.1', port=0))
+    port = servers[0].sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever)
+    thread.daemon = True
+    thread.start()
+    yield port
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    servers[0].close()
+    loop.close()
+
+
+def test_service_handle():
+    service = UserAgentService(buffer_size=10)
+    status, _, body = service.handle('/?os=linux&count=25')
+    assert status == 200
+    agents = body.decode('utf-8').splitlines()
+    assert len(agents) == 25
+    assert all('Linux' in x for x in agents)
+    assert len(service.buffers) == 1
+    service.handle('/?os=linux')
+    assert len(service.buffers) == 1
+
+
+def test_service_errors():
+    service = UserAgentService()
+    assert service.handle('/?os=dos')[0] == 400
+    assert service.handle('/?count=0')[0] == 400
+    assert service.handle('/?count=abc')[0] == 400
+    assert service.handle('/?format=xml')[0] == 400
+    assert service.handle('/foo')[0] == 404
+    assert not service.buffers
+
+
+def test_server_keep_alive(server_port):
+    conn = http_client.HTTPConnection('127.0.0.1', server_port, timeout=5)
+    try:
+        for _ in range(20):
+            conn.request('GET', '/?os=win,mac&navigator=chrome')
+            res = conn.getresponse()
+            assert res.status == 200
+            agent = res.read().decode('utf-8')
+            assert 'Chrome' in agent
+        conn.request('GET', '/?format=navigator_js&count=3&os=android')
+        data = json.loads(conn.getresponse().read().decode('utf-8'))
+        assert len(data) == 3
+        assert all('Android' in x['userAgent'] for x in data)
+        conn.request('GET', '/?format=navigator')
+        assert 'user_agent' in json.loads(conn.getresponse().read()
+                                          .decode('utf-8'))
+        conn.request('GET', '/?navigator=vim')
+        res = conn.getresponse()
+        assert res.status == 400
+        assert b'vim' in res.read()
+    finally:
+        conn.close()
+
+
+def test_ua_serve_script():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    proc = Popen(['ua', 'serve', '--port', str(port)], stdout=PIPE,
+                 stderr=PIPE)
+    try:
+        for _ in range(50):
+            try:
+                conn = http_client.HTTPConnection('127.0.0.1', port,
+                                                  timeout=5)
+                conn.request('GET', '/?os=linux')
+                break
+            except socket.error:
+                time.sleep(0.1)
+        assert conn.getresponse().read().startswith(b'Mozilla')
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def test_server_unix_socket(tmpdir):
+    if not hasattr(socket, 'AF_UNIX'):
+        pytest.skip('Unix sockets are not supported')
+    path = str(tmpdir.join('ua.sock'))
+    loop = asyncio.new_event_loop()
+    servers = loop.run_until_complete(
+        start_servers(UserAgentService(), port=None, unix_path=path))
+
+    def request():
+        sock = socket.socket(socket.AF_UNIX)
+        sock.settimeout(5)
+        sock.connect(path)
+        sock.sendall(b'GET /?navigator=firefox HTTP/1.0\r\n\r\n')
+        data = b''
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        sock.close()
+        return data
+
+    try:
+        future = loop.run_in_executor(None, request)
+        data = loop.run_until_complete(future)
+        assert b'Connection: close' in data
+        assert b'Firefox/' in data.split(b'\r\n\r\n', 1)[1]
+    finally:
+        servers[0].close()
+        loop.close()
@@ -0,0 +1,124 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+import threading
+
+import pytest
+from six.moves import BaseHTTPServer, socketserver
+
+from user_agent.base import build_headers
+from user_agent.session import (SessionPool, requests_session_factory,
+                                httpx_session_factory)
+
+
+class DummySession(object):
+    def __init__(self, nav):
+        self.nav = nav
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_session_pool_key():
+    with SessionPool(max_sessions=3, session_factory=DummySession,
+                     os='linux') as pool:
+        nav, sess = pool.get('a')
+        assert 'Linux' in nav['user_agent']
+        assert sess.nav is nav
+        assert pool.session('a') is sess
+        assert len(pool) == 1
+
+
+def test_session_pool_lru():
+    pool = SessionPool(max_sessions=2, session_factory=DummySession)
+    sess_a = pool.session('a')
+    sess_b = pool.session('b')
+    pool.session('a')
+    sess_c = pool.session('c')
+    assert sess_b.closed
+    assert not sess_a.closed
+    assert len(pool) == 2
+    pool.close()
+    assert sess_a.closed and sess_c.closed
+    assert len(pool) == 0 # pylint: disable=len-as-condition
+
+
+def test_session_pool_anonymous():
+    pool = SessionPool(max_sessions=3, session_factory=DummySession)
+    sessions = set(pool.session() for _ in range(30))
+    assert len(sessions) == 3
+    assert not any(x.closed for x in sessions)
+
+
+def test_session_pool_anonymous_isolated():
+    pool = SessionPool(max_sessions=3, session_factory=DummySession)
+    alice = pool.session('alice')
+    bob = pool.session('bob')
+    anonymous = set(pool.session() for _ in range(30))
+    assert len(anonymous) == 1
+    assert alice not in anonymous and bob not in anonymous
+    pool.session('alice')
+    pool.session('bob')
+    carol = pool.session('carol')
+    assert anonymous.pop().closed
+    for _ in range(10):
+        assert pool.session() not in (alice, bob, carol)
+
+
+def run_local_server(agents, received=None):
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self): # pylint: disable=invalid-name
+            agents.append(self.headers['User-Agent'])
+            if received is not None:
+                received.append(self.headers)
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        def log_message(self, *args): # pylint: disable=arguments-differ
+            pass
+
+    class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+        daemon_threads = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def check_local_server(session_factory):
+    agents = []
+    received = []
+    server = run_local_server(agents, received)
+    try:
+        url = 'http://127.0.0.1:%d/' % server.server_address[1]
+        with SessionPool(max_sessions=2,
+                         session_factory=session_factory) as pool:
+            for key in ('a', 'b', 'a', 'b'):
+                res = pool.request('GET', url, key=key, timeout=5)
+                assert res.text == 'ok'
+            assert agents[0] == agents[2]
+            assert agents[1] == agents[3]
+            nav = pool.get('a')[0]
+            assert agents[0] == nav['user_agent']
+            for name, value in build_headers(nav):
+                assert received[0][name] == value
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_session_pool_requests():
+    pytest.importorskip('requests')
+    check_local_server(requests_session_factory)
+
+
+def test_session_pool_httpx():
+    pytest.importorskip('httpx')
+    check_local_server(httpx_session_factory)
@@ -0,0 +1,52 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+from random import Random
+from subprocess import check_output
+
+from user_agent.bulkrand import BulkRandom
+from user_agent.stats import (check_conformance, chi_square_test,
+                              regularized_gamma_q)
+
+
+def test_regularized_gamma_q():
+    # chi-square survival function: dof=2 -> exp(-x/2)
+    for val in (0.1, 1.0, 5.0, 20.0):
+        assert abs(regularized_gamma_q(1.0, val / 2) - 2.718281828 ** (-val / 2)) < 1e-6
+    # critical value of chi-square with 10 dof at 0.05 is 18.307
+    assert abs(regularized_gamma_q(5.0, 18.307 / 2) - 0.05) < 1e-4
+
+
+def test_chi_square_test():
+    res = chi_square_test({'a': 500, 'b': 500}, {'a': 0.5, 'b': 0.5})
+    assert res['statistic'] == 0
+    assert res['p_value'] == 1.0
+    res = chi_square_test({'a': 900, 'b': 100, 'c': 1}, {'a': 0.5, 'b': 0.5})
+    assert res['p_value'] < 1e-6
+    assert res['unexpected'] == ['c']
+    assert res['tv_distance'] > 0.39
+
+
+def test_check_conformance():
+    res = check_conformance(samples=20000, rng=Random(1), device_type='all')
+    assert 'variant' in res
+    assert 'platform_version:android' in res
+    assert 'cpu:win' in res
+    assert 'build_version:firefox' in res
+    assert all(x['passed'] for x in res.values())
+    assert res['variant']['samples'] == 20000
+    res = check_conformance(samples=20000, rng=BulkRandom(1),
+                            device_type='all')
+    assert all(x['passed'] for x in res.values())
+
+
+def test_check_conformance_filters():
+    res = check_conformance(samples=1000, rng=Random(1), os='linux',
+                            navigator='chrome')
+    assert set(res) == set(['variant', 'platform_version:linux',
+                            'cpu:linux', 'build_version:chrome'])
+
+
+def test_ua_stats_script():
+    out = check_output(['ua', 'stats', '--samples', '2000', '--seed', '1',
+                        '-n', 'ie'])
+    assert b'build_version:ie' in out
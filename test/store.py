@@ -0,0 +1,84 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+import os
+
+import pytest
+
+from user_agent import generate_navigator, StoreClosed
+from user_agent.store import ProfileStore, dump_navigator, load_navigator
+
+
+def test_dump_load_navigator():
+    for _ in range(50):
+        nav = generate_navigator(device_type='all')
+        assert load_navigator(dump_navigator(nav)) == nav
+
+
+def test_store_get_put(tmpdir):
+    path = str(tmpdir.join('profiles.db'))
+    navs = dict(('s%d' % x, generate_navigator()) for x in range(20))
+    with ProfileStore(path, cache_size=5, batch_size=7) as store:
+        assert store.get('s1') is None
+        for key, nav in navs.items():
+            store.put(key, nav)
+        for key, nav in navs.items():
+            assert store.get(key) == nav
+        assert len(store) == 20
+    with ProfileStore(path) as store:
+        assert store.get_many(list(navs) + ['missing']) == navs
+        store.delete('s1')
+        assert store.get('s1') is None
+
+
+def test_store_get_or_create(tmpdir):
+    path = str(tmpdir.join('profiles.db'))
+    with ProfileStore(path, cache_size=10) as store:
+        nav = store.get_or_create('abc', os='linux')
+        assert 'Linux' in nav['platform']
+        assert store.get_or_create('abc', os='win') == nav
+        res = store.get_or_create_many(['abc', 'x', 'y'], navigator='ie')
+        assert res['abc'] == nav
+        assert res['x']['navigator_id'] == 'ie'
+    with ProfileStore(path) as store:
+        assert store.get('abc') == nav
+        assert store.get_many(['x', 'y']) == {'x': res['x'], 'y': res['y']}
+    assert os.path.exists(path)
+
+
+def test_store_generator_keys():
+    with ProfileStore(':memory:') as store:
+        res = store.get_or_create_many(iter(['a', 'b']))
+        assert sorted(res) == ['a', 'b']
+        assert store.get_many(iter(['a', 'b'])) == res
+
+
+def test_store_batched_delete_and_len(tmpdir):
+    path = str(tmpdir.join('profiles.db'))
+    with ProfileStore(path, batch_size=100) as store:
+        store.put_many(('s%d' % x, generate_navigator()) for x in range(10))
+        store.flush()
+        store.put('s0', generate_navigator())
+        store.put('new', generate_navigator())
+        store.delete('s1')
+        assert store.get('s1') is None
+        assert len(store) == 10
+        # len() does not flush pending writes
+        with ProfileStore(path) as other:
+            assert len(other) == 10
+            assert other.get('new') is None
+            assert other.get('s1') is not None
+    with ProfileStore(path) as store:
+        assert len(store) == 10
+        assert store.get('s1') is None
+        assert store.get('new') is not None
+
+
+def test_store_closed():
+    store = ProfileStore(':memory:')
+    store.close()
+    store.close()
+    for func, args in ((store.get, ('a',)), (store.put, ('a', {})),
+                       (store.get_many, (['a'],)), (store.delete, ('a',)),
+                       (store.flush, ()), (len, (store,))):
+        with pytest.raises(StoreClosed):
+            func(*args)
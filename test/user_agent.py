@@ -11,7 +11,9 @@ import six
 import pytest
 
 from user_agent import (generate_user_agent, generate_navigator,
-                        generate_navigator_js, InvalidOption)
+                        generate_navigator_js, InvalidOption,
+                        ua_for_key, navigator_for_key,
+                        generate_stratified, generate_headers)
 
 
 def test_it():
@@ -293,3 +295,336 @@ def test_device_type_smartphone_chrome():
         assert 'Mobile' in agent
         agent = generate_user_agent(device_type='tablet', navigator='chrome')
         assert 'Mobile' not in agent
+
+
+def test_rng_option():
+    from random import Random
+
+    for seed in range(20):
+        assert (generate_navigator(device_type='all', rng=Random(seed))
+                == generate_navigator(device_type='all', rng=Random(seed)))
+
+
+def test_ua_for_key():
+    for key in ('user-1', u'\u043a\u043b\u044e\u0447', b'bytes', 42):
+        agent = ua_for_key(key)
+        assert agent == ua_for_key(key)
+        assert navigator_for_key(key)['user_agent'] == agent
+
+
+def test_ua_for_key_filters():
+    for idx in range(50):
+        nav = navigator_for_key(idx, os='android', navigator='chrome')
+        assert nav['os_id'] == 'android'
+        assert nav['navigator_id'] == 'chrome'
+        assert nav == navigator_for_key(idx, os='android',
+                                        navigator='chrome')
+
+
+def test_ua_for_key_salt():
+    keys = ['user-%d' % x for x in range(50)]
+    agents = [ua_for_key(x) for x in keys]
+    assert agents == [ua_for_key(x, salt=None) for x in keys]
+    assert agents != [ua_for_key(x, salt='2020-01') for x in keys]
+    assert ([ua_for_key(x, salt='2020-01') for x in keys]
+            == [ua_for_key(x, salt='2020-01') for x in keys])
+
+
+def test_exclusion_option():
+    for _ in range(50):
+        nav = generate_navigator(os='!win')
+        assert nav['os_id'] in ('mac', 'linux', 'android')
+        nav = generate_navigator(os=('!win', '!mac', '!android'),
+                                 navigator='!firefox')
+        assert (nav['os_id'], nav['navigator_id']) == ('linux', 'chrome')
+    with pytest.raises(InvalidOption):
+        generate_navigator(os='!dos')
+    with pytest.raises(InvalidOption):
+        generate_navigator(os=('!win', '!mac', '!linux', '!android'))
+
+
+def test_version_filters():
+    for _ in range(50):
+        nav = generate_navigator(navigator='chrome', min_chrome=85)
+        assert int(nav['build_version'].split('.')[0]) >= 85
+        agent = generate_user_agent(os='android', max_android='5')
+        assert re.search(r'Android (4\.4|5\.)', agent)
+        agent = generate_user_agent(os='win', min_windows='6.2')
+        assert 'Windows NT 5.1' not in agent
+        assert 'Windows NT 6.1' not in agent
+        nav = generate_navigator(os='mac', navigator='firefox',
+                                 min_mac='10.14', max_firefox='60')
+        assert nav['platform'] == 'MacIntel'
+        assert re.search(r'Mac OS X 10\.1[45]', nav['user_agent'])
+        assert int(nav['build_version'].split('.')[0]) <= 60
+
+
+def test_version_filters_exclude_variants():
+    # no IE 12, only chrome and firefox remain
+    for _ in range(50):
+        nav = generate_navigator(os='win', min_ie=12)
+        assert nav['navigator_id'] in ('chrome', 'firefox')
+    with pytest.raises(InvalidOption):
+        generate_navigator(navigator='ie', min_ie=12)
+    with pytest.raises(InvalidOption):
+        generate_navigator(min_opera=1)
+    with pytest.raises(InvalidOption):
+        generate_navigator(min_chrome='eighty')
+
+
+def test_compile_filters_cache():
+    from user_agent import base
+
+    spec = base.compile_filters('all', None, None, min_chrome=80)
+    assert base.compile_filters('all', None, None, min_chrome=80) is spec
+    assert ('smartphone', 'android', 'chrome') in spec.variants
+    assert all(x[0] >= 80 for x in spec.builds['chrome'])
+    assert spec.builds['firefox'] is base.FIREFOX_VERSION
+    orig_chrome = base.CHROME_BUILD
+    base.CHROME_BUILD = ((90, 4430, 4430),)
+    try:
+        spec = base.compile_filters('all', None, None, min_chrome=80)
+        assert spec.builds['chrome'] == ((90, 4430, 4430),)
+    finally:
+        base.CHROME_BUILD = orig_chrome
+
+
+def test_as_of_option():
+    for _ in range(50):
+        nav = generate_navigator(device_type='all', as_of=datetime(2018, 6, 1))
+        if nav['navigator_id'] == 'chrome':
+            assert int(nav['build_version'].split('.')[0]) <= 67
+        elif nav['navigator_id'] == 'firefox':
+            assert int(nav['build_version'].split('.')[0]) <= 60
+        agent = generate_user_agent(os='android', as_of=datetime(2017, 1, 1))
+        assert not re.search(r'Android (8|9|10|11)', agent)
+
+
+def test_max_age_option():
+    from datetime import timedelta
+
+    for _ in range(50):
+        nav = generate_navigator(navigator='chrome', as_of=datetime(2018, 6, 1),
+                                 max_age=timedelta(days=60))
+        # 65 was current until 66 was released on 2018-04-17
+        assert nav['build_version'].split('.')[0] in ('65', '66', '67')
+        nav = generate_navigator(os='win', navigator='ie',
+                                 as_of=datetime(2020, 1, 1),
+                                 max_age=timedelta(days=1))
+        assert nav['build_version'] == 'MSIE 11.0'
+    with pytest.raises(InvalidOption):
+        generate_navigator(navigator='chrome', as_of=datetime(2010, 1, 1))
+    with pytest.raises(InvalidOption):
+        generate_navigator(as_of='2018-01-01')
+    with pytest.raises(InvalidOption):
+        generate_navigator(max_age=60)
+
+
+def test_version_decay_option():
+    from random import Random
+
+    rng = Random(1)
+    majors = [int(generate_navigator(navigator='chrome', version_decay=90,
+                                     rng=rng)['build_version'].split('.')[0])
+              for _ in range(2000)]
+    # 87 is the latest version, 85 was released 84 days before it
+    assert majors.count(87) > majors.count(85) > majors.count(80)
+    assert majors.count(87) > 500
+    assert min(majors) >= 49
+    majors = [int(generate_navigator(navigator='chrome', version_decay=30,
+                                     as_of=datetime(2018, 6, 1),
+                                     rng=rng)['build_version'].split('.')[0])
+              for _ in range(500)]
+    assert max(majors) == 67
+    assert majors.count(67) > majors.count(65)
+    for value in (0, -5, 'week'):
+        with pytest.raises(InvalidOption):
+            generate_navigator(version_decay=value)
+
+
+def test_version_decay_cache():
+    from datetime import timedelta
+    from user_agent import base
+
+    spec = base.compile_filters(navigator='ie', version_decay=365)
+    assert spec is base.compile_filters(navigator='ie',
+                                        version_decay=timedelta(days=365))
+    weights = spec.weights['ie']
+    assert len(weights) == len(spec.builds['ie'])
+    assert weights == sorted(weights)
+    assert 'chrome' in spec.weights
+    assert not base.compile_filters(navigator='ie').weights
+
+
+def test_generate_stratified():
+    from collections import Counter
+    from random import Random
+
+    quotas = {('desktop', 'win', 'chrome'): 62,
+              ('smartphone', 'android', 'chrome'): 20,
+              (None, 'mac', None): 18}
+    for num in (1, 7, 50, 1001):
+        navs = list(generate_stratified(num, quotas))
+        assert len(navs) == num
+    counts = Counter((x['os_id'], x['navigator_id']) for x in navs)
+    assert counts[('win', 'chrome')] == 621
+    assert counts[('android', 'chrome')] == 200
+    assert counts[('mac', 'chrome')] + counts[('mac', 'firefox')] == 180
+    # strata are interleaved
+    assert len(set(x['os_id'] for x in navs[:50])) > 1
+    assert (list(generate_stratified(20, quotas, rng=Random(1)))
+            == list(generate_stratified(20, quotas, rng=Random(1))))
+
+
+def test_generate_stratified_rounding():
+    from collections import Counter
+
+    navs = generate_stratified(7, {('desktop', 'win', None): 0.62,
+                                   ('desktop', 'linux', None): 0.2,
+                                   ('desktop', 'mac', None): 0.18})
+    counts = Counter(x['os_id'] for x in navs)
+    assert counts == {'win': 4, 'linux': 2, 'mac': 1}
+    navs = generate_stratified(10, {(None, 'win', 'ie'): 1}, min_ie=11)
+    assert set(x['build_version'] for x in navs) == set(['MSIE 11.0'])
+    with pytest.raises(InvalidOption):
+        generate_stratified(10, {(None, 'win', 'ie'): 1, (None, 'mac', None): -1})
+    with pytest.raises(InvalidOption):
+        generate_stratified(10, {(None, 'mac', 'ie'): 1})
+
+
+def test_device_index():
+    from user_agent import base
+
+    index = base.get_device_index()
+    assert set(index) == set(['smartphone', 'tablet'])
+    tablet_ids = set(base.TABLET_DEV_IDS)
+    for version, devices in index['tablet'].items():
+        assert version in base.OS_PLATFORM['android']
+        assert all(x['dev_id'] in tablet_ids for x in devices)
+    assert 'Android 11' not in index['smartphone']
+    assert all(len(x['resolution']) == 2
+               for x in index['smartphone']['Android 5.0'])
+
+
+def test_android_chrome_device_consistency():
+    from user_agent import base
+
+    index = base.get_device_index()
+    for device_type in ('smartphone', 'tablet'):
+        for _ in range(100):
+            agent = generate_user_agent(os='android', navigator='chrome',
+                                        device_type=device_type)
+            match = re.search(r'\(Linux; (Android [\d.]+); ([^)]+)\)', agent)
+            dev_ids = [x['dev_id'] for x in index[device_type][match.group(1)]]
+            assert match.group(2) in dev_ids
+    # no device supports Android 9
+    for _ in range(20):
+        nav = generate_navigator(os='android', min_android='9')
+        assert nav['navigator_id'] == 'firefox'
+    with pytest.raises(InvalidOption):
+        generate_navigator(os='android', navigator='chrome', min_android='9')
+
+
+def test_generate_headers():
+    for _ in range(50):
+        headers = generate_headers(navigator='chrome', min_chrome=85)
+        names = [x[0] for x in headers]
+        assert names == ['Connection', 'Upgrade-Insecure-Requests',
+                         'User-Agent', 'Accept', 'Sec-Fetch-Site',
+                         'Sec-Fetch-Mode', 'Sec-Fetch-User', 'Sec-Fetch-Dest',
+                         'Accept-Encoding', 'Accept-Language']
+        values = dict(headers)
+        assert 'Chrome/8' in values['User-Agent']
+        assert 'image/avif' in values['Accept']
+        assert values['Accept-Language'] == 'en-US,en;q=0.9'
+        headers = generate_headers(navigator='firefox', language='de-DE')
+        assert headers[0][0] == 'User-Agent'
+        assert 'Firefox/' in headers[0][1]
+        assert dict(headers)['Accept-Language'] == 'de-DE,de;q=0.5'
+        headers = generate_headers(navigator='ie')
+        assert [x[0] for x in headers][:3] == ['Accept', 'Accept-Language',
+                                               'User-Agent']
+
+
+def test_build_headers_client_hints():
+    from user_agent import base
+
+    nav = generate_navigator(os='android', navigator='chrome')
+    nav['build_version'] = '90.0.4430.85'
+    nav['user_agent'] = nav['user_agent'].replace('Safari', 'Mobile Safari')
+    values = dict(base.build_headers(nav))
+    assert values['sec-ch-ua'] == ('" Not A;Brand";v="99", '
+                                   '"Chromium";v="90", '
+                                   '"Google Chrome";v="90"')
+    assert values['sec-ch-ua-mobile'] == '?1'
+    assert values['User-Agent'] == nav['user_agent']
+    # cached template is not modified
+    other = generate_navigator(navigator='chrome')
+    assert dict(base.build_headers(other))['User-Agent'] == other['user_agent']
+
+
+def test_engine_draw_render():
+    from random import Random
+    from user_agent import base
+
+    engine, platforms, builds, weights = base.get_plan(
+        'desktop', 'mac', 'chrome')
+    positions = engine.draw(Random(1), platforms, builds, weights)
+    assert positions == engine.draw(Random(1), platforms, builds, weights)
+    assert all(isinstance(x, int) for x in positions)
+    nav = engine.render(*positions)
+    assert nav == engine.render(*positions)
+    assert nav['platform'] == 'MacIntel'
+    assert re.match(r'Intel Mac OS X 1\d_\d+_\d$', nav['oscpu'])
+    assert nav['oscpu'] in nav['user_agent']
+    assert nav['app_version'] == nav['user_agent'][len('Mozilla/'):]
+
+
+def test_engine_stage_functions():
+    from user_agent import base
+
+    app = {'build_version': 'MSIE 11.0'}
+    assert base.choose_ua_template('desktop', 'ie', app) == \
+        base.USER_AGENT_TEMPLATE['ie_11']
+    app = {'build_version': 'MSIE 9.0'}
+    assert base.choose_ua_template('desktop', 'ie', app) == \
+        base.USER_AGENT_TEMPLATE['ie_less_11']
+    assert base.choose_ua_template('tablet', 'chrome', app) == \
+        base.USER_AGENT_TEMPLATE['chrome_tablet']
+    assert base.build_navigator_app_version(
+        'android', 'firefox', 'Android 9', None) == '5.0 (Android 9)'
+    assert base.build_navigator_app_version(
+        'linux', 'firefox', 'X11; Linux', None) == '5.0 (X11)'
+    system = base.build_system_components('desktop', 'win', 'firefox')
+    assert system['oscpu'] == system['ua_platform']
+    app = base.build_app_components('android', 'firefox')
+    assert app['geckotrail'] == app['build_version']
+    with pytest.raises(InvalidOption):
+        base.build_system_components('desktop', 'android', 'ie')
+
+
+def test_engine_new_navigator_as_data(monkeypatch):
+    from user_agent import base
+
+    os_navigator = dict(base.OS_NAVIGATOR, win=('chrome', 'firefox', 'ie',
+                                                 'edge'))
+    dev_navigator = dict(base.DEVICE_TYPE_NAVIGATOR)
+    dev_navigator['desktop'] = dev_navigator['desktop'] + ('edge',)
+    templates = dict(base.USER_AGENT_TEMPLATE, edge=(
+        'Mozilla/5.0 ({system[ua_platform]}) AppleWebKit/537.36'
+        ' (KHTML, like Gecko) Chrome/{app[build_version]} Safari/537.36'
+        ' Edg/{app[build_version]}'))
+    rules = dict(base.NAVIGATOR_RULES, edge=dict(
+        base.NAVIGATOR_RULES['chrome'], template='edge'))
+    monkeypatch.setattr(base, 'OS_NAVIGATOR', os_navigator)
+    monkeypatch.setattr(base, 'DEVICE_TYPE_NAVIGATOR', dev_navigator)
+    monkeypatch.setattr(base, 'NAVIGATOR_OS', dict(base.NAVIGATOR_OS,
+                                                   edge=('win',)))
+    monkeypatch.setattr(base, 'USER_AGENT_TEMPLATE', templates)
+    monkeypatch.setattr(base, 'NAVIGATOR_RULES', rules)
+    for _ in range(20):
+        nav = generate_navigator(navigator='edge')
+        assert nav['navigator_id'] == 'edge'
+        assert nav['vendor'] == 'Google Inc.'
+        assert re.search(r'Windows NT [^)]+\) .* Edg/\d+\.0\.\d+\.\d+$',
+                         nav['user_agent'])
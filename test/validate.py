@@ -0,0 +1,77 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+from random import Random
+
+from user_agent import generate_navigator, base
+from user_agent.validate import validate_navigators, validate_navigator
+
+
+def test_generated_configs_are_valid():
+    navs = base.generate_batch(2000, device_type='all', rng=Random(1))
+    res = list(validate_navigators(iter(navs)))
+    assert [x for x, _ in res] == navs
+    assert [x for _, x in res if x] == []
+
+
+def test_inconsistent_configs():
+    nav = generate_navigator(os='win', navigator='firefox')
+    nav['vendor'] = 'Google Inc.'
+    assert validate_navigator(nav) == [
+        "vendor 'Google Inc.' does not match firefox %s, expected ''"
+        % nav['build_version']]
+
+    nav = generate_navigator(os='win', navigator='firefox')
+    nav['oscpu'] = 'Linux x86_64'
+    errors = validate_navigator(nav)
+    assert len(errors) == 1
+    assert 'do not match system' in errors[0]
+
+    nav = generate_navigator(os='win', navigator='chrome')
+    nav['build_version'] = nav['build_version'].replace('.0.', '.1.', 1)
+    errors = validate_navigator(nav)
+    assert 'is not a known chrome version' in errors[0]
+
+    nav = generate_navigator(os='win', navigator='ie')
+    nav['app_version'] = '5.0 (Windows)'
+    assert validate_navigator(nav) == [
+        "app_version '5.0 (Windows)' does not match user_agent"]
+
+    nav = generate_navigator(navigator='chrome', os='linux')
+    nav['user_agent'] = nav['user_agent'].replace(' Safari/', ' Safari /')
+    assert validate_navigator(nav) == [
+        'user_agent does not match template of the version']
+
+    nav = generate_navigator(navigator='firefox')
+    nav['product'] = 'Trident'
+    nav['os_id'] = 'ios'
+    assert validate_navigator(nav) == [
+        "product 'Trident' is not 'Gecko'",
+        "unknown os_id 'ios' with navigator_id 'firefox'"]
+
+    assert validate_navigator({'os_id': 'win'})[0].startswith('missing fields')
+    nav = generate_navigator()
+    nav['user_agent'] = None
+    assert validate_navigator(nav) == ['fields are not strings: user_agent']
+
+
+def test_mac_chrome_minor_version():
+    nav = generate_navigator(os='mac', navigator='chrome')
+    version = nav['oscpu'].rsplit(' ', 1)[1]
+    major = version.rsplit('_', 1)[0]
+    low, high = base.MACOSX_CHROME_BUILD_RANGE[major.replace('_', '.')]
+    bad = '%s_%d' % (major, high)
+    for key in ('user_agent', 'oscpu'):
+        nav[key] = nav[key].replace(version, bad)
+    assert validate_navigator(nav) == [
+        "user_agent has unknown system 'Macintosh; Intel Mac OS X %s'" % bad]
+
+
+def test_android_device_type():
+    nav = generate_navigator(device_type='smartphone', os='android',
+                             navigator='chrome')
+    assert validate_navigator(nav) == []
+    # smartphone device in tablet user agent
+    nav['user_agent'] = nav['user_agent'].replace(' Mobile Safari/',
+                                                  ' Safari/')
+    nav['app_version'] = nav['user_agent'][8:]
+    assert len(validate_navigator(nav)) == 1
@@ -0,0 +1,42 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import
+import io
+
+import pytest
+
+from user_agent import base, InvalidOption
+from user_agent.bulkrand import BulkRandom
+from user_agent.writer import write_user_agents, get_renderer
+
+
+def test_same_as_config():
+    spec = base.compile_filters('all')
+    for engine, positions in base.draw_configs(spec, 2000, BulkRandom(1)):
+        agent = engine.render(*positions)['user_agent']
+        assert get_renderer(engine).render(*positions) == \
+            agent.encode('utf-8')
+
+
+def test_write_file():
+    out = io.BytesIO()
+    size = write_user_agents(out, 2500, rng=BulkRandom(2), flush_size=1000,
+                             device_type='all')
+    data = out.getvalue()
+    assert size == len(data)
+    lines = data.split(b'\n')
+    assert len(lines) == 2501 and lines[-1] == b''
+    assert all(x.startswith(b'Mozilla/5.0 (') for x in lines[:-1])
+    again = io.BytesIO()
+    write_user_agents(again, 2500, rng=BulkRandom(2), device_type='all')
+    assert again.getvalue() == data
+
+
+def test_write_bytearray():
+    buf = bytearray(b'head:')
+    size = write_user_agents(buf, 10, sep=b'\r\n', navigator='ie')
+    assert size == len(buf) - len(b'head:')
+    agents = bytes(buf[5:]).split(b'\r\n')[:-1]
+    assert len(agents) == 10
+    assert all(b'Trident/' in x for x in agents)
+    with pytest.raises(InvalidOption):
+        write_user_agents(buf, 1, os='win', navigator='safari')
@@ -0,0 +1,278 @@
+"""
+Replacing real user agents in access logs with generated ones
+
+    $ ua anonymize access.log shared.log --key SECRET
+
+    >>> from user_agent.anonymize import anonymize_log
+    >>> anonymize_log("access.log", "shared.log", key="SECRET", jobs=4)
+
+The user agent of every line is the quoted field `field`, see
+`user_agent.learn.find_user_agent`, by default the user agent of combined
+log format. It is classified with `classify_user_agent` and replaced with
+the user agent of `navigator_for_key` bound to the real user agent with
+`key` as salt and limited to the same config variant: device type, os and
+browser are preserved, versions and devices are not. The same real user
+agent always gets the same replacement for the same key and tables.
+Without the key the mapping could not be reproduced, a random key is used
+if it is not given. User agents which could not be classified are
+replaced with generated desktop ones, empty ones and "-" are kept. Lines
+without the field are written unchanged.
+
+The log is read as bytes in chunks of about `chunk_size` bytes of whole
+lines, chunks are anonymized in a pool of processes and written in the
+input order. Every process keeps replacements of recent user agents in
+an LRU cache. Bytes other than the user agent are kept as is, whatever
+their encoding is.
+"""
+from collections import deque, OrderedDict
+import binascii
+import io
+from itertools import islice
+import os
+
+import six
+
+from . import base
+from .error import InvalidOption
+from .learn import UA_FIELD, classify_user_agent, find_user_agent
+from .parallel import get_cpu_count
+
+__all__ = ("Anonymizer", "anonymize_log")
+
+CHUNK_SIZE = 1 << 22
+CACHE_SIZE = 100000
+KEPT_VALUES = ("", "-")
+
+# Anonymizer of the current process used by `anonymize_chunk`
+_ANONYMIZER = None
+
+
+class Anonymizer(object):
+    """
+    Maps real user agents to generated ones, see the module docstring
+
+    :param key: secret salt of the mapping
+    :param cache_size: max number of replacements kept in the LRU cache
+    :param field: index of user agent in access log lines, see
+        `user_agent.learn.find_user_agent`
+    """
+
+    def __init__(self, key, cache_size=CACHE_SIZE, field=UA_FIELD):
+        self.key = key
+        self.cache_size = cache_size
+        self.field = field
+        self._cache = OrderedDict()
+
+    def replace(self, user_agent):
+        """
+        Return replacement of user agent, bytes (UTF-8) for bytes
+        """
+
+        cache = self._cache
+        try:
+            res = cache.pop(user_agent)
+        except KeyError:
+            res = self.build_replacement(user_agent)
+            if len(cache) >= self.cache_size:
+                cache.popitem(last=False)
+        cache[user_agent] = res
+        return res
+
+    def build_replacement(self, user_agent):
+        if isinstance(user_agent, bytes):
+            key = user_agent
+            text = user_agent.decode("utf-8", "replace")
+        else:
+            key = user_agent.encode("utf-8")
+            text = user_agent
+        if text.strip() in KEPT_VALUES:
+            return user_agent
+        filters = {}
+        variant = classify_user_agent(text)
+        if variant is not None:
+            filters = {
+                "device_type": variant[0],
+                "os": variant[1],
+                "navigator": variant[2],
+            }
+        try:
+            res = base.ua_for_key(key, salt=self.key, **filters)
+        except InvalidOption:
+            # combination not generated by the package
+            res = base.ua_for_key(key, salt=self.key)
+        if isinstance(user_agent, bytes) and isinstance(res, six.text_type):
+            res = res.encode("utf-8")
+        return res
+
+    def anonymize_lines(self, lines):
+        """
+        Return list of lines with replaced user agents
+        """
+
+        res = []
+        field = self.field
+        for line in lines:
+            span = find_user_agent(line, field)
+            if span is not None:
+                start, end = span
+                line = line[:start] + self.replace(line[start:end]) + line[end:]
+            res.append(line)
+        return res
+
+
+def anonymize_chunk(key, cache_size, field, lines):
+    """
+    Anonymize lines (bytes) with the anonymizer of the current process,
+    runs in worker process
+    """
+
+    global _ANONYMIZER # pylint: disable=global-statement
+    if _ANONYMIZER is None or (_ANONYMIZER.key, _ANONYMIZER.field) != (key, field):
+        _ANONYMIZER = Anonymizer(key, cache_size, field)
+    return b"".join(_ANONYMIZER.anonymize_lines(lines))
+
+
+def iter_chunks(inp, chunk_size):
+    while True:
+        lines = inp.readlines(chunk_size)
+        if not lines:
+            return
+        yield lines
+
+
+def iter_anonymized(chunks, key, jobs, cache_size, field, max_pending):
+    if jobs == 1:
+        for lines in chunks:
+            yield len(lines), anonymize_chunk(key, cache_size, field, lines)
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import ProcessPoolExecutor
+
+    pool = ProcessPoolExecutor(jobs)
+    pending = deque()
+
+    def submit(num):
+        for lines in islice(chunks, num):
+            pending.append(
+                (
+                    len(lines),
+                    pool.submit(anonymize_chunk, key, cache_size, field, lines),
+                )
+            )
+
+    try:
+        submit(max_pending)
+        while pending:
+            count, future = pending.popleft()
+            data = future.result()
+            submit(1)
+            yield count, data
+    finally:
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown()
+
+
+def open_log(source, mode, closefd=True):
+    return io.open(source, mode + "b", closefd=closefd)
+
+
+def anonymize_log(
+    source,
+    target,
+    key=None,
+    jobs=None,
+    chunk_size=CHUNK_SIZE,
+    cache_size=CACHE_SIZE,
+    max_pending=None,
+    field=UA_FIELD,
+):
+    """
+    Copy access log replacing user agents with generated ones
+
+    :param source: path or binary file-like object
+    :param target: path or binary file-like object
+    :param key: secret salt of the mapping (string), random if not given
+    :param jobs: number of processes, number of CPUs by default, with
+        jobs=1 lines are processed in the current process
+    :param chunk_size: approximate size of chunk of lines in bytes
+    :param cache_size: max number of replacements cached by each process
+    :param max_pending: maximal number of chunks submitted to the pool
+        and not written yet, twice the number of processes by default
+    :param field: index of user agent in lines, see
+        `user_agent.learn.find_user_agent`
+    :return: number of written lines
+    """
+
+    if key is None:
+        key = binascii.hexlify(os.urandom(16)).decode("ascii")
+    if jobs is None:
+        jobs = get_cpu_count()
+    if max_pending is None:
+        max_pending = 2 * jobs
+    inp = source if hasattr(source, "read") else open_log(source, "r")
+    try:
+        out = target if hasattr(target, "write") else open_log(target, "w")
+        try:
+            total = 0
+            for count, data in iter_anonymized(
+                iter_chunks(inp, chunk_size),
+                key,
+                jobs,
+                cache_size,
+                field,
+                max(max_pending, 1),
+            ):
+                out.write(data)
+                total += count
+            return total
+        finally:
+            if out is not target:
+                out.close()
+    finally:
+        if inp is not source:
+            inp.close()
+
+
+def main(args=None):
+    from argparse import ArgumentParser # pylint: disable=import-outside-toplevel
+    import sys # pylint: disable=import-outside-toplevel
+
+    parser = ArgumentParser(prog="ua anonymize")
+    parser.add_argument("source", help='access log, "-" is stdin')
+    parser.add_argument("target", help='anonymized log, "-" is stdout')
+    parser.add_argument(
+        "-k",
+        "--key",
+        default=os.environ.get("UA_ANONYMIZE_KEY"),
+        help="secret salt of the mapping, UA_ANONYMIZE_KEY environment"
+        " variable by default, random if not given",
+    )
+    parser.add_argument("-j", "--jobs", type=int)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    parser.add_argument(
+        "--field",
+        type=int,
+        default=UA_FIELD,
+        help="index of user agent in lines split by double quotes,"
+        " %(default)s in combined log format",
+    )
+    opts = parser.parse_args(args)
+    source, target = opts.source, opts.target
+    if source == "-":
+        source = open_log(sys.stdin.fileno(), "r", closefd=False)
+    if target == "-":
+        target = open_log(sys.stdout.fileno(), "w", closefd=False)
+    anonymize_log(
+        source,
+        target,
+        key=opts.key,
+        jobs=opts.jobs,
+        chunk_size=opts.chunk_size,
+        cache_size=opts.cache_size,
+        field=opts.field,
+    )
+    if target is not opts.target:
+        target.flush()
@@ -9,6 +9,11 @@ Functions:
 * generate_navigator:  generates web navigator's config
 * generate_navigator_js:  generates web navigator's config with keys
     identical keys used in navigator object
+* ua_for_key: generates User-Agent HTTP header bound to the given key
+* navigator_for_key: generates web navigator's config bound to the given key
+* generate_stratified: generates batch of configs with exact proportions
+* generate_headers: generates HTTP request headers matching generated config
+* generate_batch: generates list of configs drawing random values in bulk
 
 FIXME:
 * add Edge, Safari and Opera support
@@ -34,21 +39,43 @@ Lists of user agents:
 """
 # pylint: enable=line-too-long
 
-from random import choice, randint
+import random
+import hashlib
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 from itertools import product
+from operator import itemgetter
 
 import six
 
 from .warning import warn
 
 # pylint: disable=unused-import
-from .device import SMARTPHONE_DEV_IDS, TABLET_DEV_IDS
+from .device import (
+    SMARTPHONE_DEV_IDS,
+    TABLET_DEV_IDS,
+    SMARTPHONE_DEV_EXT,
+    TABLET_DEV_EXT,
+)
 
 # pylint: enable=unused-import
 from .error import InvalidOption
 
-__all__ = ["generate_user_agent", "generate_navigator", "generate_navigator_js"]
+# Object collecting per-stage timings, see `user_agent.instrument` module
+_INSTRUMENTATION = None
+# Registry counting generated configs, see `user_agent.metrics` module
+_METRICS = None
+
+__all__ = [
+    "generate_user_agent",
+    "generate_navigator",
+    "generate_navigator_js",
+    "ua_for_key",
+    "navigator_for_key",
+    "generate_stratified",
+    "generate_headers",
+    "generate_batch",
+]
 
 
 DEVICE_TYPE_OS = {
@@ -628,6 +655,78 @@ IE_VERSION = (
     (10, "MSIE 10.0", "6.0"),  # 2012
     (11, "MSIE 11.0", "7.0"),  # 2013
 )
+# Stable release dates of CHROME_BUILD major versions
+# from https://en.wikipedia.org/wiki/Google_Chrome_version_history
+CHROME_RELEASE_DATE = {
+    49: datetime(2016, 3, 2),
+    50: datetime(2016, 4, 13),
+    51: datetime(2016, 5, 25),
+    52: datetime(2016, 7, 20),
+    53: datetime(2016, 8, 31),
+    54: datetime(2016, 10, 12),
+    55: datetime(2016, 12, 1),
+    56: datetime(2017, 1, 25),
+    57: datetime(2017, 3, 9),
+    58: datetime(2017, 4, 19),
+    59: datetime(2017, 6, 5),
+    60: datetime(2017, 7, 25),
+    61: datetime(2017, 9, 5),
+    62: datetime(2017, 10, 17),
+    63: datetime(2017, 12, 6),
+    64: datetime(2018, 1, 24),
+    65: datetime(2018, 3, 6),
+    66: datetime(2018, 4, 17),
+    67: datetime(2018, 5, 29),
+    68: datetime(2018, 7, 24),
+    69: datetime(2018, 9, 4),
+    70: datetime(2018, 10, 16),
+    71: datetime(2018, 12, 4),
+    72: datetime(2019, 1, 29),
+    73: datetime(2019, 3, 12),
+    74: datetime(2019, 4, 23),
+    75: datetime(2019, 6, 4),
+    76: datetime(2019, 7, 30),
+    77: datetime(2019, 9, 10),
+    78: datetime(2019, 10, 22),
+    79: datetime(2019, 12, 10),
+    80: datetime(2020, 2, 4),
+    81: datetime(2020, 4, 7),
+    83: datetime(2020, 5, 19),
+    84: datetime(2020, 7, 14),
+    85: datetime(2020, 8, 25),
+    86: datetime(2020, 10, 6),
+    87: datetime(2020, 11, 17),
+}
+IE_RELEASE_DATE = {
+    8: datetime(2009, 3, 19),
+    9: datetime(2011, 3, 14),
+    10: datetime(2012, 10, 26),
+    11: datetime(2013, 10, 17),
+}
+# Release dates of Android entries of OS_PLATFORM
+ANDROID_RELEASE_DATE = {
+    "Android 4.4": datetime(2013, 10, 31),
+    "Android 4.4.1": datetime(2013, 12, 5),
+    "Android 4.4.2": datetime(2013, 12, 9),
+    "Android 4.4.3": datetime(2014, 6, 2),
+    "Android 4.4.4": datetime(2014, 6, 19),
+    "Android 5.0": datetime(2014, 11, 12),
+    "Android 5.0.1": datetime(2014, 12, 2),
+    "Android 5.0.2": datetime(2014, 12, 19),
+    "Android 5.1": datetime(2015, 3, 9),
+    "Android 5.1.1": datetime(2015, 4, 21),
+    "Android 6.0": datetime(2015, 10, 5),
+    "Android 6.0.1": datetime(2015, 12, 7),
+    "Android 7.0": datetime(2016, 8, 22),
+    "Android 7.1": datetime(2016, 10, 4),
+    "Android 7.1.1": datetime(2016, 12, 5),
+    "Android 7.1.2": datetime(2016, 12, 5),
+    "Android 8.0": datetime(2017, 8, 21),
+    "Android 8.1": datetime(2017, 12, 5),
+    "Android 9": datetime(2018, 8, 6),
+    "Android 10": datetime(2019, 9, 3),
+    "Android 11": datetime(2020, 9, 8),
+}
 USER_AGENT_TEMPLATE = {
     "firefox": (
         "Mozilla/5.0"
@@ -665,29 +764,282 @@ USER_AGENT_TEMPLATE = {
     ),
 }
 
+# Declarative rules of config generation compiled by `build_engines`.
+# Rules of config variant (device_type, os_id, navigator_id) are merged
+# from OS_RULES[os_id], NAVIGATOR_RULES[navigator_id] and
+# VARIANT_RULES[variant], later ones override earlier ones.
+#
+# System rules "platform", "ua_platform" and "oscpu" are format strings
+# with fields:
+# * platform_version: entry of OS_PLATFORM
+# * cpu: entry of OS_CPU formatted with "cpu" rule, empty if entry is empty
+# * os_version: version taken from platform_version, see "os_version" rule
+#   ("mac": "10.8", "mac_minor": "10_8_2", minor from
+#   MACOSX_CHROME_BUILD_RANGE)
+# * device_id: id of random device supporting the platform version, only
+#   if "device" rule is set
+# Navigator rules: "versions" is a version source (see VERSION_SOURCES)
+# reading "table", "template" is a key of USER_AGENT_TEMPLATE, "name",
+# "product_sub" and "vendor" are copied into the config, "geckotrail"
+# is formatted with build_version field, "app_version" is formatted with
+# fields app_version_token (the OS rule formatted with platform_version)
+# and ua_tail (user agent without "Mozilla/" prefix). "since_version" is
+# a tuple of (first major version, rules overridden since that version).
+OS_RULES = {
+    "win": {
+        "cpu": "; {}",
+        "platform": "{platform_version}{cpu}",
+        "ua_platform": "{platform_version}{cpu}",
+        "oscpu": "{platform_version}{cpu}",
+        "app_version_token": "Windows",
+    },
+    "linux": {
+        "cpu": " {}",
+        "platform": "{platform_version}{cpu}",
+        "ua_platform": "{platform_version}{cpu}",
+        "oscpu": "Linux{cpu}",
+        "app_version_token": "X11",
+    },
+    "mac": {
+        "cpu": "{}",
+        "os_version": "mac",
+        "platform": "MacIntel",
+        "ua_platform": "Macintosh; Intel Mac OS X {os_version}",
+        "oscpu": "Intel Mac OS X {os_version}",
+        "app_version_token": "Macintosh",
+    },
+    "android": {
+        "cpu": "{}",
+        "platform": "Linux {cpu}",
+        "ua_platform": "{platform_version}",
+        "oscpu": "Linux {cpu}",
+        "app_version_token": "{platform_version}",
+    },
+}
+NAVIGATOR_RULES = {
+    "firefox": {
+        "versions": "firefox",
+        "table": "FIREFOX_VERSION",
+        "template": "firefox",
+        "name": "Netscape",
+        "product_sub": "20100101",
+        "vendor": "",
+        "geckotrail": "20100101",
+        "app_version": "5.0 ({app_version_token})",
+    },
+    "chrome": {
+        "versions": "chrome",
+        "table": "CHROME_BUILD",
+        "template": "chrome",
+        "name": "Netscape",
+        "product_sub": "20030107",
+        "vendor": "Google Inc.",
+        "app_version": "{ua_tail}",
+    },
+    "ie": {
+        "versions": "ie",
+        "table": "IE_VERSION",
+        "template": "ie_less_11",
+        "name": "Microsoft Internet Explorer",
+        "product_sub": None,
+        "vendor": "",
+        "app_version": "{ua_tail}",
+        "since_version": ((11, {"template": "ie_11", "name": "Netscape"}),),
+    },
+}
+VARIANT_RULES = {
+    ("desktop", "mac", "chrome"): {"os_version": "mac_minor"},
+    ("smartphone", "android", "firefox"): {
+        "ua_platform": "{platform_version}; Mobile",
+        "geckotrail": "{build_version}",
+    },
+    ("tablet", "android", "firefox"): {
+        "ua_platform": "{platform_version}; Tablet",
+        "geckotrail": "{build_version}",
+    },
+    ("smartphone", "android", "chrome"): {
+        "device": True,
+        "ua_platform": "Linux; {platform_version}; {device_id}",
+        "template": "chrome_smartphone",
+    },
+    ("tablet", "android", "chrome"): {
+        "device": True,
+        "ua_platform": "Linux; {platform_version}; {device_id}",
+        "template": "chrome_tablet",
+    },
+}
+
+
+# Values of request headers: list of (first major version, value),
+# the last item which version is not greater than browser version is used
+ACCEPT = {
+    "chrome": (
+        (
+            0,
+            "text/html,application/xhtml+xml,application/xml;q=0.9,"
+            "image/webp,image/apng,*/*;q=0.8",
+        ),
+        (
+            73,
+            "text/html,application/xhtml+xml,application/xml;q=0.9,"
+            "image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3",
+        ),
+        (
+            76,
+            "text/html,application/xhtml+xml,application/xml;q=0.9,"
+            "image/webp,image/apng,*/*;q=0.8,"
+            "application/signed-exchange;v=b3;q=0.9",
+        ),
+        (
+            85,
+            "text/html,application/xhtml+xml,application/xml;q=0.9,"
+            "image/avif,image/webp,image/apng,*/*;q=0.8,"
+            "application/signed-exchange;v=b3;q=0.9",
+        ),
+    ),
+    "firefox": (
+        (0, "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"),
+        (
+            65,
+            "text/html,application/xhtml+xml,application/xml;q=0.9,"
+            "image/webp,*/*;q=0.8",
+        ),
+    ),
+    "ie": (
+        (
+            0,
+            "image/gif, image/jpeg, image/pjpeg, application/x-ms-application,"
+            " application/xaml+xml, application/x-ms-xbap, */*",
+        ),
+        (9, "text/html, application/xhtml+xml, */*"),
+    ),
+}
+ACCEPT_ENCODING = {
+    "chrome": (
+        (0, "gzip, deflate, sdch"),
+        (50, "gzip, deflate, sdch, br"),
+        (59, "gzip, deflate, br"),
+    ),
+    "firefox": ((0, "gzip, deflate"), (44, "gzip, deflate, br")),
+    "ie": ((0, "gzip, deflate"),),
+}
+ACCEPT_LANGUAGE = {
+    "chrome": "{language},{base_language};q=0.9",
+    "firefox": "{language},{base_language};q=0.5",
+    "ie": "{language}",
+}
+# Order of request headers: list of (name, first major version sending it)
+HEADER_ORDER = {
+    "chrome": (
+        ("Connection", 0),
+        ("sec-ch-ua", 89),
+        ("sec-ch-ua-mobile", 89),
+        ("Upgrade-Insecure-Requests", 0),
+        ("User-Agent", 0),
+        ("Accept", 0),
+        ("Sec-Fetch-Site", 76),
+        ("Sec-Fetch-Mode", 76),
+        ("Sec-Fetch-User", 76),
+        ("Sec-Fetch-Dest", 80),
+        ("Accept-Encoding", 0),
+        ("Accept-Language", 0),
+    ),
+    "firefox": (
+        ("User-Agent", 0),
+        ("Accept", 0),
+        ("Accept-Language", 0),
+        ("Accept-Encoding", 0),
+        ("Connection", 0),
+        ("Upgrade-Insecure-Requests", 48),
+    ),
+    "ie": (
+        ("Accept", 0),
+        ("Accept-Language", 0),
+        ("User-Agent", 0),
+        ("Accept-Encoding", 0),
+        ("Connection", 0),
+    ),
+}
+STATIC_HEADERS = {
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-User": "?1",
+    "Sec-Fetch-Dest": "document",
+    "sec-ch-ua": (
+        '" Not A;Brand";v="99", "Chromium";v="{major}",'
+        ' "Google Chrome";v="{major}"'
+    ),
+}
+
+
+# (table, {release date: date of next release}) built for FIREFOX_VERSION
+_FIREFOX_NEXT_DATE = (None, None)
+
+
+def get_firefox_next_release_date(date_from):
+    """
+    Return date of the first Firefox release made after `date_from`
+
+    FIREFOX_VERSION is not sorted by date: ESR releases go along
+    with regular ones.
+    """
 
-def get_firefox_build():
-    build_ver, date_from = choice(FIREFOX_VERSION)
+    global _FIREFOX_NEXT_DATE # pylint: disable=global-statement
+    table, next_dates = _FIREFOX_NEXT_DATE
+    if table is not FIREFOX_VERSION:
+        _FIREFOX_NEXT_DATE = build_firefox_next_dates(globals())
+        table, next_dates = _FIREFOX_NEXT_DATE
     try:
-        idx = FIREFOX_VERSION.index((build_ver, date_from))
-        _, date_to = FIREFOX_VERSION[idx + 1]
-    except IndexError:
-        date_to = date_from + timedelta(days=1)
-    sec_range = (date_to - date_from).total_seconds() - 1
-    build_rnd_time = date_from + timedelta(seconds=randint(0, max(sec_range, 100000)))
+        return next_dates[date_from]
+    except KeyError:
+        return date_from + timedelta(days=1)
+
+
+def build_firefox_next_dates(ns):
+    """
+    Build value of `_FIREFOX_NEXT_DATE` from FIREFOX_VERSION of `ns` dict
+    """
+
+    table = ns["FIREFOX_VERSION"]
+    dates = sorted(set(x[1] for x in table))
+    return table, dict(zip(dates, dates[1:]))
+
+
+def choose_weighted(rng, entries, cum_weights=None):
+    """
+    Choose item of `entries` using list of cumulative weights, uniform
+    choice if `cum_weights` is None
+    """
+
+    if cum_weights is None:
+        return rng.choice(entries)
+    return entries[bisect_right(cum_weights, rng.random() * cum_weights[-1])]
+
+
+def get_firefox_build(rng=random, builds=None, cum_weights=None):
+    build_ver, date_from = choose_weighted(
+        rng, FIREFOX_VERSION if builds is None else builds, cum_weights
+    )
+    date_to = get_firefox_next_release_date(date_from)
+    sec_range = int((date_to - date_from).total_seconds()) - 1
+    build_rnd_time = date_from + timedelta(seconds=rng.randint(0, sec_range))
     return build_ver, build_rnd_time.strftime("%Y%m%d%H%M%S")
 
 
-def get_chrome_build():
-    build = choice(CHROME_BUILD)
+def get_chrome_build(rng=random, builds=None, cum_weights=None):
+    build = choose_weighted(
+        rng, CHROME_BUILD if builds is None else builds, cum_weights
+    )
     return "%d.0.%d.%d" % (
         build[0],
-        randint(build[1], build[2]),
-        randint(0, 120),
+        rng.randint(build[1], build[2]),
+        rng.randint(0, 120),
     )
 
 
-def get_ie_build():
+def get_ie_build(rng=random, builds=None, cum_weights=None):
     """
     Return random IE version as tuple
     (numeric_version, us-string component)
@@ -695,7 +1047,7 @@ def get_ie_build():
     Example: (8, 'MSIE 8.0')
     """
 
-    return choice(IE_VERSION)
+    return choose_weighted(rng, IE_VERSION if builds is None else builds, cum_weights)
 
 
 MACOSX_CHROME_BUILD_RANGE = {
@@ -712,7 +1064,7 @@ MACOSX_CHROME_BUILD_RANGE = {
 }
 
 
-def fix_chrome_mac_platform(platform):
+def fix_chrome_mac_platform(platform, rng=random, build_ranges=None):
     """
     Chrome on Mac OS adds minor version number and uses underscores instead
     of dots. E.g. platform for Firefox will be: 'Intel Mac OS X 10.11'
@@ -722,127 +1074,569 @@ def fix_chrome_mac_platform(platform):
     :return: platform with version number including minor number and formatted
     with underscores, e.g. "Macintosh; Intel Mac OS X 10_8_2"
     """
+    if build_ranges is None:
+        build_ranges = MACOSX_CHROME_BUILD_RANGE
     ver = platform.split("OS X ")[1]
-    build_range = range(*MACOSX_CHROME_BUILD_RANGE[ver])
-    build = choice(build_range)
+    build_range = range(*build_ranges[ver])
+    build = rng.choice(build_range)
     mac_ver = ver.replace(".", "_") + "_" + str(build)
     return "Macintosh; Intel Mac OS X %s" % mac_ver
 
 
-def build_system_components(device_type, os_id, navigator_id):
+def build_system_components(
+    device_type, os_id, navigator_id, rng=random, spec=None
+):
     """
     For given os_id build random platform and oscpu
     components
 
     Returns dict {platform_version, platform, ua_platform, oscpu}
 
+    If `spec` (see `compile_filters`) is given platform versions are
+    chosen from the entries allowed by it.
+
     platform_version is OS name used in different places
     ua_platform goes to navigator.platform
     platform is used in building navigator.userAgent
     oscpu goes to navigator.oscpu
     """
 
-    if os_id == "win":
-        platform_version = choice(OS_PLATFORM["win"])
-        cpu = choice(OS_CPU["win"])
-        if cpu:
-            platform = "%s; %s" % (platform_version, cpu)
-        else:
-            platform = platform_version
-        res = {
-            "platform_version": platform_version,
-            "platform": platform,
-            "ua_platform": platform,
-            "oscpu": platform,
-        }
-    elif os_id == "linux":
-        cpu = choice(OS_CPU["linux"])
-        platform_version = choice(OS_PLATFORM["linux"])
-        platform = "%s %s" % (platform_version, cpu)
-        res = {
-            "platform_version": platform_version,
-            "platform": platform,
-            "ua_platform": platform,
-            "oscpu": "Linux %s" % cpu,
-        }
-    elif os_id == "mac":
-        cpu = choice(OS_CPU["mac"])
-        platform_version = choice(OS_PLATFORM["mac"])
-        platform = platform_version
-        if navigator_id == "chrome":
-            platform = fix_chrome_mac_platform(platform)
-        res = {
-            "platform_version": platform_version,
-            "platform": "MacIntel",
-            "ua_platform": platform,
-            "oscpu": "Intel Mac OS X %s" % platform.split(" ")[-1],
-        }
-    elif os_id == "android":
-        assert navigator_id in ("firefox", "chrome")
-        assert device_type in ("smartphone", "tablet")
-        platform_version = choice(OS_PLATFORM["android"])
-        if navigator_id == "firefox":
-            if device_type == "smartphone":
-                ua_platform = "%s; Mobile" % platform_version
-            elif device_type == "tablet":
-                ua_platform = "%s; Tablet" % platform_version
-        elif navigator_id == "chrome":
-            device_id = choice(SMARTPHONE_DEV_IDS)
-            ua_platform = "Linux; %s; %s" % (platform_version, device_id)
-        oscpu = "Linux %s" % choice(OS_CPU["android"])
-        res = {
-            "platform_version": platform_version,
-            "ua_platform": ua_platform,
-            "platform": oscpu,
-            "oscpu": oscpu,
-        }
-    return res
+    engine, platforms, _, _ = get_plan(device_type, os_id, navigator_id, spec)
+    return dict(engine.get_system(*engine.draw_system(rng, platforms)))
 
 
-def build_app_components(os_id, navigator_id):
+def build_app_components(os_id, navigator_id, rng=random, spec=None):
     """
     For given navigator_id build app features
 
     Returns dict {name, product_sub, vendor, build_version, build_id}
+
+    If `spec` (see `compile_filters`) is given browser versions are
+    chosen from the entries allowed by it.
+    """
+
+    engine, _, builds, cum_weights = get_plan(None, os_id, navigator_id, spec)
+    return engine.get_app(*engine.draw_app(rng, builds, cum_weights))
+
+
+# Device types which device id is put into Chrome user agent
+DEVICE_TYPES_WITH_ID = ("smartphone", "tablet")
+# (tables, {device_type: {Android entry of OS_PLATFORM: tuple of devices}},
+#  {device_type: Android entries of OS_PLATFORM having devices})
+_DEVICE_INDEX = ((), None, None)
+
+
+def get_device_index():
+    """
+    Return dict {device_type: {Android entry of OS_PLATFORM: devices}}
+    built from SMARTPHONE_DEV_EXT and TABLET_DEV_EXT
+
+    Device is a dict {dev_id, name, released, resolution} listed for
+    every Android version between the first and the last version supported
+    by the device. Android versions without devices are omitted.
+    """
+
+    return get_device_tables()[0]
+
+
+def get_device_tables():
+    global _DEVICE_INDEX # pylint: disable=global-statement
+    tables, index, platforms = _DEVICE_INDEX
+    if tables_changed(tables):
+        _DEVICE_INDEX = build_device_tables(globals())
+        tables, index, platforms = _DEVICE_INDEX
+    return index, platforms
+
+
+def build_device_tables(ns):
+    """
+    Build value of `_DEVICE_INDEX` from tables of `ns` dict
+    """
+
+    android_platforms = ns["OS_PLATFORM"]["android"]
+    index = {}
+    platforms = {}
+    for device_type, devices in zip(
+        DEVICE_TYPES_WITH_ID, (ns["SMARTPHONE_DEV_EXT"], ns["TABLET_DEV_EXT"])
+    ):
+        ranges = []
+        for item in devices:
+            low, high = [
+                pad_version(parse_version(x.lstrip("v")), 3)
+                for x in item["android_versionss"]
+            ]
+            for dev_id in item["dev_ids"]:
+                device = {
+                    "dev_id": dev_id,
+                    "name": item["name"],
+                    "released": item["released"],
+                    "resolution": tuple(item["resolution"]),
+                }
+                ranges.append((low, high, device))
+        index[device_type] = by_version = {}
+        for entry in android_platforms:
+            version = pad_version(get_entry_version("os", entry), 3)
+            found = tuple(x[2] for x in ranges if x[0] <= version <= x[1])
+            if found:
+                by_version[entry] = found
+        platforms[device_type] = tuple(
+            x for x in android_platforms if x in by_version
+        )
+    return get_tables(ns), index, platforms
+
+
+def get_device_platforms(device_type):
+    """
+    Return Android entries of OS_PLATFORM supported by devices
+    of `device_type`
+    """
+
+    return get_device_tables()[1][device_type]
+
+
+class ChromeVersions(object):
+    """
+    Chrome versions "major.0.build.patch" built from CHROME_BUILD entries
+    (major, first build, last build), patch is in range 0..120
+
+    Version sources give for every entry of their table the number of
+    random variants (`sizes`), its major version and the fields of app
+    components which do not depend on the random variant, `parse` finds
+    positions of a rendered version.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.sizes = tuple((x[2] - x[1] + 1) * 121 for x in table)
+        self._positions = dict((x[0], pos) for pos, x in enumerate(table))
+
+    def major(self, pos):
+        return self.table[pos][0]
+
+    def fields(self, pos): # pylint: disable=unused-argument
+        return {}
+
+    def render(self, pos, detail):
+        """
+        Return (build_version, build_id) of random variant `detail`
+        of the entry at `pos`
+        """
+
+        major, build, _ = self.table[pos]
+        return "%d.0.%d.%d" % (major, build + detail // 121, detail % 121), None
+
+    def parse(self, build_version, build_id): # pylint: disable=unused-argument
+        """
+        Return (pos, detail) which `render` could turn into `build_version`
+        and `build_id` or None, the result should be checked with `render`
+        """
+
+        try:
+            major, _, build, patch = [int(x) for x in build_version.split(".")]
+        except (AttributeError, ValueError):
+            return None
+        pos = self._positions.get(major)
+        if pos is None:
+            return None
+        detail = (build - self.table[pos][1]) * 121 + patch
+        if not 0 <= patch < 121 or not 0 <= detail < self.sizes[pos]:
+            return None
+        return pos, detail
+
+
+class FirefoxVersions(object):
+    """
+    Firefox versions built from FIREFOX_VERSION entries (version, release
+    date), build id is a random time before the next release
+    """
+
+    def __init__(self, table):
+        self.table = table
+        next_dates = build_firefox_next_dates({"FIREFOX_VERSION": table})[1]
+        self.sizes = tuple(
+            int(
+                (
+                    next_dates.get(date, date + timedelta(days=1)) - date
+                ).total_seconds()
+            )
+            for _, date in table
+        )
+        self._positions = dict((x[0], pos) for pos, x in enumerate(table))
+
+    def major(self, pos):
+        return int(self.table[pos][0].split(".")[0])
+
+    def fields(self, pos): # pylint: disable=unused-argument
+        return {}
+
+    def render(self, pos, detail):
+        build_version, date = self.table[pos]
+        build_id = (date + timedelta(seconds=detail)).strftime("%Y%m%d%H%M%S")
+        return build_version, build_id
+
+    def parse(self, build_version, build_id):
+        try:
+            pos = self._positions[build_version]
+            time = datetime(
+                int(build_id[:4]),
+                int(build_id[4:6]),
+                int(build_id[6:8]),
+                int(build_id[8:10]),
+                int(build_id[10:12]),
+                int(build_id[12:14]),
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+        delta = time - self.table[pos][1]
+        detail = delta.days * 86400 + delta.seconds
+        if not 0 <= detail < self.sizes[pos]:
+            return None
+        return pos, detail
+
+
+class IEVersions(object):
+    """
+    IE versions built from IE_VERSION entries (numeric version,
+    user agent component, trident version)
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.sizes = (1,) * len(table)
+        self._positions = dict((x[1], pos) for pos, x in enumerate(table))
+
+    def major(self, pos):
+        return self.table[pos][0]
+
+    def fields(self, pos):
+        return {"trident_version": self.table[pos][2]}
+
+    def render(self, pos, detail): # pylint: disable=unused-argument
+        return self.table[pos][1], None
+
+    def parse(self, build_version, build_id): # pylint: disable=unused-argument
+        try:
+            return self._positions[build_version], 0
+        except (KeyError, TypeError):
+            return None
+
+
+# Sources of browser versions used by "versions" navigator rule
+VERSION_SOURCES = {
+    "chrome": ChromeVersions,
+    "firefox": FirefoxVersions,
+    "ie": IEVersions,
+}
+
+
+class VariantEngine(object):
+    """
+    Generation rules of one config variant compiled by `build_engines`
+
+    Config is generated in two steps: `draw` chooses random positions
+    in the tables, `render` builds the config from them. Rendered system
+    components are cached by positions, so the rules are formatted once
+    for every combination of platform, cpu and device.
     """
 
-    if navigator_id == "firefox":
-        build_version, build_id = get_firefox_build()
-        if os_id in ("win", "linux", "mac"):
-            geckotrail = "20100101"
+    def __init__(self, variant, rules, ns, device_index):
+        self.variant = variant
+        self.device_type, self.os_id, self.navigator_id = variant
+        self.platforms = ns["OS_PLATFORM"][self.os_id]
+        self.cpus = tuple(
+            rules["cpu"].format(x) if x else "" for x in ns["OS_CPU"][self.os_id]
+        )
+        self.system_rules = (rules["platform"], rules["ua_platform"], rules["oscpu"])
+        self.os_versions = self.minor_ranges = self.devices = None
+        if rules.get("os_version") in ("mac", "mac_minor"):
+            self.os_versions = tuple(x.split("OS X ")[1] for x in self.platforms)
+            if rules["os_version"] == "mac_minor":
+                ranges = ns["MACOSX_CHROME_BUILD_RANGE"]
+                self.minor_ranges = tuple(ranges[x] for x in self.os_versions)
+                self.os_versions = tuple(x.replace(".", "_") for x in self.os_versions)
+        if rules.get("device"):
+            devices = device_index[self.device_type]
+            self.devices = tuple(devices.get(x, ()) for x in self.platforms)
+            self.default_platforms = tuple(
+                pos for pos, x in enumerate(self.devices) if x
+            )
         else:
-            geckotrail = build_version
-        res = {
-            "name": "Netscape",
-            "product_sub": "20100101",
-            "vendor": "",
-            "build_version": build_version,
-            "build_id": build_id,
-            "geckotrail": geckotrail,
-        }
-    elif navigator_id == "chrome":
-        res = {
-            "name": "Netscape",
-            "product_sub": "20030107",
-            "vendor": "Google Inc.",
-            "build_version": get_chrome_build(),
-            "build_id": None,
-        }
-    elif navigator_id == "ie":
-        num_ver, build_version, trident_version = get_ie_build()
-        if num_ver >= 11:
-            app_name = "Netscape"
+            self.default_platforms = tuple(range(len(self.platforms)))
+        self._systems = {}
+
+        self.versions = VERSION_SOURCES[rules["versions"]](ns[rules["table"]])
+        self.default_builds = tuple(range(len(self.versions.table)))
+        self.geckotrail = rules.get("geckotrail")
+        self.app_fields = []
+        self.templates = []
+        for pos in self.default_builds:
+            entry_rules = dict(rules)
+            for first, overrides in rules.get("since_version", ()):
+                if self.versions.major(pos) >= first:
+                    entry_rules.update(overrides)
+            fields = self.versions.fields(pos)
+            for key in ("name", "product_sub", "vendor"):
+                fields[key] = entry_rules[key]
+            self.app_fields.append(fields)
+            self.templates.append(ns["USER_AGENT_TEMPLATE"][entry_rules["template"]])
+        # templates of build versions if template depends on version
+        self.version_templates = None
+        if len(set(self.templates)) > 1:
+            self.version_templates = dict(
+                (self.versions.render(pos, 0)[0], self.templates[pos])
+                for pos in self.default_builds
+            )
+
+        self.app_version = rules["app_version"]
+        self.app_version_token = rules["app_version_token"]
+        # appVersion of platform versions if it does not depend on user agent
+        self.app_versions = None
+        if "{ua_tail}" not in self.app_version:
+            self.app_versions = tuple(
+                self.format_app_version(x, None) for x in self.platforms
+            )
+
+    def draw_system(self, rng, platforms):
+        """
+        Return random positions (platform, cpu, detail), detail is
+        the minor version of Mac or the position of device
+        """
+
+        platform = rng.choice(platforms)
+        cpu = rng.randrange(len(self.cpus)) if len(self.cpus) > 1 else 0
+        if self.minor_ranges is not None:
+            detail = rng.randrange(*self.minor_ranges[platform])
+        elif self.devices is not None:
+            detail = rng.randrange(len(self.devices[platform]))
+        else:
+            detail = 0
+        return platform, cpu, detail
+
+    def draw_app(self, rng, builds, cum_weights=None):
+        """
+        Return random positions (build, detail), detail is the random
+        variant of the version, see `VERSION_SOURCES`
+        """
+
+        build = choose_weighted(rng, builds, cum_weights)
+        size = self.versions.sizes[build]
+        return build, rng.randrange(size) if size > 1 else 0
+
+    def draw(self, rng, platforms, builds, cum_weights=None):
+        """
+        Return random positions (platform, cpu, detail, build, build detail)
+        choosing platforms and builds from given lists of positions
+        """
+
+        return self.draw_system(rng, platforms) + self.draw_app(
+            rng, builds, cum_weights
+        )
+
+    def draw_many(self, rng, count, platforms, builds, cum_weights=None):
+        """
+        Return list of `count` results of `draw`
+
+        If `rng` has bulk methods randbelow_many, randbelow_each and
+        random_many (see `user_agent.bulkrand.BulkRandom`) positions of
+        the whole batch are drawn with a few bulk calls.
+        """
+
+        if not hasattr(rng, "randbelow_each"):
+            return [
+                self.draw(rng, platforms, builds, cum_weights) for _ in range(count)
+            ]
+        platform_list = [
+            platforms[x] for x in rng.randbelow_many(len(platforms), count)
+        ]
+        if len(self.cpus) > 1:
+            cpus = rng.randbelow_many(len(self.cpus), count)
+        else:
+            cpus = [0] * count
+        if self.minor_ranges is not None:
+            ranges = [self.minor_ranges[x] for x in platform_list]
+            details = [
+                x[0] + y
+                for x, y in zip(ranges, rng.randbelow_each([x[1] - x[0] for x in ranges]))
+            ]
+        elif self.devices is not None:
+            details = rng.randbelow_each([len(self.devices[x]) for x in platform_list])
         else:
-            app_name = "Microsoft Internet Explorer"
-        res = {
-            "name": app_name,
-            "product_sub": None,
-            "vendor": "",
-            "build_version": build_version,
-            "build_id": None,
-            "trident_version": trident_version,
+            details = [0] * count
+        if cum_weights is None:
+            build_list = [builds[x] for x in rng.randbelow_many(len(builds), count)]
+        else:
+            total = cum_weights[-1]
+            build_list = [
+                builds[bisect_right(cum_weights, x * total)]
+                for x in rng.random_many(count)
+            ]
+        sizes = self.versions.sizes
+        build_details = rng.randbelow_each([sizes[x] for x in build_list])
+        return list(zip(platform_list, cpus, details, build_list, build_details))
+
+    def get_system(self, platform, cpu, detail):
+        """
+        Return system components for the positions, the dict is shared
+        between calls and must not be changed
+        """
+
+        key = (platform, cpu, detail)
+        try:
+            return self._systems[key]
+        except KeyError:
+            pass
+        platform_version = self.platforms[platform]
+        fields = {
+            "platform_version": platform_version,
+            "cpu": self.cpus[cpu],
+            "os_version": "",
+            "device_id": "",
         }
-    return res
+        if self.minor_ranges is not None:
+            fields["os_version"] = "%s_%d" % (self.os_versions[platform], detail)
+        elif self.os_versions is not None:
+            fields["os_version"] = self.os_versions[platform]
+        if self.devices is not None:
+            fields["device_id"] = self.devices[platform][detail]["dev_id"]
+        system = dict(
+            zip(
+                ("platform", "ua_platform", "oscpu"),
+                (x.format(**fields) for x in self.system_rules),
+            )
+        )
+        system["platform_version"] = platform_version
+        self._systems[key] = system
+        return system
+
+    def get_app(self, build, detail):
+        app = dict(self.app_fields[build])
+        app["build_version"], app["build_id"] = self.versions.render(build, detail)
+        if self.geckotrail is not None:
+            app["geckotrail"] = self.geckotrail.format(
+                build_version=app["build_version"]
+            )
+        return app
+
+    def get_template(self, build_version):
+        if self.version_templates is None:
+            return self.templates[0]
+        return self.version_templates[build_version]
+
+    def format_app_version(self, platform_version, user_agent):
+        ua_tail = None
+        if user_agent is not None:
+            assert user_agent.startswith("Mozilla/")
+            ua_tail = user_agent.split("Mozilla/", 1)[1]
+        return self.app_version.format(
+            ua_tail=ua_tail,
+            app_version_token=self.app_version_token.format(
+                platform_version=platform_version
+            ),
+        )
+
+    def get_app_version(self, platform, user_agent):
+        """
+        Return appVersion of config with platform at position `platform`
+        """
+
+        if self.app_versions is not None:
+            return self.app_versions[platform]
+        if self.app_version == "{ua_tail}":
+            return user_agent[8:]
+        return self.format_app_version(None, user_agent)
+
+    def render(self, platform, cpu, detail, build, build_detail):
+        """
+        Build config in `generate_navigator` format from positions
+        returned by `draw`
+        """
+
+        system = self.get_system(platform, cpu, detail)
+        app = self.get_app(build, build_detail)
+        user_agent = self.templates[build].format(system=system, app=app)
+        app_version = self.get_app_version(platform, user_agent)
+        if _METRICS is not None:
+            _METRICS.observe(
+                self.device_type, self.os_id, self.navigator_id, system, app, user_agent
+            )
+        return compose_navigator(
+            self.os_id, self.navigator_id, system, app, user_agent, app_version
+        )
+
+
+# (tables, {variant: VariantEngine}, {variant: default plan})
+_ENGINES = ((), None, None)
+
+
+def get_variant_rules(variant, ns=None):
+    """
+    Return generation rules of (device_type, os_id, navigator_id)
+    merged from OS_RULES, NAVIGATOR_RULES and VARIANT_RULES
+    """
+
+    if ns is None:
+        ns = globals()
+    rules = dict(ns["OS_RULES"][variant[1]])
+    rules.update(ns["NAVIGATOR_RULES"][variant[2]])
+    rules.update(ns["VARIANT_RULES"].get(variant, {}))
+    return rules
+
+
+def get_engines():
+    """
+    Return dict {variant: VariantEngine} of all config variants
+    """
+
+    return get_engine_tables()[0]
+
+
+def get_engine_tables():
+    global _ENGINES # pylint: disable=global-statement
+    tables, engines, plans = _ENGINES
+    if tables_changed(tables):
+        _ENGINES = build_engines(globals())
+        tables, engines, plans = _ENGINES
+    return engines, plans
+
+
+def build_engines(ns):
+    """
+    Build value of `_ENGINES` from tables of `ns` dict
+    """
+
+    device_index = build_device_tables(ns)[1]
+    engines = {}
+    plans = {}
+    for variant in build_variant_masks(ns)[1]:
+        engine = VariantEngine(variant, get_variant_rules(variant, ns), ns, device_index)
+        engines[variant] = engine
+        plans[variant] = (engine, engine.default_platforms, engine.default_builds, None)
+    return get_tables(ns), engines, plans
+
+
+def get_plan(device_type, os_id, navigator_id, spec=None):
+    """
+    Return generation plan (engine, platform positions, build positions,
+    cumulative weights of builds) of the config variant, ids which
+    are None match any variant
+
+    :param spec: optional `FilterSpec`, all variants by default
+    """
+
+    plans = get_engine_tables()[1] if spec is None else spec.plans
+    try:
+        return plans[(device_type, os_id, navigator_id)]
+    except KeyError:
+        pass
+    for variant, plan in plans.items():
+        if all(
+            x is None or x == y
+            for x, y in zip((device_type, os_id, navigator_id), variant)
+        ):
+            return plan
+    raise InvalidOption(
+        "Config variant %s-%s-%s is not allowed" % (device_type, os_id, navigator_id)
+    )
 
 
 def get_option_choices(opt_name, opt_value, default_value, all_choices):
@@ -850,6 +1644,9 @@ def get_option_choices(opt_name, opt_value, default_value, all_choices):
     Generate possible choices for the option `opt_name`
     limited to `opt_value` value with default value
     as `default_value`
+
+    Items prefixed with "!" exclude values, e.g. "!win". If the option
+    contains only exclusions they are removed from `all_choices`.
     """
 
     choices = []
@@ -863,133 +1660,798 @@ def get_option_choices(opt_name, opt_value, default_value, all_choices):
         raise InvalidOption(
             "Option %s has invalid" " value: %s" % (opt_name, opt_value)
         )
+    excluded = [x[1:] for x in choices if x.startswith("!")]
+    if excluded:
+        choices = [x for x in choices if not x.startswith("!")] or all_choices
     if "all" in choices:
         choices = all_choices
-    for item in choices:
+    for item in choices + excluded:
         if item not in all_choices:
             raise InvalidOption(
                 "Choices of option %s contains invalid" " item: %s" % (opt_name, item)
             )
-    return choices
+    return [x for x in choices if x not in excluded]
+
+
+# Name used in min_*/max_* filters: (kind of table, os_id or navigator_id)
+VERSION_FILTER_TARGETS = {
+    "chrome": ("navigator", "chrome"),
+    "firefox": ("navigator", "firefox"),
+    "ie": ("navigator", "ie"),
+    "android": ("os", "android"),
+    "mac": ("os", "mac"),
+    "windows": ("os", "win"),
+}
 
 
-def pick_config_ids(device_type, os, navigator):
+class FilterSpec(object):
     """
-    Select one random pair (device_type, os_id, navigator_id) from
-    all possible combinations matching the given os and
-    navigator filters.
+    Filters compiled by `compile_filters`
 
-    :param os: allowed os(es)
-    :type os: string or list/tuple or None
-    :param navigator: allowed browser engine(s)
-    :type navigator: string or list/tuple or None
-    :param device_type: limit possible oses by device type
-    :type device_type: list/tuple or None, possible values:
-        "desktop", "smartphone", "tablet", "all"
+    variants: list of allowed (device_type, os_id, navigator_id)
+    variant_weights: cumulative weights of `variants` or None if variants
+        are chosen uniformly
+    platforms: {os_id: allowed entries of OS_PLATFORM[os_id]}
+    builds: {navigator_id: allowed entries of CHROME_BUILD,
+        FIREFOX_VERSION or IE_VERSION}
+    weights: {navigator_id: cumulative weights of `builds` entries}, only
+        for navigators which versions are not chosen uniformly
+    device_platforms: {device_type: allowed Android entries of OS_PLATFORM
+        supported by devices of that type}
+    plans: {variant: generation plan}, see `get_plan`
+    tables: tables the spec is built from, see `get_tables`
+
+    Generation with the spec uses only tables referenced by it, so
+    it is not affected by tables replaced in the middle of generation.
     """
 
-    if os is None:
-        default_dev_types = ["desktop"]
-    else:
-        default_dev_types = list(DEVICE_TYPE_OS.keys())
-    dev_type_choices = get_option_choices(
-        "device_type", device_type, default_dev_types, list(DEVICE_TYPE_OS.keys())
-    )
-    os_choices = get_option_choices(
-        "os", os, list(OS_NAVIGATOR.keys()), list(OS_NAVIGATOR.keys())
-    )
-    nav_choices = get_option_choices(
-        "navigator", navigator, list(NAVIGATOR_OS.keys()), list(NAVIGATOR_OS.keys())
+    __slots__ = (
+        "variants",
+        "variant_weights",
+        "platforms",
+        "builds",
+        "weights",
+        "device_platforms",
+        "plans",
+        "tables",
     )
 
-    variants = []
-    for dev, os, nav in product(dev_type_choices, os_choices, nav_choices):
+    def __init__(
+        self,
+        variants,
+        variant_weights,
+        platforms,
+        builds,
+        weights,
+        device_platforms,
+        plans,
+        tables,
+    ):
+        self.variants = variants
+        self.variant_weights = variant_weights
+        self.platforms = platforms
+        self.builds = builds
+        self.weights = weights
+        self.device_platforms = device_platforms
+        self.plans = plans
+        self.tables = tables
 
-        if (
-            os in DEVICE_TYPE_OS[dev]
-            and nav in DEVICE_TYPE_NAVIGATOR[dev]
-            and nav in OS_NAVIGATOR[os]
-        ):
-            variants.append((dev, os, nav))
-    if not variants:
-        raise InvalidOption(
-            "Options device_type, os and navigator" " conflicts with each other"
-        )
-    device_type, os_id, navigator_id = choice(variants)
 
-    assert os_id in OS_PLATFORM
-    assert navigator_id in NAVIGATOR_OS
-    assert device_type in DEVICE_TYPE_OS
+# Tables which compiled filters and indexes are built from
+TABLE_NAMES = (
+    "DEVICE_TYPE_OS",
+    "DEVICE_TYPE_NAVIGATOR",
+    "OS_NAVIGATOR",
+    "NAVIGATOR_OS",
+    "OS_PLATFORM",
+    "CHROME_BUILD",
+    "FIREFOX_VERSION",
+    "IE_VERSION",
+    "CHROME_RELEASE_DATE",
+    "IE_RELEASE_DATE",
+    "ANDROID_RELEASE_DATE",
+    "SMARTPHONE_DEV_EXT",
+    "TABLET_DEV_EXT",
+    "MACOSX_CHROME_BUILD_RANGE",
+    "OS_CPU",
+    "USER_AGENT_TEMPLATE",
+    "OS_RULES",
+    "NAVIGATOR_RULES",
+    "VARIANT_RULES",
+)
+_get_tables = itemgetter(*TABLE_NAMES)
 
-    return device_type, os_id, navigator_id
 
+def get_tables(ns=None):
+    """
+    Return tuple of tables listed in TABLE_NAMES taken from `ns` dict,
+    from the module by default
+    """
 
-def choose_ua_template(device_type, navigator_id, app):
-    tpl_name = navigator_id
-    if navigator_id == "ie":
-        tpl_name = "ie_11" if app["build_version"] == "MSIE 11.0" else "ie_less_11"
-    if navigator_id == "chrome":
-        if device_type == "smartphone":
-            tpl_name = "chrome_smartphone"
-        if device_type == "tablet":
-            tpl_name = "chrome_tablet"
-    return USER_AGENT_TEMPLATE[tpl_name]
+    return _get_tables(globals() if ns is None else ns)
 
 
-def build_navigator_app_version(os_id, navigator_id, platform_version, user_agent):
-    if navigator_id in ("chrome", "ie"):
-        assert user_agent.startswith("Mozilla/")
-        app_version = user_agent.split("Mozilla/", 1)[1]
-    elif navigator_id == "firefox":
-        if os_id == "android":
-            app_version = "5.0 (%s)" % platform_version
-        else:
-            os_token = {
-                "win": "Windows",
-                "mac": "Macintosh",
-                "linux": "X11",
-            }[os_id]
-            app_version = "5.0 (%s)" % os_token
-    return app_version
+def tables_changed(tables):
+    current = get_tables()
+    return len(tables) != len(current) or any(
+        x is not y for x, y in zip(tables, current)
+    )
+
 
+# (tables, list of all variants, {option: {value: bitmask of variants}})
+_VARIANT_MASKS = ((), None, None)
+# {normalized filters: FilterSpec}
+_FILTER_CACHE = {}
+FILTER_CACHE_SIZE = 1024
 
-def generate_navigator(os=None, navigator=None, platform=None, device_type=None):
+
+def get_variant_masks():
+    """
+    Return list of all valid (device_type, os_id, navigator_id) combinations
+    and dict {option name: {option value: bitmask}}, bit N of the bitmask
+    is set if variant N is compatible with the option value.
     """
-    Generates web navigator's config
 
-    :param os: limit list of oses for generation
-    :type os: string or list/tuple or None
-    :param navigator: limit list of browser engines for generation
-    :type navigator: string or list/tuple or None
-    :param device_type: limit possible oses by device type
-    :type device_type: list/tuple or None, possible values:
-        "desktop", "smartphone", "tablet", "all"
+    global _VARIANT_MASKS # pylint: disable=global-statement
+    tables, variants, masks = _VARIANT_MASKS
+    if tables_changed(tables):
+        _VARIANT_MASKS = build_variant_masks(globals())
+        tables, variants, masks = _VARIANT_MASKS
+    return variants, masks
 
-    :return: User-Agent config
-    :rtype: dict with keys (os, name, platform, oscpu, build_version,
-                            build_id, app_version, app_name, app_code_name,
-                            product, product_sub, vendor, vendor_sub,
-                            user_agent)
-    :raises InvalidOption: if could not generate user-agent for
-        any combination of allowed platforms and navigators
-    :raise InvalidOption: if any of passed options is invalid
+
+def build_variant_masks(ns):
+    """
+    Build value of `_VARIANT_MASKS` from tables of `ns` dict
     """
 
-    if platform is not None:
-        os = platform
-        warn(
-            "The `platform` option is deprecated." " Use `os` option instead.",
-            stacklevel=3,
-        )
-    device_type, os_id, navigator_id = pick_config_ids(device_type, os, navigator)
-    system = build_system_components(device_type, os_id, navigator_id)
-    app = build_app_components(os_id, navigator_id)
-    ua_template = choose_ua_template(device_type, navigator_id, app)
-    user_agent = ua_template.format(system=system, app=app)
-    app_version = build_navigator_app_version(
-        os_id, navigator_id, system["platform_version"], user_agent
-    )
-    return {
+    dev_os = ns["DEVICE_TYPE_OS"]
+    dev_nav = ns["DEVICE_TYPE_NAVIGATOR"]
+    os_nav = ns["OS_NAVIGATOR"]
+    nav_os = ns["NAVIGATOR_OS"]
+    variants = [
+        (dev, os_id, nav)
+        for dev, os_id, nav in product(dev_os, os_nav, nav_os)
+        if os_id in dev_os[dev]
+        and nav in dev_nav[dev]
+        and nav in os_nav[os_id]
+        and os_id in nav_os[nav]
+    ]
+    masks = {"device_type": {}, "os": {}, "navigator": {}}
+    for pos, ids in enumerate(variants):
+        for opt_name, value in zip(("device_type", "os", "navigator"), ids):
+            masks[opt_name][value] = masks[opt_name].get(value, 0) | (1 << pos)
+    return get_tables(ns), variants, masks
+
+
+def parse_version(value, opt_name="version"):
+    """
+    Convert 80, "9" or "10.12" into tuple of integers
+    """
+
+    try:
+        return tuple(int(x) for x in str(value).split("."))
+    except ValueError:
+        raise InvalidOption("Option %s has invalid value: %s" % (opt_name, value))
+
+
+def get_entry_version(kind, entry):
+    """
+    Return version tuple of entry of OS_PLATFORM (kind="os") or
+    of browser version table (kind="navigator")
+    """
+
+    if kind == "os":
+        return parse_version(entry.rsplit(" ", 1)[-1])
+    return parse_version(entry[0])
+
+
+def pad_version(version, size):
+    """
+    Pad version tuple with zeros or cut it to `size` components
+    """
+
+    return (version + (0,) * size)[:size]
+
+
+def match_version(version, low, high):
+    """
+    Check `low` <= `version` <= `high` comparing only as many components
+    as bound has, i.e. version 9.0.1 matches max bound 9
+    """
+
+    if low is not None and pad_version(version, len(low)) < low:
+        return False
+    if high is not None and pad_version(version, len(high)) > high:
+        return False
+    return True
+
+
+def compile_version_filters(version_filters):
+    """
+    Return dict {target name: (min version, max version)}
+    """
+
+    bounds = {}
+    for opt_name, value in version_filters.items():
+        if value is None:
+            continue
+        bound, _, target = opt_name.partition("_")
+        if bound not in ("min", "max") or target not in VERSION_FILTER_TARGETS:
+            raise InvalidOption("Unknown option: %s" % opt_name)
+        low, high = bounds.get(target, (None, None))
+        if bound == "min":
+            low = parse_version(value, opt_name)
+        else:
+            high = parse_version(value, opt_name)
+        bounds[target] = (low, high)
+    return bounds
+
+
+# Targets of VERSION_FILTER_TARGETS with known release dates
+DATED_TARGETS = ("chrome", "firefox", "ie", "android")
+# (tables, {target: (sorted release day numbers, entries in same order)})
+_RELEASE_INDEX = ((), None)
+
+
+def get_release_date(target, entry, ns=None):
+    """
+    Return release date of entry of version table or None if it is unknown
+
+    :param ns: dict with release date tables, the module by default
+    """
+
+    if ns is None:
+        ns = globals()
+    if target == "firefox":
+        return entry[1]
+    if target == "chrome":
+        return ns["CHROME_RELEASE_DATE"].get(entry[0])
+    if target == "ie":
+        return ns["IE_RELEASE_DATE"].get(entry[0])
+    return ns["ANDROID_RELEASE_DATE"].get(entry)
+
+
+def get_release_index():
+    global _RELEASE_INDEX # pylint: disable=global-statement
+    tables, index = _RELEASE_INDEX
+    if tables_changed(tables):
+        _RELEASE_INDEX = build_release_index(globals())
+        tables, index = _RELEASE_INDEX
+    return index
+
+
+def build_release_index(ns):
+    """
+    Build value of `_RELEASE_INDEX` from tables of `ns` dict
+    """
+
+    versions = {
+        "chrome": ns["CHROME_BUILD"],
+        "firefox": ns["FIREFOX_VERSION"],
+        "ie": ns["IE_VERSION"],
+        "android": ns["OS_PLATFORM"]["android"],
+    }
+    index = {}
+    for target in DATED_TARGETS:
+        items = []
+        for entry in versions[target]:
+            date = get_release_date(target, entry, ns)
+            if date is not None:
+                items.append((date.toordinal(), entry))
+        items.sort(key=lambda x: x[0])
+        index[target] = ([x[0] for x in items], [x[1] for x in items])
+    return get_tables(ns), index
+
+
+def get_current_versions(target, as_of, max_age):
+    """
+    Return entries of version table which were current at any moment
+    between `as_of` - `max_age` and `as_of` (both given as day numbers).
+    Entry is current from its release until the next release.
+    """
+
+    days, entries = get_release_index()[target]
+    end = bisect_right(days, as_of)
+    if max_age is None:
+        return entries[:end]
+    start = bisect_right(days, as_of - max_age) - 1
+    if start < 0:
+        start = 0
+    else:
+        # releases made on the same day are current together
+        start = bisect_left(days, days[start])
+    return entries[start:end]
+
+
+def get_decay_weights(builds, as_of, half_life):
+    """
+    Return {navigator_id: cumulative weights} for allowed browser versions,
+    weight of version halves every `half_life` days passed since its
+    release till `as_of` or the latest release in the table. Versions with
+    unknown release date get zero weight.
+    """
+
+    index = get_release_index()
+    res = {}
+    for nav in ("chrome", "firefox", "ie"):
+        days, entries = index[nav]
+        if not days:
+            continue
+        reference = days[-1] if as_of is None else as_of
+        release_days = dict(zip(entries, days))
+        total = 0.0
+        cum_weights = []
+        for entry in builds[nav]:
+            day = release_days.get(entry)
+            if day is not None:
+                total += 0.5 ** (max(reference - day, 0) / half_life)
+            cum_weights.append(total)
+        if total > 0:
+            res[nav] = cum_weights
+    return res
+
+
+def get_build_label(versions, entry):
+    """
+    Return label of browser version table entry used in `weights` option
+    and by `user_agent.metrics`: major version of Chrome ("80") and
+    Firefox ("80"), "MSIE 11.0" of IE
+    """
+
+    if versions == "ie":
+        return entry[1]
+    return str(entry[0]).split(".", 1)[0]
+
+
+def get_version_label(versions, build_version):
+    """
+    Return label (see `get_build_label`) of rendered browser version
+    """
+
+    if versions == "ie":
+        return build_version
+    return build_version.split(".", 1)[0]
+
+
+def get_learned_weights(builds, counts, weights):
+    """
+    Return {navigator_id: cumulative weights} for allowed browser versions
+    of navigators listed in `counts` ({navigator_id: {label: weight}}, see
+    `get_build_label`), weights are multiplied by ones in `weights`
+    (result of `get_decay_weights`). Weight of label is divided between
+    allowed versions having it, versions missing in `counts` get zero
+    weight.
+    """
+
+    res = dict(weights)
+    for nav, nav_counts in counts.items():
+        if nav not in builds:
+            continue
+        versions = NAVIGATOR_RULES[nav]["versions"]
+        labels = [get_build_label(versions, x) for x in builds[nav]]
+        sizes = {}
+        for label in labels:
+            sizes[label] = sizes.get(label, 0) + 1
+        decay = weights.get(nav)
+        total = 0.0
+        prev = 0.0
+        cum_weights = []
+        for pos, label in enumerate(labels):
+            weight = float(nav_counts.get(label, 0.0)) / sizes[label]
+            if decay is not None:
+                weight *= decay[pos] - prev
+                prev = decay[pos]
+            total += weight
+            cum_weights.append(total)
+        res[nav] = cum_weights
+    return res
+
+
+def build_filter_spec(
+    device_type,
+    os,
+    navigator,
+    version_filters,
+    as_of,
+    max_age,
+    version_decay,
+    learned=None,
+):
+    tables = get_tables()
+    variants, masks = get_variant_masks()
+    if os is None:
+        default_dev_types = ["desktop"]
+    else:
+        default_dev_types = list(DEVICE_TYPE_OS.keys())
+    allowed = 0
+    for dev in get_option_choices(
+        "device_type", device_type, default_dev_types, list(DEVICE_TYPE_OS.keys())
+    ):
+        allowed |= masks["device_type"].get(dev, 0)
+    os_allowed = 0
+    for os_id in get_option_choices(
+        "os", os, list(OS_NAVIGATOR.keys()), list(OS_NAVIGATOR.keys())
+    ):
+        os_allowed |= masks["os"].get(os_id, 0)
+    nav_allowed = 0
+    for nav in get_option_choices(
+        "navigator", navigator, list(NAVIGATOR_OS.keys()), list(NAVIGATOR_OS.keys())
+    ):
+        nav_allowed |= masks["navigator"].get(nav, 0)
+    allowed &= os_allowed & nav_allowed
+
+    platforms = dict(OS_PLATFORM)
+    builds = dict((x, globals()[y["table"]]) for x, y in NAVIGATOR_RULES.items())
+    for target, (low, high) in compile_version_filters(version_filters).items():
+        kind, table_id = VERSION_FILTER_TARGETS[target]
+        table = platforms if kind == "os" else builds
+        entries = tuple(
+            x
+            for x in table[table_id]
+            if match_version(get_entry_version(kind, x), low, high)
+        )
+        table[table_id] = entries
+        if not entries:
+            allowed &= ~masks[kind].get(table_id, 0)
+    if as_of is not None:
+        for target in DATED_TARGETS:
+            kind, table_id = VERSION_FILTER_TARGETS[target]
+            table = platforms if kind == "os" else builds
+            current = set(get_current_versions(target, as_of, max_age))
+            entries = tuple(x for x in table[table_id] if x in current)
+            table[table_id] = entries
+            if not entries:
+                allowed &= ~masks[kind].get(table_id, 0)
+
+    weights = {}
+    # variants which allowed versions have no learned weight
+    no_weight = 0
+    if version_decay is not None:
+        weights = get_decay_weights(builds, as_of, version_decay)
+    if learned is not None and "build_version" in learned:
+        weights = get_learned_weights(builds, learned["build_version"], weights)
+        for nav, cum_weights in list(weights.items()):
+            if not cum_weights or cum_weights[-1] <= 0:
+                del weights[nav]
+                no_weight |= masks["navigator"].get(nav, 0)
+
+    device_index = get_device_index()
+    device_platforms = {}
+    for dev in DEVICE_TYPES_WITH_ID:
+        device_platforms[dev] = tuple(
+            x for x in platforms["android"] if x in device_index[dev]
+        )
+        if not device_platforms[dev]:
+            allowed &= ~(
+                masks["device_type"][dev]
+                & masks["os"]["android"]
+                & masks["navigator"]["chrome"]
+            )
+
+    selected = [x for pos, x in enumerate(variants) if allowed >> pos & 1]
+    if not selected:
+        raise InvalidOption(
+            "Options device_type, os and navigator" " conflicts with each other"
+        )
+    if no_weight:
+        allowed &= ~no_weight
+        selected = [x for pos, x in enumerate(variants) if allowed >> pos & 1]
+        if not selected:
+            raise InvalidOption(
+                "Option weights selects no versions of allowed navigators"
+            )
+    variant_weights = None
+    if learned is not None and "variant" in learned:
+        counts = learned["variant"]
+        selected = [x for x in selected if counts.get("-".join(x), 0.0) > 0]
+        if not selected:
+            raise InvalidOption(
+                "Option weights selects no config variants allowed by other options"
+            )
+        variant_weights = []
+        total = 0.0
+        for variant in selected:
+            total += counts["-".join(variant)]
+            variant_weights.append(total)
+    engines = get_engines()
+    plans = {}
+    for variant in selected:
+        engine = engines[variant]
+        plans[variant] = (
+            engine,
+            get_positions(engine.platforms, platforms[variant[1]]),
+            get_positions(engine.versions.table, builds[variant[2]]),
+            weights.get(variant[2]),
+        )
+        if engine.devices is not None:
+            plans[variant] = (
+                engine,
+                get_positions(engine.platforms, device_platforms[variant[0]]),
+            ) + plans[variant][2:]
+    return FilterSpec(
+        selected,
+        variant_weights,
+        platforms,
+        builds,
+        weights,
+        device_platforms,
+        plans,
+        tables,
+    )
+
+
+def get_positions(table, entries):
+    """
+    Return tuple of positions of `entries` in `table`
+    """
+
+    index = dict((x, pos) for pos, x in enumerate(table))
+    return tuple(index[x] for x in entries)
+
+
+def freeze_option(value):
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def compile_counts(counts):
+    res = dict((str(x), float(y)) for x, y in counts.items())
+    for weight in res.values():
+        if not 0 <= weight < float("inf"):
+            raise ValueError("Invalid weight: %s" % weight)
+    return res
+
+
+def compile_weights(weights):
+    """
+    Check value of `weights` option, return pair (hashable key, dict
+    with float weights)
+    """
+
+    if weights is None:
+        return None, None
+    try:
+        res = {}
+        for name, counts in weights.items():
+            if name == "variant":
+                res[name] = compile_counts(counts)
+            elif name == "build_version":
+                res[name] = dict(
+                    (str(x), compile_counts(y)) for x, y in counts.items()
+                )
+            else:
+                raise ValueError("Unknown key: %s" % name)
+    except (AttributeError, TypeError, ValueError):
+        raise InvalidOption("Option weights has invalid value: %s" % (weights,))
+    key = (
+        tuple(sorted(res.get("variant", {}).items())) if "variant" in res else None,
+        tuple(
+            (x, tuple(sorted(y.items())))
+            for x, y in sorted(res.get("build_version", {}).items())
+        ),
+    )
+    return key, res
+
+
+def get_day_number(value, opt_name):
+    try:
+        return value.toordinal()
+    except AttributeError:
+        raise InvalidOption("Option %s has invalid value: %s" % (opt_name, value))
+
+
+def compile_filters(
+    device_type=None,
+    os=None,
+    navigator=None,
+    as_of=None,
+    max_age=None,
+    version_decay=None,
+    weights=None,
+    **version_filters
+):
+    """
+    Compile filters into `FilterSpec` with all allowed config variants
+    and allowed entries of version tables.
+
+    Compatibility of device types, oses and navigators is resolved with
+    bitmasks built once from DEVICE_TYPE_OS, DEVICE_TYPE_NAVIGATOR and
+    OS_NAVIGATOR. Compiled filters are cached until tables are replaced.
+
+    :param device_type, os, navigator: see `pick_config_ids`, items
+        prefixed with "!" are excluded, e.g. os="!win"
+    :param version_filters: min_X and max_X bounds where X is one of
+        chrome, firefox, ie (browser versions) or android, mac,
+        windows (platform versions), e.g. min_chrome=80, max_android="9".
+        Variants which have no matching versions are excluded.
+    :param as_of: date or datetime, use only versions released before it
+    :param max_age: timedelta, use only versions which were current (not
+        replaced by next release) during `max_age` before `as_of`,
+        `as_of` is today by default. Applied to Chrome, Firefox, IE and
+        Android versions.
+    :param version_decay: half-life in days (number or timedelta) of
+        Chrome, Firefox and IE versions: version released `version_decay`
+        days before `as_of` (or before the latest version if `as_of` is
+        not given) is chosen twice less often than the latest one.
+        Versions are chosen by bisecting precomputed cumulative weights.
+    :param weights: dict with relative frequencies of config variants
+        {"variant": {"desktop-win-chrome": weight}} and browser versions
+        {"build_version": {navigator_id: {label: weight}}} (labels are
+        described in `get_build_label`), e.g. learned from access logs
+        by `user_agent.learn` or a snapshot of `user_agent.metrics`.
+        Variants and versions of listed navigators missing in `weights`
+        are not generated. Version weights are multiplied by
+        `version_decay` ones.
+    :raises InvalidOption: if any option is invalid or no variant
+        matches the filters
+    """
+
+    if max_age is not None:
+        if not isinstance(max_age, timedelta):
+            raise InvalidOption("Option max_age has invalid value: %s" % max_age)
+        max_age = max_age.days
+        if as_of is None:
+            as_of = datetime.now()
+    if as_of is not None:
+        as_of = get_day_number(as_of, "as_of")
+    if version_decay is not None:
+        if isinstance(version_decay, timedelta):
+            version_decay = version_decay.total_seconds() / 86400
+        if (
+            not isinstance(version_decay, six.integer_types + (float,))
+            or version_decay <= 0
+        ):
+            raise InvalidOption(
+                "Option version_decay has invalid value: %s" % version_decay
+            )
+        version_decay = float(version_decay)
+    weights_key, weights = compile_weights(weights)
+    key = (
+        freeze_option(device_type),
+        freeze_option(os),
+        freeze_option(navigator),
+        tuple(sorted(version_filters.items())),
+        as_of,
+        max_age,
+        version_decay,
+        weights_key,
+    )
+    try:
+        spec = _FILTER_CACHE[key]
+    except KeyError:
+        spec = None
+    except TypeError:
+        raise InvalidOption("Options have invalid values: %s" % (key,))
+    # tables could be replaced while the spec is built, then it is built again
+    while spec is None or tables_changed(spec.tables):
+        spec = build_filter_spec(
+            device_type,
+            os,
+            navigator,
+            version_filters,
+            as_of,
+            max_age,
+            version_decay,
+            weights,
+        )
+        if len(_FILTER_CACHE) >= FILTER_CACHE_SIZE:
+            _FILTER_CACHE.clear()
+        _FILTER_CACHE[key] = spec
+    return spec
+
+
+def get_config_variants(device_type, os, navigator, **version_filters):
+    """
+    Build list of all (device_type, os_id, navigator_id) combinations
+    matching the given device_type, os and navigator filters.
+
+    See `pick_config_ids` and `compile_filters` for description of options.
+
+    :raises InvalidOption: if no combination matches the filters
+    """
+
+    spec = compile_filters(device_type, os, navigator, **version_filters)
+    return list(spec.variants)
+
+
+def pick_config_ids(device_type, os, navigator, rng=random, **version_filters):
+    """
+    Select one random pair (device_type, os_id, navigator_id) from
+    all possible combinations matching the given os and
+    navigator filters.
+
+    :param os: allowed os(es)
+    :type os: string or list/tuple or None
+    :param navigator: allowed browser engine(s)
+    :type navigator: string or list/tuple or None
+    :param device_type: limit possible oses by device type
+    :type device_type: list/tuple or None, possible values:
+        "desktop", "smartphone", "tablet", "all"
+    :param rng: source of randomness
+    :type rng: random.Random instance or `random` module
+    :param version_filters: version bounds, see `compile_filters`
+    """
+
+    spec = compile_filters(device_type, os, navigator, **version_filters)
+    return choose_variant(spec, rng)
+
+
+def choose_variant(spec, rng):
+    """
+    Choose random config variant allowed by `FilterSpec`
+    """
+
+    return choose_weighted(rng, spec.variants, spec.variant_weights)
+
+
+def choose_ua_template(device_type, navigator_id, app):
+    engine = get_plan(device_type, None, navigator_id)[0]
+    return engine.get_template(app["build_version"])
+
+
+def build_navigator_app_version(os_id, navigator_id, platform_version, user_agent):
+    engine = get_plan(None, os_id, navigator_id)[0]
+    return engine.format_app_version(platform_version, user_agent)
+
+
+def build_navigator(device_type, os_id, navigator_id, rng=random, spec=None):
+    """
+    Build web navigator's config for the given combination of
+    device_type, os_id and navigator_id (see `get_config_variants`)
+
+    :param spec: optional `FilterSpec` limiting versions, see `compile_filters`
+
+    Returns dict in same format as `generate_navigator` does.
+    """
+
+    engine, platforms, builds, cum_weights = get_plan(
+        device_type, os_id, navigator_id, spec
+    )
+    return engine.render(*engine.draw(rng, platforms, builds, cum_weights))
+
+
+def draw_configs(spec, count, rng=random):
+    """
+    Return list of `count` (engine, positions) pairs of random configs
+    allowed by `spec`, `engine.render(*positions)` builds the config
+
+    Variants are chosen first, then positions of all configs of the same
+    variant are drawn with one `VariantEngine.draw_many` call.
+    """
+
+    variants = spec.variants
+    cum_weights = spec.variant_weights
+    if not hasattr(rng, "randbelow_many"):
+        picked = [choose_variant(spec, rng) for _ in range(count)]
+    elif cum_weights is None:
+        picked = [variants[x] for x in rng.randbelow_many(len(variants), count)]
+    else:
+        total = cum_weights[-1]
+        picked = [
+            variants[bisect_right(cum_weights, x * total)]
+            for x in rng.random_many(count)
+        ]
+    groups = {}
+    for idx, variant in enumerate(picked):
+        groups.setdefault(variant, []).append(idx)
+    res = [None] * count
+    for variant, indexes in groups.items():
+        engine, platforms, builds, cum_weights = spec.plans[variant]
+        batch = engine.draw_many(rng, len(indexes), platforms, builds, cum_weights)
+        for idx, positions in zip(indexes, batch):
+            res[idx] = (engine, positions)
+    return res
+
+
+def compose_navigator(os_id, navigator_id, system, app, user_agent, app_version):
+    """
+    Build `generate_navigator` result from components built
+    by generation stages
+    """
+
+    return {
         # ids
         "os_id": os_id,
         "navigator_id": navigator_id,
@@ -1011,7 +2473,55 @@ def generate_navigator(os=None, navigator=None, platform=None, device_type=None)
     }
 
 
-def generate_user_agent(os=None, navigator=None, platform=None, device_type=None):
+def generate_navigator(
+    os=None, navigator=None, platform=None, device_type=None, rng=None, **filters
+):
+    """
+    Generates web navigator's config
+
+    :param os: limit list of oses for generation
+    :type os: string or list/tuple or None
+    :param navigator: limit list of browser engines for generation
+    :type navigator: string or list/tuple or None
+    :param device_type: limit possible oses by device type
+    :type device_type: list/tuple or None, possible values:
+        "desktop", "smartphone", "tablet", "all"
+    :param rng: source of randomness, the `random` module by default
+    :type rng: random.Random instance or None
+    :param filters: version bounds like min_chrome=80 or max_android="9",
+        release date window as_of=date, max_age=timedelta,
+        recency weighting version_decay=days, learned frequencies
+        weights=dict, see `compile_filters`
+    :return: User-Agent config
+    :rtype: dict with keys (os, name, platform, oscpu, build_version,
+                            build_id, app_version, app_name, app_code_name,
+                            product, product_sub, vendor, vendor_sub,
+                            user_agent)
+    :raises InvalidOption: if could not generate user-agent for
+        any combination of allowed platforms and navigators
+    :raise InvalidOption: if any of passed options is invalid
+    """
+
+    if platform is not None:
+        os = platform
+        warn(
+            "The `platform` option is deprecated." " Use `os` option instead.",
+            stacklevel=3,
+        )
+    if rng is None:
+        rng = random
+    if _INSTRUMENTATION is not None:
+        return _INSTRUMENTATION.generate_navigator(
+            device_type, os, navigator, rng, filters
+        )
+    spec = compile_filters(device_type, os, navigator, **filters)
+    engine, platforms, builds, cum_weights = spec.plans[choose_variant(spec, rng)]
+    return engine.render(*engine.draw(rng, platforms, builds, cum_weights))
+
+
+def generate_user_agent(
+    os=None, navigator=None, platform=None, device_type=None, rng=None, **filters
+):
     """
     Generates HTTP User-Agent header
 
@@ -1022,6 +2532,10 @@ def generate_user_agent(os=None, navigator=None, platform=None, device_type=None
     :param device_type: limit possible oses by device type
     :type device_type: list/tuple or None, possible values:
         "desktop", "smartphone", "tablet", "all"
+    :param rng: source of randomness, the `random` module by default
+    :type rng: random.Random instance or None
+    :param filters: version bounds like min_chrome=80 or max_android="9",
+        see `compile_filters`
     :return: User-Agent string
     :rtype: string
     :raises InvalidOption: if could not generate user-agent for
@@ -1029,11 +2543,18 @@ def generate_user_agent(os=None, navigator=None, platform=None, device_type=None
     :raise InvalidOption: if any of passed options is invalid
     """
     return generate_navigator(
-        os=os, navigator=navigator, platform=platform, device_type=device_type
+        os=os,
+        navigator=navigator,
+        platform=platform,
+        device_type=device_type,
+        rng=rng,
+        **filters
     )["user_agent"]
 
 
-def generate_navigator_js(os=None, navigator=None, platform=None, device_type=None):
+def generate_navigator_js(
+    os=None, navigator=None, platform=None, device_type=None, rng=None, **filters
+):
     """
     Generates web navigator's config with keys corresponding
     to keys of `windows.navigator` JavaScript object.
@@ -1045,6 +2566,10 @@ def generate_navigator_js(os=None, navigator=None, platform=None, device_type=No
     :param device_type: limit possible oses by device type
     :type device_type: list/tuple or None, possible values:
         "desktop", "smartphone", "tablet", "all"
+    :param rng: source of randomness, the `random` module by default
+    :type rng: random.Random instance or None
+    :param filters: version bounds like min_chrome=80 or max_android="9",
+        see `compile_filters`
     :return: User-Agent config
     :rtype: dict with keys (TODO)
     :raises InvalidOption: if could not generate user-agent for
@@ -1053,8 +2578,22 @@ def generate_navigator_js(os=None, navigator=None, platform=None, device_type=No
     """
 
     config = generate_navigator(
-        os=os, navigator=navigator, platform=platform, device_type=device_type
+        os=os,
+        navigator=navigator,
+        platform=platform,
+        device_type=device_type,
+        rng=rng,
+        **filters
     )
+    return navigator_to_js(config)
+
+
+def navigator_to_js(config):
+    """
+    Convert config returned by `generate_navigator` into dict with keys
+    corresponding to keys of `windows.navigator` JavaScript object.
+    """
+
     return {
         "appCodeName": config["app_code_name"],
         "appName": config["app_name"],
@@ -1068,3 +2607,243 @@ def generate_navigator_js(os=None, navigator=None, platform=None, device_type=No
         "vendorSub": config["vendor_sub"],
         "buildID": config["build_id"],
     }
+
+
+def get_key_rng(key, salt=None):
+    """
+    Build random generator seeded with the hash of `key`
+
+    The same key (and salt) always gives the same sequence of random
+    numbers on any host and in any process running the same major version
+    of Python: `random.Random` methods like `choice` and `randint` are
+    implemented differently in Python 2 and Python 3.
+
+    :param key: account id, session id or any other string/bytes/number
+    :param salt: optional value mixed into the hash, change it to rotate
+        all key assignments at once
+    :return: random.Random instance
+    """
+
+    if not isinstance(key, six.binary_type):
+        key = six.text_type(key).encode("utf-8")
+    if salt is not None:
+        if not isinstance(salt, six.binary_type):
+            salt = six.text_type(salt).encode("utf-8")
+        key = salt + b"\x00" + key
+    return random.Random(int(hashlib.sha256(key).hexdigest(), 16))
+
+
+def navigator_for_key(key, salt=None, **filters):
+    """
+    Generates web navigator's config bound to the `key`
+
+    Same key always gives same config as long as the filters, the
+    version tables of the library and the major version of Python do not
+    change. Nothing is stored between calls.
+
+    :param key: account id, session id or any other string/bytes/number
+    :param salt: optional value mixed into the key hash, change it to
+        rotate all assignments at once
+    :param filters: any options accepted by `generate_navigator`
+    :return: User-Agent config, see `generate_navigator`
+    """
+
+    return generate_navigator(rng=get_key_rng(key, salt), **filters)
+
+
+def ua_for_key(key, salt=None, **filters):
+    """
+    Generates HTTP User-Agent header bound to the `key`
+
+    See `navigator_for_key` for details.
+
+    :return: User-Agent string
+    :rtype: string
+    """
+
+    return navigator_for_key(key, salt=salt, **filters)["user_agent"]
+
+
+def allocate_quotas(n, proportions):
+    """
+    Split `n` into integer counts proportional to `proportions` using
+    largest remainder method: every count is rounded down, then the
+    remaining items go to the counts with the largest fractional parts.
+    """
+
+    total = float(sum(proportions))
+    if total <= 0 or any(x < 0 for x in proportions):
+        raise InvalidOption("Quotas must be non-negative with positive sum")
+    exact = [n * x / total for x in proportions]
+    counts = [int(x) for x in exact]
+    order = sorted(range(len(exact)), key=lambda idx: counts[idx] - exact[idx])
+    for idx in order[: n - sum(counts)]:
+        counts[idx] += 1
+    return counts
+
+
+def generate_batch(
+    n, os=None, navigator=None, device_type=None, rng=None, **filters
+):
+    """
+    Generates list of `n` web navigator's configs
+
+    With `user_agent.bulkrand.BulkRandom` as `rng` random positions of
+    the whole batch are drawn with a few bulk calls, see `draw_configs`.
+    The batch is not reported to `user_agent.instrument`.
+
+    :param n: number of configs
+    :param rng: source of randomness, the `random` module by default
+    :param os, navigator, device_type, filters: see `generate_navigator`
+    :return: list of configs in `generate_navigator` format
+    :raises InvalidOption: if options are invalid
+    """
+
+    if rng is None:
+        rng = random
+    spec = compile_filters(device_type, os, navigator, **filters)
+    return [engine.render(*positions) for engine, positions in draw_configs(spec, n, rng)]
+
+
+def generate_stratified(n, quotas, rng=None, **filters):
+    """
+    Generates `n` web navigator's configs which composition matches
+    given proportions exactly
+
+    Configs are generated lazily and interleaved randomly: every next
+    config is taken from a stratum with probability proportional to the
+    number of its configs not yet generated.
+
+    :param n: number of configs
+    :param quotas: dict {(device_type, os, navigator): proportion}, items
+        of the key accept same values as corresponding options of
+        `generate_navigator`, e.g. {("desktop", "win", "chrome"): 62,
+        ("smartphone", "android", "chrome"): 20, (None, "mac", None): 18}
+    :param rng: source of randomness, the `random` module by default
+    :param filters: other options of `generate_navigator` applied to
+        all strata
+    :return: iterator over configs in `generate_navigator` format
+    :raises InvalidOption: if quotas or filters are invalid
+    """
+
+    if rng is None:
+        rng = random
+    strata = list(quotas.items())
+    specs = [
+        compile_filters(dev, os, nav, **filters) for (dev, os, nav), _ in strata
+    ]
+    counts = allocate_quotas(n, [x[1] for x in strata])
+    return iter_stratified(specs, counts, rng)
+
+
+def iter_stratified(specs, counts, rng):
+    remaining = sum(counts)
+    counts = list(counts)
+    while remaining:
+        pos = rng.randrange(remaining)
+        idx = 0
+        while pos >= counts[idx]:
+            pos -= counts[idx]
+            idx += 1
+        counts[idx] -= 1
+        remaining -= 1
+        spec = specs[idx]
+        device_type, os_id, navigator_id = choose_variant(spec, rng)
+        yield build_navigator(device_type, os_id, navigator_id, rng, spec)
+
+
+# {(navigator_id, major version, mobile, language): (headers, position of
+#  User-Agent)}
+_HEADERS_CACHE = {}
+HEADERS_CACHE_SIZE = 1024
+
+
+def get_major_version(navigator_id, build_version):
+    """
+    Return major version of browser from "build_version" item of config
+    """
+
+    if navigator_id == "ie":
+        # "MSIE 11.0"
+        build_version = build_version.split(" ")[-1]
+    return int(build_version.split(".")[0])
+
+
+def get_versioned_value(items, major):
+    res = None
+    for version, value in items:
+        if version <= major:
+            res = value
+    return res
+
+
+def build_header_template(navigator_id, major, mobile, language):
+    """
+    Return list of headers with None instead of User-Agent value and
+    position of User-Agent header
+    """
+
+    values = dict(STATIC_HEADERS)
+    values["sec-ch-ua"] = values["sec-ch-ua"].format(major=major)
+    values["sec-ch-ua-mobile"] = "?1" if mobile else "?0"
+    values["Accept"] = get_versioned_value(ACCEPT[navigator_id], major)
+    values["Accept-Encoding"] = get_versioned_value(
+        ACCEPT_ENCODING[navigator_id], major
+    )
+    values["Accept-Language"] = ACCEPT_LANGUAGE[navigator_id].format(
+        language=language, base_language=language.split("-")[0]
+    )
+    values["User-Agent"] = None
+    headers = [
+        (name, values[name])
+        for name, version in HEADER_ORDER[navigator_id]
+        if version <= major
+    ]
+    return headers, [x[0] for x in headers].index("User-Agent")
+
+
+def build_headers(config, language="en-US"):
+    """
+    Build HTTP request headers of browser described by web navigator's
+    config returned by `generate_navigator`
+
+    Headers not depending on the user agent string are prebuilt once
+    for every browser, major version and language.
+
+    :param language: value of Accept-Language header is built from it
+    :return: list of (name, value) pairs in order the browser sends them
+    """
+
+    navigator_id = config["navigator_id"]
+    user_agent = config["user_agent"]
+    key = (
+        navigator_id,
+        get_major_version(navigator_id, config["build_version"]),
+        "Mobile" in user_agent,
+        language,
+    )
+    try:
+        template, ua_pos = _HEADERS_CACHE[key]
+    except KeyError:
+        template, ua_pos = build_header_template(*key)
+        if len(_HEADERS_CACHE) >= HEADERS_CACHE_SIZE:
+            _HEADERS_CACHE.clear()
+        _HEADERS_CACHE[key] = (template, ua_pos)
+    headers = list(template)
+    headers[ua_pos] = ("User-Agent", user_agent)
+    return headers
+
+
+def generate_headers(language="en-US", **filters):
+    """
+    Generates HTTP request headers: User-Agent with Accept,
+    Accept-Language, Accept-Encoding and other headers (Sec-Fetch-*
+    and client hints for Chrome) consistent with it
+
+    :param language: language used in Accept-Language header
+    :param filters: options of `generate_navigator`
+    :return: list of (name, value) pairs in order the browser sends them
+    :raises InvalidOption: if any of passed options is invalid
+    """
+
+    return build_headers(generate_navigator(**filters), language)
@@ -0,0 +1,298 @@
+"""
+Performance benchmarks of user agent generation
+
+Usage: ua bench [-n NUM] [-k SUBSTRING] [-o results.json] [-b baseline.json]
+
+Every benchmark case calls a function NUM times, timing each call
+separately, and reports throughput and p50/p99 latency of single call.
+Cases cover `generate_user_agent`, `generate_navigator` and
+`generate_navigator_js` for every (device_type, os, navigator) combination
+and the separate stages of generation. Memory used by one generated
+profile is measured with tracemalloc.
+
+Results could be saved into JSON file and compared with results of
+previous run: relative change of throughput is reported for every case.
+"""
+from __future__ import print_function
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from . import base
+from .base import (
+    generate_user_agent,
+    generate_navigator,
+    generate_navigator_js,
+    get_config_variants,
+)
+from .bulkrand import BulkRandom
+
+__all__ = ("run_benchmarks", "compare_results")
+
+try:
+    perf_counter_ns = time.perf_counter_ns # pylint: disable=invalid-name
+except AttributeError: # pragma: no cover, python < 3.7
+    def perf_counter_ns():
+        return int(time.perf_counter() * 1e9)
+
+
+def get_benchmark_cases():
+    """
+    Return list of (name, function without arguments) pairs
+    """
+
+    cases = []
+    for dev, os_id, nav in get_config_variants("all", None, None):
+        opts = {"device_type": dev, "os": os_id, "navigator": nav}
+        for func in (generate_user_agent, generate_navigator, generate_navigator_js):
+            name = "%s[%s-%s-%s]" % (func.__name__, dev, os_id, nav)
+            cases.append((name, lambda func=func, opts=opts: func(**opts)))
+
+    cases.extend(
+        [
+            (
+                "stage:pick_config_ids",
+                lambda: base.pick_config_ids(None, None, None),
+            ),
+            (
+                "stage:pick_config_ids[all]",
+                lambda: base.pick_config_ids("all", None, None),
+            ),
+            ("stage:get_firefox_build", base.get_firefox_build),
+            ("stage:get_chrome_build", base.get_chrome_build),
+            ("stage:get_ie_build", base.get_ie_build),
+            (
+                "stage:fix_chrome_mac_platform",
+                lambda: base.fix_chrome_mac_platform(
+                    "Macintosh; Intel Mac OS X 10.15"
+                ),
+            ),
+        ]
+    )
+    spec = base.compile_filters("all")
+    for name, rng in (("random", random.Random()), ("bulk", BulkRandom())):
+        cases.append(
+            (
+                "stage:draw_configs[100,%s]" % name,
+                lambda rng=rng: base.draw_configs(spec, 100, rng),
+            )
+        )
+    for dev, os_id, nav in get_config_variants("all", None, None):
+        cases.append(
+            (
+                "stage:build_system_components[%s-%s-%s]" % (dev, os_id, nav),
+                lambda args=(dev, os_id, nav): base.build_system_components(*args),
+            )
+        )
+    for nav in ("chrome", "firefox", "ie"):
+        os_id = "win"
+        system = base.build_system_components("desktop", os_id, nav)
+        app = base.build_app_components(os_id, nav)
+        template = base.choose_ua_template("desktop", nav, app)
+        cases.append(
+            (
+                "stage:format_template[%s]" % nav,
+                lambda tpl=template, system=system, app=app: tpl.format(
+                    system=system, app=app
+                ),
+            )
+        )
+    return cases
+
+
+def get_overhead_cases():
+    """
+    Return list of (name, function, setup, teardown) for measuring overhead
+    of optional features enabled during the case
+    """
+
+    from . import instrument, metrics # pylint: disable=import-outside-toplevel
+
+    func = lambda: generate_navigator(device_type="all")
+    return [
+        ("overhead:generate_navigator[baseline]", func, None, None),
+        (
+            "overhead:generate_navigator[metrics]",
+            func,
+            metrics.enable_metrics,
+            metrics.disable_metrics,
+        ),
+        (
+            "overhead:generate_navigator[instrumentation]",
+            func,
+            instrument.enable_instrumentation,
+            instrument.disable_instrumentation,
+        ),
+    ]
+
+
+def measure_latency(func, number):
+    """
+    Call `func` `number` times, return stats of single call duration
+    """
+
+    timings = [0] * number
+    clock = perf_counter_ns
+    for _ in range(min(number, 100)):
+        func()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for idx in range(number):
+            start = clock()
+            func()
+            timings[idx] = clock() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+    total = sum(timings)
+    timings.sort()
+    return {
+        "calls": number,
+        "ops_per_sec": number / (total / 1e9) if total else 0.0,
+        "mean_ns": total // number,
+        "p50_ns": timings[number // 2],
+        "p99_ns": timings[min(number - 1, number * 99 // 100)],
+    }
+
+
+def measure_memory(number=1000):
+    """
+    Return average number of bytes allocated for one profile kept in memory
+    """
+
+    res = {}
+    for name, func in (
+        ("generate_user_agent", generate_user_agent),
+        ("generate_navigator", generate_navigator),
+        ("generate_navigator_js", generate_navigator_js),
+    ):
+        func(device_type="all")
+        tracemalloc.start()
+        try:
+            profiles = [func(device_type="all") for _ in range(number)]
+            current, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del profiles
+        res[name] = current // number
+    return res
+
+
+def run_benchmarks(number=10000, pattern=None, memory=True, output=None):
+    """
+    Run benchmark cases which names contain `pattern`
+
+    :param number: number of calls in every case
+    :param output: optional function called with name and result
+        of every case as soon as it is done
+    :return: dict with results
+    """
+
+    results = {}
+    for name, func in get_benchmark_cases():
+        if pattern and pattern not in name:
+            continue
+        results[name] = measure_latency(func, number)
+        if output:
+            output(name, results[name])
+    for name, func, setup, teardown in get_overhead_cases():
+        if pattern and pattern not in name:
+            continue
+        if setup:
+            setup()
+        try:
+            results[name] = measure_latency(func, number)
+        finally:
+            if teardown:
+                teardown()
+        if output:
+            output(name, results[name])
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "calls": number,
+        },
+        "results": results,
+        "memory_per_profile": measure_memory() if memory else {},
+    }
+
+
+def compare_results(current, baseline, threshold=0.1):
+    """
+    Compare throughput of cases present in both results
+
+    Returns list of (name, current ops/sec, baseline ops/sec, change)
+    sorted by change, and list of names of cases which throughput
+    dropped more than `threshold` (relative value).
+    """
+
+    rows = []
+    regressions = []
+    for name, res in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old["ops_per_sec"]:
+            continue
+        change = res["ops_per_sec"] / old["ops_per_sec"] - 1
+        rows.append((name, res["ops_per_sec"], old["ops_per_sec"], change))
+        if change < -threshold:
+            regressions.append(name)
+    rows.sort(key=lambda x: x[3])
+    return rows, regressions
+
+
+def format_result(name, res):
+    return "%-60s %10.0f ops/s  p50 %7d ns  p99 %7d ns" % (
+        name,
+        res["ops_per_sec"],
+        res["p50_ns"],
+        res["p99_ns"],
+    )
+
+
+def main(args=None):
+    from argparse import ArgumentParser # pylint: disable=import-outside-toplevel
+
+    parser = ArgumentParser(prog="ua bench")
+    parser.add_argument("-n", "--number", type=int, default=10000)
+    parser.add_argument("-k", "--filter", help="run cases containing substring")
+    parser.add_argument("-o", "--output", help="save results to JSON file")
+    parser.add_argument("-b", "--baseline", help="compare with JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--no-memory", action="store_true", default=False)
+    opts = parser.parse_args(args)
+
+    res = run_benchmarks(
+        number=opts.number,
+        pattern=opts.filter,
+        memory=not opts.no_memory,
+        output=lambda name, res: print(format_result(name, res)),
+    )
+    for name, size in sorted(res["memory_per_profile"].items()):
+        print("memory per profile %-40s %6d bytes" % (name, size))
+    if opts.output:
+        with open(opts.output, "w") as out:
+            json.dump(res, out, indent=2, sort_keys=True)
+    if opts.baseline:
+        with open(opts.baseline) as inp:
+            baseline = json.load(inp)
+        rows, regressions = compare_results(res, baseline, opts.threshold)
+        print("\nComparison with %s:" % opts.baseline)
+        for name, new, old, change in rows:
+            print(
+                "%-60s %10.0f -> %10.0f ops/s %+6.1f%%"
+                % (name, old, new, change * 100)
+            )
+        if regressions:
+            print(
+                "\n%d case(s) regressed more than %d%%"
+                % (len(regressions), opts.threshold * 100)
+            )
+            sys.exit(1)
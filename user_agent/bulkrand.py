@@ -0,0 +1,200 @@
+"""
+Random generator drawing bounded integers from bits fetched in bulk
+
+    >>> from user_agent import generate_navigator
+    >>> from user_agent.bulkrand import BulkRandom
+    >>> rng = BulkRandom(42)
+    >>> generate_navigator(rng=rng)
+
+Generation of one config makes many small draws: config variant,
+platform, cpu, device, browser version and its random part. With
+`random.Random` every draw is a separate Python-level `_randbelow` call
+taking bits with its own `getrandbits` call and rejecting out-of-range
+values.
+
+`BulkRandom` takes a block of 64-bit words with a single `getrandbits`
+call and maps every word to the bounded range with Lemire's
+multiply-shift method: `word * n >> 64` is uniform in range(n) after a
+rejection step which happens with probability less than n / 2 ** 64,
+so it practically never repeats a draw. Bulk methods `randbelow_many`,
+`randbelow_each` and `random_many` map a whole batch of words with one
+list comprehension and skip the rejection step. It is a subclass of
+`random.Random` seeded the same way, methods not overridden here (shuffle,
+sample, gauss, ...) work as usual.
+
+Sequences of values differ from ones of `random.Random` with the same
+seed, but are reproducible for the same seed and block size.
+"""
+from binascii import unhexlify
+from random import Random
+from struct import Struct
+
+__all__ = ("BulkRandom",)
+
+BLOCK_SIZE = 1024
+WORD_BITS = 64
+WORD_RANGE = 1 << WORD_BITS
+WORD_MASK = WORD_RANGE - 1
+RECIP_BPF = 2.0 ** -53
+
+
+class BulkRandom(Random):
+    """
+    Random generator taking 64-bit words from blocks of `block_size`
+    words generated at once
+
+    State returned by `getstate` consists of the state of the underlying
+    Mersenne Twister before the current block and the position in the
+    block, so it stays small whatever the block size is.
+    """
+
+    def __init__(self, x=None, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self._unpack = Struct("<%dQ" % block_size).unpack
+        self._words = ()
+        self._pos = 0
+        self._block_state = None
+        Random.__init__(self, x)
+
+    def seed(self, *args, **kwargs): # pylint: disable=signature-differs
+        Random.seed(self, *args, **kwargs)
+        self._words = ()
+        self._pos = 0
+        self._block_state = None
+
+    def getstate(self):
+        if self._block_state is None:
+            return (self.block_size, Random.getstate(self), None)
+        return (self.block_size, self._block_state, self._pos)
+
+    def setstate(self, state):
+        block_size, inner_state, pos = state
+        if block_size != self.block_size:
+            raise ValueError(
+                "State of block size %d could not be restored"
+                " into generator of block size %d" % (block_size, self.block_size)
+            )
+        Random.setstate(self, inner_state)
+        self._words = ()
+        self._pos = 0
+        self._block_state = None
+        if pos is not None:
+            self._refill()
+            self._pos = pos
+
+    def _refill(self):
+        self._block_state = Random.getstate(self)
+        size = self.block_size
+        bits = Random.getrandbits(self, WORD_BITS * size)
+        # little-endian bytes of bits, int.to_bytes is missing in Python 2
+        self._words = self._unpack(unhexlify("%0*x" % (16 * size, bits))[::-1])
+        self._pos = 0
+
+    def _word(self):
+        pos = self._pos
+        try:
+            word = self._words[pos]
+        except IndexError:
+            self._refill()
+            pos = 0
+            word = self._words[0]
+        self._pos = pos + 1
+        return word
+
+    def randbelow(self, n):
+        """
+        Return random integer in range [0, n)
+        """
+
+        if not 0 < n <= WORD_RANGE:
+            if n <= 0:
+                raise ValueError("Upper bound should be positive: %s" % n)
+            return Random._randbelow(self, n) # pylint: disable=protected-access
+        pos = self._pos
+        try:
+            word = self._words[pos]
+        except IndexError:
+            self._refill()
+            pos = 0
+            word = self._words[0]
+        self._pos = pos + 1
+        product = word * n
+        if product & WORD_MASK < n:
+            threshold = (WORD_RANGE - n) % n
+            while product & WORD_MASK < threshold:
+                product = self._word() * n
+        return product >> WORD_BITS
+
+    _randbelow = randbelow
+
+    def _take(self, count):
+        """
+        Return tuple of the next `count` words
+        """
+
+        pos = self._pos
+        words = self._words[pos : pos + count]
+        self._pos = pos + len(words)
+        while len(words) < count:
+            self._refill()
+            more = self._words[: count - len(words)]
+            self._pos = len(more)
+            words += more
+        return words
+
+    def randbelow_many(self, n, count):
+        """
+        Return list of `count` random integers in range [0, n)
+
+        Values are not rejected, bias of every value is less
+        than n / 2 ** 64.
+        """
+
+        if not 0 < n <= WORD_RANGE:
+            return [self.randbelow(n) for _ in range(count)]
+        return [x * n >> WORD_BITS for x in self._take(count)]
+
+    def randbelow_each(self, bounds):
+        """
+        Return list of random integers in range [0, n) for every n
+        in `bounds`, see `randbelow_many`
+        """
+
+        if bounds and not 0 < min(bounds) <= max(bounds) <= WORD_RANGE:
+            return [self.randbelow(x) for x in bounds]
+        return [x * n >> WORD_BITS for x, n in zip(self._take(len(bounds)), bounds)]
+
+    def random_many(self, count):
+        """
+        Return list of `count` random floats in range [0.0, 1.0)
+        """
+
+        return [(x >> 11) * RECIP_BPF for x in self._take(count)]
+
+    def random(self):
+        return (self._word() >> 11) * RECIP_BPF
+
+    def getrandbits(self, k):
+        if 0 < k <= WORD_BITS:
+            return self._word() >> (WORD_BITS - k)
+        return Random.getrandbits(self, k)
+
+    def choice(self, seq):
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[self.randbelow(len(seq))]
+
+    def randrange(self, start, stop=None, step=1):
+        if stop is None:
+            if start <= 0:
+                raise ValueError("Empty range for randrange(%s)" % start)
+            return self.randbelow(start)
+        if step != 1:
+            return Random.randrange(self, start, stop, step)
+        width = stop - start
+        if width <= 0:
+            raise ValueError("Empty range for randrange(%s, %s)" % (start, stop))
+        return start + self.randbelow(width)
+
+    def randint(self, a, b):
+        return self.randrange(a, b + 1)
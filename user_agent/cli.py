@@ -1,20 +1,97 @@
 from argparse import ArgumentParser
 import json
+import sys
 
 from user_agent import generate_navigator_js
 
 
+def command_serve(args):
+    from user_agent.server import run_server # pylint: disable=import-outside-toplevel
+
+    parser = ArgumentParser(prog='ua serve')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8000)
+    parser.add_argument('--unix', help='also listen on the Unix socket')
+    parser.add_argument('--buffer-size', type=int, default=1000)
+    opts = parser.parse_args(args)
+    run_server(host=opts.host, port=opts.port, unix_path=opts.unix,
+               buffer_size=opts.buffer_size)
+
+
+def command_proxy(args):
+    from user_agent.proxy import run_proxy # pylint: disable=import-outside-toplevel
+
+    parser = ArgumentParser(prog='ua proxy')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    parser.add_argument('-s', '--sticky', choices=('connection', 'host'),
+                        default='connection')
+    parser.add_argument('--salt')
+    parser.add_argument('-o', '--os')
+    parser.add_argument('-n', '--navigator')
+    parser.add_argument('-d', '--device-type')
+    opts = parser.parse_args(args)
+    run_proxy(host=opts.host, port=opts.port, sticky=opts.sticky,
+              salt=opts.salt, os=opts.os, navigator=opts.navigator,
+              device_type=opts.device_type)
+
+
+def command_bench(args):
+    from user_agent.bench import main # pylint: disable=import-outside-toplevel
+
+    main(args)
+
+
+def command_stats(args):
+    from user_agent.stats import main # pylint: disable=import-outside-toplevel
+
+    main(args)
+
+
+def command_learn(args):
+    from user_agent.learn import main # pylint: disable=import-outside-toplevel
+
+    main(args)
+
+
+def command_anonymize(args):
+    from user_agent.anonymize import main # pylint: disable=import-outside-toplevel
+
+    main(args)
+
+
+COMMANDS = {
+    'serve': command_serve,
+    'proxy': command_proxy,
+    'bench': command_bench,
+    'stats': command_stats,
+    'learn': command_learn,
+    'anonymize': command_anonymize,
+}
+
+
 def script_ua():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+        return
     parser = ArgumentParser()
     parser.add_argument('-e', '--extended', action='store_true',
                         default=False)
     parser.add_argument('-o', '--os')
     parser.add_argument('-n', '--navigator')
     parser.add_argument('-d', '--device-type')
+    parser.add_argument('-w', '--weights',
+                        help='weights file written by "ua learn"')
     opts = parser.parse_args()
+    filters = {}
+    if opts.weights:
+        from user_agent.learn import load_weights # pylint: disable=import-outside-toplevel
+
+        filters['weights'] = load_weights(opts.weights)
     nav = generate_navigator_js(os=opts.os,
                                 navigator=opts.navigator,
-                                device_type=opts.device_type)
+                                device_type=opts.device_type,
+                                **filters)
     if opts.extended:
         print(json.dumps(nav, indent=2))
     else:
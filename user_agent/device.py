@@ -7,3 +7,9 @@ SMARTPHONE_DEV_IDS = json.load(open(os.path.join(
     PACKAGE_DIR, 'data/smartphone_dev_id.json')))
 TABLET_DEV_IDS = json.load(open(os.path.join(
     PACKAGE_DIR, 'data/tablet_dev_id.json')))
+# Devices with (first, last) supported Android versions, release year
+# and screen resolution
+SMARTPHONE_DEV_EXT = json.load(open(os.path.join(
+    PACKAGE_DIR, 'data/smartphone_dev_ext.json')))
+TABLET_DEV_EXT = json.load(open(os.path.join(
+    PACKAGE_DIR, 'data/tablet_dev_ext.json')))
@@ -1,4 +1,4 @@
-__all__ = ('UserAgentError', 'InvalidOption')
+__all__ = ('UserAgentError', 'InvalidOption', 'StoreClosed', 'InvalidData')
 
 
 class UserAgentError(Exception):
@@ -13,3 +13,17 @@ class InvalidOption(Exception):
     Raises when user call user_agent library methods
     with incorrect arguments.
     """
+
+
+class StoreClosed(UserAgentError):
+    """
+    Raises when user calls methods of the profile store
+    which has been closed.
+    """
+
+
+class InvalidData(UserAgentError):
+    """
+    Raises when loaded generation tables are malformed
+    or inconsistent.
+    """
@@ -0,0 +1,356 @@
+"""
+Columnar export of generated configs
+
+    >>> from user_agent.export import export_navigators, read_columns
+    >>> export_navigators("navs.uac", 10 ** 6, device_type="all")
+    >>> for group in read_columns("navs.uac"):
+    ...     print(len(group["user_agent"]), group["os_id"][:3])
+
+Configs are generated and written in row groups of `row_group_size`
+configs, so memory usage does not depend on the number of configs.
+Every field of `generate_navigator` result is written as a separate
+column. Fields with few distinct values (DICTIONARY_FIELDS) are
+dictionary-encoded: the column stores 16-bit codes, values are stored
+once in the dictionary, new values are appended to it in the row group
+where they are seen first.
+
+Binary format (all integers little-endian):
+
+* header: magic b"UAC1", number of columns (uint8), for every column
+  length of name (uint8), name (UTF-8), encoding (uint8: 0 - dictionary,
+  1 - plain)
+* row group: number of rows (uint32), then every column:
+  - dictionary column: number of new dictionary values (uint32), every
+    value as length (uint32) and UTF-8 bytes, then codes (uint16 per
+    row, 0xFFFF is None)
+  - plain column: lengths (int32 per row, -1 is None), then UTF-8 bytes
+    of all values
+
+With pyarrow installed configs could be exported to Parquet or Arrow IPC
+files (format "parquet" or "arrow"), dictionary-encoded columns become
+dictionary arrays.
+"""
+from array import array
+import random
+import struct
+import sys
+
+from . import base
+from .error import InvalidData
+
+try:
+    import pyarrow # pylint: disable=import-error
+except ImportError: # pragma: no cover
+    pyarrow = None # pylint: disable=invalid-name
+
+__all__ = ("ColumnarWriter", "export_navigators", "read_columns")
+
+MAGIC = b"UAC1"
+FIELDS = (
+    "os_id",
+    "navigator_id",
+    "platform",
+    "oscpu",
+    "build_version",
+    "build_id",
+    "app_version",
+    "app_name",
+    "app_code_name",
+    "product",
+    "product_sub",
+    "vendor",
+    "vendor_sub",
+    "user_agent",
+)
+DICTIONARY_FIELDS = (
+    "os_id",
+    "navigator_id",
+    "platform",
+    "oscpu",
+    "app_name",
+    "app_code_name",
+    "product",
+    "product_sub",
+    "vendor",
+    "vendor_sub",
+)
+DICTIONARY, PLAIN = 0, 1
+NULL_CODE = 0xFFFF
+ROW_GROUP_SIZE = 65536
+UINT32 = struct.Struct("<I")
+
+
+def to_little_endian(arr):
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    # tobytes and frombytes are tostring and fromstring in Python 2
+    if hasattr(arr, "tobytes"):
+        return arr.tobytes()
+    return arr.tostring()
+
+
+class ColumnarWriter(object):
+    """
+    Writes configs in columnar format described in the module docstring
+
+    :param out: binary file-like object
+    :param fields: fields of configs to write
+    """
+
+    def __init__(self, out, fields=FIELDS, row_group_size=ROW_GROUP_SIZE):
+        self.out = out
+        self.fields = tuple(fields)
+        self.row_group_size = row_group_size
+        self.encodings = [
+            DICTIONARY if x in DICTIONARY_FIELDS else PLAIN for x in self.fields
+        ]
+        # {value: code} of dictionary-encoded fields
+        self.dictionaries = dict(
+            (x, {}) for x in self.fields if x in DICTIONARY_FIELDS
+        )
+        self.rows = []
+        header = bytearray(MAGIC)
+        header.append(len(self.fields))
+        for name, encoding in zip(self.fields, self.encodings):
+            name = name.encode("utf-8")
+            header.append(len(name))
+            header += name
+            header.append(encoding)
+        out.write(header)
+
+    def write(self, nav):
+        self.rows.append(nav)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def write_many(self, navs):
+        for nav in navs:
+            self.write(nav)
+
+    def flush(self):
+        """
+        Write collected configs as one row group
+        """
+
+        if not self.rows:
+            return
+        buf = bytearray(UINT32.pack(len(self.rows)))
+        for name, encoding in zip(self.fields, self.encodings):
+            values = [x[name] for x in self.rows]
+            if encoding == DICTIONARY:
+                self.encode_dictionary(buf, self.dictionaries[name], values)
+            else:
+                self.encode_plain(buf, values)
+        self.out.write(buf)
+        self.rows = []
+
+    @staticmethod
+    def encode_dictionary(buf, dictionary, values):
+        new_values = []
+        codes = array("H")
+        for value in values:
+            if value is None:
+                codes.append(NULL_CODE)
+                continue
+            try:
+                codes.append(dictionary[value])
+            except KeyError:
+                if len(dictionary) >= NULL_CODE:
+                    raise InvalidData("Too many distinct values: %s" % value)
+                code = dictionary[value] = len(dictionary)
+                new_values.append(value)
+                codes.append(code)
+        buf += UINT32.pack(len(new_values))
+        for value in new_values:
+            value = value.encode("utf-8")
+            buf += UINT32.pack(len(value))
+            buf += value
+        buf += to_little_endian(codes)
+
+    @staticmethod
+    def encode_plain(buf, values):
+        lengths = array("i")
+        data = []
+        for value in values:
+            if value is None:
+                lengths.append(-1)
+            else:
+                value = value.encode("utf-8")
+                lengths.append(len(value))
+                data.append(value)
+        buf += to_little_endian(lengths)
+        buf += b"".join(data)
+
+    def close(self):
+        self.flush()
+
+
+class ArrowWriter(object):
+    """
+    Writes configs to Parquet or Arrow IPC file with pyarrow
+    """
+
+    def __init__(self, out, fmt, fields=FIELDS, row_group_size=ROW_GROUP_SIZE):
+        if pyarrow is None:
+            raise ImportError("Format %s requires pyarrow package" % fmt)
+        self.fields = tuple(fields)
+        self.row_group_size = row_group_size
+        self.schema = pyarrow.schema(
+            [
+                (
+                    x,
+                    pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+                    if x in DICTIONARY_FIELDS
+                    else pyarrow.string(),
+                )
+                for x in self.fields
+            ]
+        )
+        if fmt == "parquet":
+            import pyarrow.parquet # pylint: disable=import-error,import-outside-toplevel
+
+            self.writer = pyarrow.parquet.ParquetWriter(out, self.schema)
+        else:
+            self.writer = pyarrow.ipc.new_file(out, self.schema)
+        self.rows = []
+
+    def write(self, nav):
+        self.rows.append(nav)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def write_many(self, navs):
+        for nav in navs:
+            self.write(nav)
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = []
+        for name in self.fields:
+            column = pyarrow.array([x[name] for x in self.rows], pyarrow.string())
+            if name in DICTIONARY_FIELDS:
+                column = column.dictionary_encode()
+            columns.append(column)
+        self.writer.write_table(pyarrow.Table.from_arrays(columns, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def export_navigators(
+    out, n, fmt="uac", row_group_size=ROW_GROUP_SIZE, rng=None, **filters
+):
+    """
+    Generate `n` configs and write them in columnar format
+
+    :param out: path or binary file-like object
+    :param fmt: "uac" (format described in the module docstring),
+        "parquet" or "arrow" (require pyarrow)
+    :param rng: source of randomness, the `random` module by default
+    :param filters: options of `generate_navigator`
+    :raises InvalidOption: if filters are invalid
+    """
+
+    if fmt not in ("uac", "parquet", "arrow"):
+        raise ValueError("Unknown format: %s" % fmt)
+    if rng is None:
+        rng = random
+    base.compile_filters(**filters)
+    close_out = False
+    if fmt == "uac" and not hasattr(out, "write"):
+        out = open(out, "wb")
+        close_out = True
+    try:
+        if fmt == "uac":
+            writer = ColumnarWriter(out, row_group_size=row_group_size)
+        else:
+            writer = ArrowWriter(out, fmt, row_group_size=row_group_size)
+        for offset in range(0, n, row_group_size):
+            count = min(row_group_size, n - offset)
+            writer.write_many(base.generate_batch(count, rng=rng, **filters))
+        writer.close()
+    finally:
+        if close_out:
+            out.close()
+
+
+def read_exactly(inp, size):
+    data = inp.read(size)
+    if len(data) != size:
+        raise InvalidData("Unexpected end of columnar data")
+    return data
+
+
+def read_array(inp, typecode, count):
+    arr = array(typecode)
+    data = read_exactly(inp, arr.itemsize * count)
+    if hasattr(arr, "frombytes"):
+        arr.frombytes(data)
+    else:
+        arr.fromstring(data)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def read_columns(source):
+    """
+    Iterate over row groups of file written by `ColumnarWriter`
+
+    :param source: path or binary file-like object
+    :return: iterator over dicts {field: list of values}
+    :raises InvalidData: if data is not valid
+    """
+
+    if hasattr(source, "read"):
+        for group in iter_row_groups(source):
+            yield group
+    else:
+        with open(source, "rb") as inp:
+            for group in iter_row_groups(inp):
+                yield group
+
+
+def iter_row_groups(inp):
+    if inp.read(len(MAGIC)) != MAGIC:
+        raise InvalidData("Invalid columnar data header")
+    columns = []
+    for _ in range(ord(read_exactly(inp, 1))):
+        name = read_exactly(inp, ord(read_exactly(inp, 1))).decode("utf-8")
+        columns.append((name, ord(read_exactly(inp, 1))))
+    dictionaries = dict((x, []) for x, y in columns if y == DICTIONARY)
+    while True:
+        data = inp.read(UINT32.size)
+        if not data:
+            return
+        if len(data) != UINT32.size:
+            raise InvalidData("Unexpected end of columnar data")
+        rows = UINT32.unpack(data)[0]
+        group = {}
+        for name, encoding in columns:
+            if encoding == DICTIONARY:
+                dictionary = dictionaries[name]
+                for _ in range(UINT32.unpack(read_exactly(inp, UINT32.size))[0]):
+                    size = UINT32.unpack(read_exactly(inp, UINT32.size))[0]
+                    dictionary.append(read_exactly(inp, size).decode("utf-8"))
+                group[name] = [
+                    None if x == NULL_CODE else dictionary[x]
+                    for x in read_array(inp, "H", rows)
+                ]
+            else:
+                lengths = read_array(inp, "i", rows)
+                data = read_exactly(inp, sum(x for x in lengths if x > 0))
+                values = []
+                pos = 0
+                for size in lengths:
+                    if size < 0:
+                        values.append(None)
+                    else:
+                        values.append(data[pos : pos + size].decode("utf-8"))
+                        pos += size
+                group[name] = values
+        yield group
@@ -0,0 +1,169 @@
+"""
+Opt-in timing of generation stages
+
+    >>> from user_agent import instrument, generate_user_agent
+    >>> instrument.enable_instrumentation()
+    >>> generate_user_agent()
+    >>> instrument.get_snapshot()
+    >>> print(instrument.format_prometheus(instrument.get_snapshot()))
+    >>> instrument.disable_instrumentation()
+
+While instrumentation is enabled every `generate_navigator` call
+(and `generate_user_agent`, `generate_navigator_js` which use it) records
+number of calls and cumulative time in nanoseconds of each stage, grouped
+by config variant "device_type-os_id-navigator_id". The stages are the
+steps of `generate_navigator`: `compile_filters`, `choose_variant` with
+the lookup of the variant plan, `VariantEngine.draw` and
+`VariantEngine.render`. When disabled the only cost is one check of
+module-level variable per call.
+"""
+import threading
+import time
+
+from . import base
+
+__all__ = (
+    "Instrumentation",
+    "enable_instrumentation",
+    "disable_instrumentation",
+    "get_snapshot",
+    "reset_instrumentation",
+    "format_prometheus",
+)
+
+STAGES = (
+    "compile_filters",
+    "choose_variant",
+    "draw",
+    "render",
+)
+
+try:
+    perf_counter_ns = time.perf_counter_ns # pylint: disable=invalid-name
+except AttributeError: # pragma: no cover, python < 3.7
+    _clock = getattr(time, "perf_counter", time.time) # pylint: disable=invalid-name
+
+    def perf_counter_ns():
+        return int(_clock() * 1e9)
+
+
+class Instrumentation(object):
+    """
+    Collects per-stage call counts and cumulative durations
+
+    :param callback: optional function called after each generation with
+        arguments (variant, list of (stage, nanoseconds) pairs)
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._lock = threading.Lock()
+        # {variant: [calls, stage1 ns, stage2 ns, ...]}
+        self._stats = {}
+
+    def generate_navigator(self, device_type, os, navigator, rng, filters=None):
+        clock = perf_counter_ns
+        t0 = clock()
+        spec = base.compile_filters(device_type, os, navigator, **(filters or {}))
+        t1 = clock()
+        variant = base.choose_variant(spec, rng)
+        engine, platforms, builds, cum_weights = spec.plans[variant]
+        t2 = clock()
+        positions = engine.draw(rng, platforms, builds, cum_weights)
+        t3 = clock()
+        nav = engine.render(*positions)
+        t4 = clock()
+        timings = (t1 - t0, t2 - t1, t3 - t2, t4 - t3)
+        variant = "%s-%s-%s" % variant
+        with self._lock:
+            try:
+                row = self._stats[variant]
+            except KeyError:
+                row = self._stats[variant] = [0] * (len(STAGES) + 1)
+            row[0] += 1
+            for idx, value in enumerate(timings, 1):
+                row[idx] += value
+        if self.callback is not None:
+            self.callback(variant, list(zip(STAGES, timings)))
+        return nav
+
+    def snapshot(self):
+        """
+        Return dict {stage: {variant: {"calls": int, "total_ns": int}}}
+        """
+
+        with self._lock:
+            stats = dict((x, list(y)) for x, y in self._stats.items())
+        res = dict((x, {}) for x in STAGES)
+        for variant, row in stats.items():
+            for idx, stage in enumerate(STAGES, 1):
+                res[stage][variant] = {"calls": row[0], "total_ns": row[idx]}
+        return res
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def enable_instrumentation(callback=None):
+    """
+    Start collecting timings of generation stages
+
+    Returns the `Instrumentation` object.
+    """
+
+    base._INSTRUMENTATION = Instrumentation(callback) # pylint: disable=protected-access
+    return base._INSTRUMENTATION # pylint: disable=protected-access
+
+
+def disable_instrumentation():
+    """
+    Stop collecting timings, return the last `Instrumentation` object
+    """
+
+    inst = base._INSTRUMENTATION # pylint: disable=protected-access
+    base._INSTRUMENTATION = None # pylint: disable=protected-access
+    return inst
+
+
+def get_snapshot():
+    """
+    Return snapshot of current instrumentation, see `Instrumentation.snapshot`
+
+    Returns empty dict if instrumentation is not enabled.
+    """
+
+    inst = base._INSTRUMENTATION # pylint: disable=protected-access
+    return {} if inst is None else inst.snapshot()
+
+
+def reset_instrumentation():
+    inst = base._INSTRUMENTATION # pylint: disable=protected-access
+    if inst is not None:
+        inst.reset()
+
+
+def format_prometheus(snapshot, prefix="user_agent"):
+    """
+    Format snapshot in Prometheus text exposition format
+    """
+
+    lines = [
+        "# HELP %s_stage_calls_total Number of calls of generation stage" % prefix,
+        "# TYPE %s_stage_calls_total counter" % prefix,
+    ]
+    durations = [
+        "# HELP %s_stage_duration_nanoseconds_total Time spent in generation stage"
+        % prefix,
+        "# TYPE %s_stage_duration_nanoseconds_total counter" % prefix,
+    ]
+    for stage in sorted(snapshot):
+        for variant in sorted(snapshot[stage]):
+            item = snapshot[stage][variant]
+            labels = '{stage="%s",variant="%s"}' % (stage, variant)
+            lines.append("%s_stage_calls_total%s %d" % (prefix, labels, item["calls"]))
+            durations.append(
+                "%s_stage_duration_nanoseconds_total%s %d"
+                % (prefix, labels, item["total_ns"])
+            )
+    return "\n".join(lines + durations) + "\n"
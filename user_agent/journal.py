@@ -0,0 +1,308 @@
+"""
+Checkpointable generation and compact replay journal
+
+    >>> from user_agent.journal import ProfileGenerator, replay_journal
+    >>> gen = ProfileGenerator(seed=42, journal="run.uaj", os="win")
+    >>> navs = [next(gen) for _ in range(1000)]
+    >>> state = gen.checkpoint()
+    >>> gen.close()
+    >>> gen = ProfileGenerator.restore(state, journal="run.uaj")
+    >>> navs = list(replay_journal("run.uaj"))
+
+`ProfileGenerator` makes the same random draws as `generate_navigator`
+does. Its checkpoint is a JSON-serializable dict with the state of
+the random generator, the number of generated configs, the filters
+(as_of as ISO date string, max_age in seconds) and the fingerprint of
+data tables. Restoring a checkpoint continues the
+sequence exactly, restoring it with different tables fails.
+
+The journal is an append-only binary file: header (magic bytes and
+SHA-256 fingerprint of tables) followed by one 11-byte record per config
+holding positions in the tables: config variant, platform, cpu, device or
+Mac minor version, browser version and random part of the version. Replay
+renders the same configs from the positions.
+"""
+import binascii
+from datetime import datetime, timedelta
+import hashlib
+import os
+import struct
+
+import six
+
+from . import base
+from .bulkrand import BulkRandom
+from .error import InvalidData
+
+__all__ = (
+    "ProfileGenerator",
+    "JournalWriter",
+    "read_journal",
+    "replay_journal",
+    "get_tables_fingerprint",
+)
+
+MAGIC = b"UAJ1"
+HEADER_SIZE = len(MAGIC) + 32
+# variant, platform, cpu, detail, build, build detail
+RECORD = struct.Struct("<BBBHHI")
+CHECKPOINT_VERSION = 1
+FLUSH_SIZE = 1 << 16
+
+# (tables, fingerprint)
+_FINGERPRINT = ((), None)
+
+
+def canonical(value):
+    """
+    Return string representation of table not depending on order
+    of dict items
+    """
+
+    if isinstance(value, dict):
+        items = sorted(canonical(x) + ":" + canonical(y) for x, y in value.items())
+        return "{" + ",".join(items) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(canonical(x) for x in value) + "]"
+    if isinstance(value, six.string_types):
+        return six.text_type(value).encode("unicode_escape").decode("ascii")
+    return repr(value)
+
+
+def get_tables_fingerprint():
+    """
+    Return SHA-256 digest (bytes) of tables listed in `base.TABLE_NAMES`
+    """
+
+    global _FINGERPRINT # pylint: disable=global-statement
+    tables, digest = _FINGERPRINT
+    if base.tables_changed(tables):
+        tables = base.get_tables()
+        data = canonical(list(zip(base.TABLE_NAMES, tables)))
+        digest = hashlib.sha256(data.encode("utf-8")).digest()
+        _FINGERPRINT = (tables, digest)
+    return digest
+
+
+def get_all_variants():
+    return base.get_variant_masks()[0]
+
+
+class JournalWriter(object):
+    """
+    Appends records to journal file
+
+    :param path: path of the journal, created if it does not exist
+    :param position: number of records to keep in existing journal,
+        records after it are removed; all records by default, with 0
+        the new journal is started
+    :raises InvalidData: if existing journal was written with
+        different tables
+    """
+
+    def __init__(self, path, position=None):
+        self.path = path
+        self.fingerprint = get_tables_fingerprint()
+        self._buf = bytearray()
+        if position == 0 or not os.path.exists(path) or not os.path.getsize(path):
+            if position:
+                raise InvalidData("Journal %s has no records" % path)
+            self._file = open(path, "wb")
+            self._file.write(MAGIC + self.fingerprint)
+            self.position = 0
+            return
+        self._file = open(path, "r+b")
+        try:
+            check_header(self._file.read(HEADER_SIZE), self.fingerprint)
+            self.position = (os.path.getsize(path) - HEADER_SIZE) // RECORD.size
+            if position is not None:
+                if position > self.position:
+                    raise InvalidData(
+                        "Journal %s has %d records, %d expected"
+                        % (path, self.position, position)
+                    )
+                self.position = position
+        except InvalidData:
+            self._file.close()
+            raise
+        self._file.truncate(HEADER_SIZE + self.position * RECORD.size)
+        self._file.seek(0, os.SEEK_END)
+
+    def append(self, record):
+        self._buf += RECORD.pack(*record)
+        self.position += 1
+        if len(self._buf) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        self._file.write(self._buf)
+        del self._buf[:]
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def check_header(header, fingerprint):
+    if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+        raise InvalidData("Invalid journal header")
+    if header[len(MAGIC) :] != fingerprint:
+        raise InvalidData("Journal was written with different data tables")
+
+
+def read_journal(path):
+    """
+    Iterate over records of journal: tuples (variant, platform, cpu,
+    detail, build, build detail)
+
+    :raises InvalidData: if the journal was written with different tables
+    """
+
+    with open(path, "rb") as inp:
+        check_header(inp.read(HEADER_SIZE), get_tables_fingerprint())
+        size = RECORD.size
+        unpack = RECORD.unpack_from
+        while True:
+            data = inp.read(size * 4096)
+            for offset in range(0, len(data) - size + 1, size):
+                yield unpack(data, offset)
+            if len(data) < size * 4096:
+                break
+
+
+def replay_journal(path):
+    """
+    Iterate over configs recorded in journal, see `read_journal`
+    """
+
+    engines = base.get_engines()
+    variants = [engines[x] for x in get_all_variants()]
+    for record in read_journal(path):
+        yield variants[record[0]].render(*record[1:])
+
+
+def get_hex(digest):
+    return binascii.hexlify(digest).decode("ascii")
+
+
+def encode_filters(filters):
+    """
+    Return filters with as_of and max_age converted to JSON values
+    """
+
+    res = dict(filters)
+    if res.get("as_of") is not None:
+        res["as_of"] = res["as_of"].isoformat()
+    if res.get("max_age") is not None:
+        res["max_age"] = res["max_age"].total_seconds()
+    return res
+
+
+def decode_filters(filters):
+    """
+    Reverse of `encode_filters`, as_of is restored as datetime
+    of the same day
+    """
+
+    res = dict(filters)
+    try:
+        if res.get("as_of") is not None:
+            res["as_of"] = datetime.strptime(res["as_of"][:10], "%Y-%m-%d")
+        if res.get("max_age") is not None:
+            res["max_age"] = timedelta(seconds=res["max_age"])
+    except (TypeError, ValueError):
+        raise InvalidData("Invalid filters of checkpoint: %s" % (filters,))
+    return res
+
+
+def freeze_state(value):
+    """
+    Convert lists of random generator state loaded from JSON to tuples
+    """
+
+    if isinstance(value, list):
+        return tuple(freeze_state(x) for x in value)
+    return value
+
+
+class ProfileGenerator(six.Iterator):
+    """
+    Iterator over generated configs which state could be saved
+    with `checkpoint` and restored with `restore`
+
+    :param seed: seed of random generator, random if not given
+    :param journal: optional path of journal file
+    :param filters: options of `generate_navigator`
+    :raises InvalidOption: if filters are invalid
+    """
+
+    def __init__(self, seed=None, journal=None, **filters):
+        if filters.get("max_age") is not None and filters.get("as_of") is None:
+            # restored generator should use the same window
+            filters["as_of"] = datetime.now()
+        self.filters = filters
+        self.spec = base.compile_filters(**filters)
+        self.rng = BulkRandom(seed)
+        self.position = 0
+        self.fingerprint = get_tables_fingerprint()
+        variants = get_all_variants()
+        self._variant_index = dict((x, pos) for pos, x in enumerate(variants))
+        self.journal = None
+        if journal is not None:
+            self.journal = JournalWriter(journal, 0)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        spec = self.spec
+        variant = base.choose_variant(spec, self.rng)
+        engine, platforms, builds, cum_weights = spec.plans[variant]
+        positions = engine.draw(self.rng, platforms, builds, cum_weights)
+        self.position += 1
+        if self.journal is not None:
+            self.journal.append((self._variant_index[variant],) + positions)
+        return engine.render(*positions)
+
+    def checkpoint(self):
+        """
+        Return dict with state of the generator, the journal
+        is flushed
+        """
+
+        if self.journal is not None:
+            self.journal.flush()
+        return {
+            "version": CHECKPOINT_VERSION,
+            "position": self.position,
+            "rng_state": self.rng.getstate(),
+            "tables": get_hex(self.fingerprint),
+            "filters": encode_filters(self.filters),
+        }
+
+    @classmethod
+    def restore(cls, state, journal=None):
+        """
+        Build generator from result of `checkpoint`, records of
+        the journal made after the checkpoint are removed
+
+        :raises InvalidData: if checkpoint is invalid or was made with
+            different tables
+        """
+
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise InvalidData("Unknown checkpoint version: %s" % state.get("version"))
+        if state["tables"] != get_hex(get_tables_fingerprint()):
+            raise InvalidData("Checkpoint was made with different data tables")
+        gen = cls(**decode_filters(state["filters"]))
+        gen.rng.setstate(freeze_state(state["rng_state"]))
+        gen.position = state["position"]
+        if journal is not None:
+            gen.journal = JournalWriter(journal, gen.position)
+        return gen
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
@@ -0,0 +1,419 @@
+"""
+Learning frequencies of configs from access logs
+
+    $ ua learn access.log -o weights.json
+
+    >>> from user_agent import generate_user_agent
+    >>> from user_agent.learn import load_weights
+    >>> generate_user_agent(weights=load_weights("weights.json"))
+
+Logs are read once line by line, the user agent is the quoted field
+`field` of the line split by double quotes (not escaped with backslash):
+5 in combined log format and its extensions appending more quoted fields
+like X-Forwarded-For. Lines without that field are skipped.
+Every user agent is classified against the generator's tables: config
+variant (device_type, os_id, navigator_id), platform version (entry of
+`OS_PLATFORM`) and browser version (entry of `CHROME_BUILD`,
+`FIREFOX_VERSION` or `IE_VERSION`); Android Chrome user agents with
+device ids from SMARTPHONE_DEV_IDS or TABLET_DEV_IDS get the device type
+of the list. User agents of other browsers and systems are counted as
+unclassified. Browser versions missing in the tables are counted as
+the entry with the nearest major version, so versions newer than the
+tables count as the newest entry.
+
+Counters are fixed-size lists indexed by position in the tables, like
+in `user_agent.metrics`, and classification results of recent user
+agents are kept in a cache of limited size, so memory usage does not
+depend on size of logs.
+
+The weights file has the format of `MetricsRegistry.snapshot`: counts
+by "variant", "platform_version" and "build_version". Its "variant" and
+"build_version" items are the `weights` option of `generate_navigator`.
+Platform versions are reported but not used as weights: the platform is
+drawn uniformly from positions shared by `draw`, `draw_many`, journals
+and conformance checks, and Android platforms are limited by devices.
+"""
+from __future__ import print_function
+from bisect import bisect_left
+import io
+import json
+import re
+
+from . import base
+from .metrics import build_index
+
+__all__ = ("LogLearner", "classify_user_agent", "learn_weights", "load_weights")
+
+CACHE_SIZE = 10000
+# Index of the user agent in line split by double quotes, combined format:
+# host ident user [time] "request" status size "referer" "user agent"
+UA_FIELD = 5
+BYTES_QUOTES = (b'"', b"\\")
+TEXT_QUOTES = (u'"', u"\\")
+# Browsers based on Chrome or Firefox which user agents contain
+# their tokens
+EXCLUDED_TOKENS = (
+    " Edg/",
+    " Edge/",
+    " EdgA/",
+    " OPR/",
+    " YaBrowser/",
+    " SamsungBrowser/",
+    " Vivaldi/",
+    " UCBrowser/",
+    " SeaMonkey/",
+    " Chromium/",
+)
+RE_CHROME = re.compile(r" Chrome/(\d+)\.")
+RE_FIREFOX = re.compile(r" Firefox/(\d+(?:\.\d+)+)$")
+RE_MSIE = re.compile(r"; MSIE (\d+)\.0;")
+RE_TRIDENT_11 = re.compile(r"; Trident/7\.0;.* rv:11\.0\) like Gecko$")
+RE_SYSTEM = re.compile(r"^Mozilla/5\.0 \(([^)]*)\)")
+RE_WINDOWS = re.compile(r"Windows NT \d+\.\d+")
+RE_MAC = re.compile(r"^Macintosh; Intel Mac OS X (\d+)[._](\d+)")
+RE_ANDROID = re.compile(r"Android \d+(?:\.\d+)*")
+RE_MAJOR = re.compile(r"\d+")
+
+
+def find_quote(line, quotes, pos):
+    """
+    Return position of the first double quote not escaped with backslash
+    in line starting from `pos` or -1, `quotes` is pair of quote
+    and backslash of type of the line
+    """
+
+    quote, backslash = quotes
+    while True:
+        pos = line.find(quote, pos)
+        if pos <= 0 or line[pos - 1 : pos] != backslash:
+            return pos
+        pos += 1
+
+
+def find_user_agent(line, field=UA_FIELD):
+    """
+    Return (start, end) position of user agent in line of access log
+    (text or bytes) or None if the line has no quoted field `field`,
+    see the module docstring
+    """
+
+    quotes = BYTES_QUOTES if isinstance(line, bytes) else TEXT_QUOTES
+    start = 0
+    for _ in range(field):
+        pos = find_quote(line, quotes, start)
+        if pos < 0:
+            return None
+        start = pos + 1
+    end = find_quote(line, quotes, start)
+    if end < 0:
+        return None
+    return start, end
+
+
+def extract_user_agent(line, field=UA_FIELD):
+    """
+    Return user agent from line of access log or None
+    """
+
+    span = find_user_agent(line, field)
+    if span is None:
+        return None
+    return line[span[0] : span[1]].strip() or None
+
+
+def get_major(label):
+    """
+    Return major version of browser version label like "80" or "MSIE 11.0"
+    """
+
+    return int(RE_MAJOR.search(label).group(0))
+
+
+def classify_user_agent(user_agent):
+    """
+    Return (device_type, os_id, navigator_id, platform, build) of user
+    agent or None if it is not generated by this package, `platform`
+    is OS_PLATFORM entry like "Windows NT 6.1", `build` is label of
+    browser version (see `base.get_build_label`)
+    """
+
+    if any(x in user_agent for x in EXCLUDED_TOKENS):
+        return None
+    match = RE_SYSTEM.match(user_agent)
+    if match is None:
+        return None
+    system = match.group(1)
+    if "MSIE" in system or "Trident/" in system:
+        match = RE_MSIE.search(user_agent)
+        if match is not None:
+            build = "MSIE %s.0" % match.group(1)
+        elif RE_TRIDENT_11.search(user_agent):
+            build = "MSIE 11.0"
+        else:
+            return None
+        navigator_id = "ie"
+    else:
+        match = RE_CHROME.search(user_agent)
+        if match is not None:
+            navigator_id = "chrome"
+            build = match.group(1)
+        else:
+            match = RE_FIREFOX.search(user_agent)
+            if match is None:
+                return None
+            navigator_id = "firefox"
+            build = match.group(1).split(".", 1)[0]
+
+    device_type = "desktop"
+    if "Android" in system:
+        os_id = "android"
+        match = RE_ANDROID.search(system)
+        platform = match.group(0) if match else None
+        if navigator_id == "chrome":
+            device_id = system.rsplit("; ", 1)[-1]
+            if device_id in base.SMARTPHONE_DEV_IDS:
+                device_type = "smartphone"
+            elif device_id in base.TABLET_DEV_IDS:
+                device_type = "tablet"
+            elif " Mobile Safari/" in user_agent:
+                device_type = "smartphone"
+            else:
+                device_type = "tablet"
+        elif "; Tablet;" in system:
+            device_type = "tablet"
+        else:
+            device_type = "smartphone"
+    elif "Windows NT" in system:
+        os_id = "win"
+        match = RE_WINDOWS.search(system)
+        platform = match.group(0) if match else None
+    elif system.startswith("Macintosh;"):
+        os_id = "mac"
+        match = RE_MAC.match(system)
+        platform = (
+            "Macintosh; Intel Mac OS X %s.%s" % match.groups() if match else None
+        )
+    elif system.startswith("X11;") and "Linux" in system:
+        os_id = "linux"
+        platform = None
+        for entry in base.OS_PLATFORM["linux"]:
+            if system.startswith(entry) and (
+                platform is None or len(entry) > len(platform)
+            ):
+                platform = entry
+    else:
+        return None
+    return device_type, os_id, navigator_id, platform, build
+
+
+class LogLearner(object):
+    """
+    Counters of user agents classified by `classify_user_agent`
+
+    :param cache_size: number of distinct user agents which
+        classification results are cached
+    :param field: index of user agent in access log lines, see
+        `find_user_agent`
+    """
+
+    def __init__(self, cache_size=CACHE_SIZE, field=UA_FIELD):
+        self.cache_size = cache_size
+        self.field = field
+        self.variants = [tuple(x) for x in base.get_config_variants("all", None, None)]
+        self._variant_index = dict((x, pos) for pos, x in enumerate(self.variants))
+        self._platform_index = {}
+        self._platform_labels = {}
+        for os_id, platforms in base.OS_PLATFORM.items():
+            index, labels = build_index(platforms)
+            self._platform_index[os_id] = index
+            self._platform_labels[os_id] = labels
+        self._build_index = {}
+        self._build_labels = {}
+        # {navigator_id: sorted list of (major version, position)}
+        self._build_majors = {}
+        for nav, rules in base.NAVIGATOR_RULES.items():
+            index, labels = build_index(
+                base.get_build_label(rules["versions"], x)
+                for x in getattr(base, rules["table"])
+            )
+            self._build_index[nav] = index
+            self._build_labels[nav] = labels
+            self._build_majors[nav] = sorted(
+                (get_major(x), pos) for pos, x in enumerate(labels[:-1])
+            )
+        # {user agent: (variant pos, os_id, platform pos, navigator_id,
+        #  build pos) or None}
+        self._cache = {}
+        self.total = 0
+        self.unclassified = 0
+        self.variant_counts = [0] * len(self.variants)
+        self.platform_counts = dict(
+            (x, [0] * len(y)) for x, y in self._platform_labels.items()
+        )
+        self.build_counts = dict(
+            (x, [0] * len(y)) for x, y in self._build_labels.items()
+        )
+
+    def get_positions(self, user_agent):
+        try:
+            return self._cache[user_agent]
+        except KeyError:
+            pass
+        res = classify_user_agent(user_agent)
+        if res is not None:
+            device_type, os_id, navigator_id, platform, build = res
+            try:
+                variant_pos = self._variant_index[(device_type, os_id, navigator_id)]
+            except KeyError:
+                res = None
+            else:
+                build_pos = self._build_index[navigator_id].get(build)
+                if build_pos is None:
+                    build_pos = self.get_nearest_build(navigator_id, build)
+                res = (
+                    variant_pos,
+                    os_id,
+                    self._platform_index[os_id].get(platform, -1),
+                    navigator_id,
+                    build_pos,
+                )
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[user_agent] = res
+        return res
+
+    def get_nearest_build(self, navigator_id, build):
+        """
+        Return position of version table entry with the major version
+        nearest to label `build`, the newer one of two equally near
+        """
+
+        majors = self._build_majors[navigator_id]
+        if not majors:
+            return -1
+        major = get_major(build)
+        idx = bisect_left(majors, (major, -1))
+        if idx == len(majors):
+            return majors[-1][1]
+        if idx and major - majors[idx - 1][0] < majors[idx][0] - major:
+            return majors[idx - 1][1]
+        return majors[idx][1]
+
+    def add(self, user_agent):
+        """
+        Count one user agent
+        """
+
+        self.total += 1
+        positions = self.get_positions(user_agent)
+        if positions is None:
+            self.unclassified += 1
+            return
+        variant_pos, os_id, platform_pos, navigator_id, build_pos = positions
+        self.variant_counts[variant_pos] += 1
+        self.platform_counts[os_id][platform_pos] += 1
+        self.build_counts[navigator_id][build_pos] += 1
+
+    def add_lines(self, lines):
+        """
+        Count user agents of access log lines
+        """
+
+        field = self.field
+        for line in lines:
+            user_agent = extract_user_agent(line, field)
+            if user_agent is not None:
+                self.add(user_agent)
+
+    def result(self):
+        """
+        Return dict with counters in the format of the weights file,
+        zero counters are omitted
+        """
+
+        variants = {}
+        for (dev, os_id, nav), count in zip(self.variants, self.variant_counts):
+            if count:
+                variants["%s-%s-%s" % (dev, os_id, nav)] = count
+        platforms = {}
+        for os_id, counts in self.platform_counts.items():
+            labels = self._platform_labels[os_id]
+            items = dict((x, y) for x, y in zip(labels, counts) if y)
+            if items:
+                platforms[os_id] = items
+        builds = {}
+        for nav, counts in self.build_counts.items():
+            labels = self._build_labels[nav]
+            items = dict((x, y) for x, y in zip(labels, counts) if y)
+            if items:
+                builds[nav] = items
+        return {
+            "total": self.total,
+            "unclassified": self.unclassified,
+            "variant": variants,
+            "platform_version": platforms,
+            "build_version": builds,
+        }
+
+
+def learn_weights(sources, cache_size=CACHE_SIZE, field=UA_FIELD):
+    """
+    Count user agents of access logs, see `LogLearner.result`
+
+    :param sources: paths or text file-like objects
+    :param field: index of user agent in lines, see `find_user_agent`
+    """
+
+    learner = LogLearner(cache_size, field)
+    for source in sources:
+        if hasattr(source, "read"):
+            learner.add_lines(source)
+        else:
+            with io.open(source, encoding="utf-8", errors="replace") as inp:
+                learner.add_lines(inp)
+    return learner.result()
+
+
+def load_weights(path):
+    """
+    Load weights file and return value of `weights` option
+    of `generate_navigator`, platform versions are not used
+    """
+
+    with io.open(path, encoding="utf-8") as inp:
+        data = json.load(inp)
+    return dict((x, data[x]) for x in ("variant", "build_version") if x in data)
+
+
+def main(args=None):
+    from argparse import ArgumentParser # pylint: disable=import-outside-toplevel
+    import sys # pylint: disable=import-outside-toplevel
+
+    parser = ArgumentParser(prog="ua learn")
+    parser.add_argument("logs", nargs="+", help='access logs, "-" is stdin')
+    parser.add_argument("-o", "--output", help="weights file, stdout by default")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    parser.add_argument(
+        "--field",
+        type=int,
+        default=UA_FIELD,
+        help="index of user agent in lines split by double quotes,"
+        " %(default)s in combined log format",
+    )
+    opts = parser.parse_args(args)
+    res = learn_weights(
+        [sys.stdin if x == "-" else x for x in opts.logs],
+        opts.cache_size,
+        opts.field,
+    )
+    data = json.dumps(res, indent=2, sort_keys=True)
+    if opts.output is None:
+        print(data)
+    else:
+        with open(opts.output, "w") as out:
+            out.write(data + "\n")
+    print(
+        "classified %d of %d user agents"
+        % (res["total"] - res["unclassified"], res["total"]),
+        file=sys.stderr,
+    )
@@ -0,0 +1,297 @@
+"""
+Counters of generated configs
+
+    >>> from user_agent import metrics, generate_user_agent
+    >>> registry = metrics.enable_metrics()
+    >>> generate_user_agent()
+    >>> registry.snapshot()
+    >>> registry.reset()
+    >>> metrics.disable_metrics()
+
+While enabled, every generated config is counted by config variant
+(device_type, os_id, navigator_id), by platform version (entry of
+`OS_PLATFORM`) and by browser version (entry of `CHROME_BUILD`,
+`FIREFOX_VERSION` or `IE_VERSION`, labeled by `base.get_build_label`).
+Counters are fixed-size lists indexed by position in these tables. The
+number of distinct user agents is estimated with HyperLogLog using
+constant memory.
+
+Indexes are built from the tables when the registry is created and
+rebuilt when the tables are replaced (see `user_agent.provider`), counts
+are kept by label. Values missing in the tables are counted in the
+"other" slot.
+"""
+import hashlib
+import math
+import struct
+import threading
+
+import six
+
+from . import base
+
+__all__ = ("MetricsRegistry", "HyperLogLog", "enable_metrics", "disable_metrics")
+
+OTHER = "other"
+
+
+class HyperLogLog(object):
+    """
+    Approximate counter of distinct values
+
+    :param precision: number of bits used to select register, standard
+        error of estimation is 1.04 / sqrt(2 ** precision)
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self.alpha = 0.7213 / (1 + 1.079 / self.size)
+
+    def add(self, value):
+        if isinstance(value, six.text_type):
+            value = value.encode("utf-8")
+        hashed = struct.unpack("<Q", hashlib.md5(value).digest()[:8])[0]
+        idx = hashed & (self.size - 1)
+        rest = hashed >> self.precision
+        bits = 64 - self.precision
+        # position of the leftmost 1-bit in the rest
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self):
+        size = self.size
+        total = 0.0
+        zeros = 0
+        for reg in self.registers:
+            total += 2.0 ** -reg
+            if not reg:
+                zeros += 1
+        estimate = self.alpha * size * size / total
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(float(size) / zeros)
+        return int(round(estimate))
+
+    def reset(self):
+        self.registers = bytearray(self.size)
+
+
+def build_index(values):
+    """
+    Return dict {value: position} and list of labels with "other" slot
+    """
+
+    index = {}
+    labels = []
+    for value in values:
+        if value not in index:
+            index[value] = len(labels)
+            labels.append(value)
+    return index, labels + [OTHER]
+
+
+def move_counts(labels, counts, index, size):
+    """
+    Return list of `size` counters with `counts` of `labels` moved
+    to positions of the labels in `index`, unknown labels go
+    to the "other" slot
+    """
+
+    res = [0] * size
+    for label, count in zip(labels, counts):
+        if count:
+            res[index.get(label, -1)] += count
+    return res
+
+
+class MetricsRegistry(object):
+    """
+    Thread-safe counters of generated configs
+    """
+
+    def __init__(self, hll_precision=12):
+        self._lock = threading.Lock()
+        self.distinct = HyperLogLog(hll_precision)
+        self.build_indexes()
+        self.reset()
+
+    def build_indexes(self):
+        """
+        Build indexes of the current tables
+        """
+
+        self._tables = base.get_tables()
+        self.variants = [
+            tuple(x) for x in base.get_config_variants("all", None, None)
+        ]
+        self._variant_index, self._variant_labels = build_index(self.variants)
+        self._platform_index = {}
+        self._platform_labels = {}
+        for os_id, platforms in base.OS_PLATFORM.items():
+            index, labels = build_index(platforms)
+            self._platform_index[os_id] = index
+            self._platform_labels[os_id] = labels
+        self._build_index = {}
+        self._build_labels = {}
+        self._build_versions = {}
+        for nav, rules in base.NAVIGATOR_RULES.items():
+            index, labels = build_index(
+                base.get_build_label(rules["versions"], x)
+                for x in getattr(base, rules["table"])
+            )
+            self._build_index[nav] = index
+            self._build_labels[nav] = labels
+            self._build_versions[nav] = rules["versions"]
+
+    def rebuild_indexes(self):
+        """
+        Build indexes of the current tables keeping counts by label,
+        called with the lock held
+        """
+
+        variants = self._variant_labels
+        platforms = self._platform_labels
+        builds = self._build_labels
+        variant_counts = self.variant_counts
+        platform_counts = self.platform_counts
+        build_counts = self.build_counts
+        self.build_indexes()
+        self.variant_counts = move_counts(
+            variants,
+            variant_counts,
+            self._variant_index,
+            len(self._variant_labels),
+        )
+        self.platform_counts = self.move_table_counts(
+            platforms, platform_counts, self._platform_index, self._platform_labels
+        )
+        self.build_counts = self.move_table_counts(
+            builds, build_counts, self._build_index, self._build_labels
+        )
+
+    @staticmethod
+    def move_table_counts(old_labels, old_counts, indexes, labels):
+        res = {}
+        for key, key_labels in labels.items():
+            if key in old_counts:
+                res[key] = move_counts(
+                    old_labels[key], old_counts[key], indexes[key], len(key_labels)
+                )
+            else:
+                res[key] = [0] * len(key_labels)
+        return res
+
+    def reset(self):
+        with self._lock:
+            self.total = 0
+            self.variant_counts = [0] * len(self._variant_labels)
+            self.platform_counts = dict(
+                (x, [0] * len(y)) for x, y in self._platform_labels.items()
+            )
+            self.build_counts = dict(
+                (x, [0] * len(y)) for x, y in self._build_labels.items()
+            )
+            self.distinct.reset()
+
+    def observe(self, device_type, os_id, navigator_id, system, app, user_agent):
+        """
+        Count one generated config
+        """
+
+        with self._lock:
+            if base.tables_changed(self._tables):
+                self.rebuild_indexes()
+            self.total += 1
+            self.variant_counts[
+                self._variant_index.get((device_type, os_id, navigator_id), -1)
+            ] += 1
+            counts = self.platform_counts.get(os_id)
+            if counts is not None:
+                counts[
+                    self._platform_index[os_id].get(system["platform_version"], -1)
+                ] += 1
+            counts = self.build_counts.get(navigator_id)
+            if counts is not None:
+                label = base.get_version_label(
+                    self._build_versions[navigator_id], app["build_version"]
+                )
+                counts[self._build_index[navigator_id].get(label, -1)] += 1
+            self.distinct.add(user_agent)
+
+    def snapshot(self):
+        """
+        Return dict with current values of counters, zero counters
+        are omitted
+        """
+
+        with self._lock:
+            variants = {}
+            device_types = {}
+            oses = {}
+            navigators = {}
+            for variant, count in zip(self._variant_labels, self.variant_counts):
+                if not count:
+                    continue
+                if variant == OTHER:
+                    variants[OTHER] = count
+                    continue
+                dev, os_id, nav = variant
+                variants["%s-%s-%s" % variant] = count
+                device_types[dev] = device_types.get(dev, 0) + count
+                oses[os_id] = oses.get(os_id, 0) + count
+                navigators[nav] = navigators.get(nav, 0) + count
+            platforms = {}
+            for os_id, counts in self.platform_counts.items():
+                labels = self._platform_labels[os_id]
+                items = dict((x, y) for x, y in zip(labels, counts) if y)
+                if items:
+                    platforms[os_id] = items
+            builds = {}
+            for nav, counts in self.build_counts.items():
+                labels = self._build_labels[nav]
+                items = dict((x, y) for x, y in zip(labels, counts) if y)
+                if items:
+                    builds[nav] = items
+            return {
+                "total": self.total,
+                "device_type": device_types,
+                "os_id": oses,
+                "navigator_id": navigators,
+                "variant": variants,
+                "platform_version": platforms,
+                "build_version": builds,
+                "distinct_user_agents": self.distinct.count(),
+            }
+
+
+def enable_metrics(registry=None):
+    """
+    Start counting generated configs
+
+    Returns the `MetricsRegistry` object.
+    """
+
+    if registry is None:
+        registry = MetricsRegistry()
+    base._METRICS = registry # pylint: disable=protected-access
+    return registry
+
+
+def disable_metrics():
+    """
+    Stop counting, return the last `MetricsRegistry` object
+    """
+
+    registry = base._METRICS # pylint: disable=protected-access
+    base._METRICS = None # pylint: disable=protected-access
+    return registry
+
+
+def get_metrics():
+    """
+    Return active `MetricsRegistry` or None
+    """
+
+    return base._METRICS # pylint: disable=protected-access
@@ -0,0 +1,138 @@
+"""
+Reproducible generation of large batches in a pool of processes
+
+    >>> from user_agent.parallel import generate_parallel
+    >>> for nav in generate_parallel(10 ** 6, jobs=8, seed=42, os="win"):
+    ...     print(nav["user_agent"])
+
+Work is split into chunks of `chunk_size` configs. Chunk N is generated
+with its own `BulkRandom` generator seeded with the hash of (seed, N),
+so the output depends only on seed, chunk_size and filters: it is the
+same for any number of processes and any order in which chunks are
+finished, configs generated for smaller n are the prefix of ones
+generated for bigger n. At most `max_pending` chunks are in flight,
+results are yielded in chunk order as soon as the next chunk is ready.
+"""
+from collections import deque
+import hashlib
+from itertools import islice
+import multiprocessing
+import os
+
+from . import base
+from .bulkrand import BulkRandom
+
+__all__ = ("generate_parallel", "generate_chunk")
+
+CHUNK_SIZE = 10000
+
+
+def get_cpu_count():
+    """
+    Return number of CPUs, 1 if it is not known
+    """
+
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def get_chunk_rng(seed, index):
+    """
+    Return random generator of chunk `index`
+    """
+
+    key = ("%s\x00%d" % (seed, index)).encode("utf-8")
+    return BulkRandom(int(hashlib.sha256(key).hexdigest(), 16))
+
+
+def generate_chunk(seed, index, count, chunk_size, filters):
+    """
+    Generate first `count` configs of chunk `index`, runs in worker process
+
+    The whole chunk is generated: batches draw values field by field,
+    so the first configs of a smaller batch would be different.
+    """
+
+    rng = get_chunk_rng(seed, index)
+    return base.generate_batch(chunk_size, rng=rng, **filters)[:count]
+
+
+def iter_chunks(n, chunk_size):
+    for index, start in enumerate(range(0, n, chunk_size)):
+        yield index, min(chunk_size, n - start)
+
+
+def generate_parallel(
+    n, jobs=None, seed=None, chunk_size=CHUNK_SIZE, max_pending=None, **filters
+):
+    """
+    Generate `n` web navigator's configs in `jobs` processes
+
+    :param jobs: number of processes, number of CPUs by default, with
+        jobs=1 chunks are generated in the current process
+    :param seed: seed of the whole batch (string or number), random
+        if not given
+    :param chunk_size: number of configs in one chunk, the output
+        depends on it
+    :param max_pending: maximal number of chunks submitted to the pool
+        and not yielded yet, twice the number of processes by default
+    :param filters: options of `generate_navigator`
+    :return: iterator over configs in `generate_navigator` format
+    :raises InvalidOption: if filters are invalid
+    """
+
+    # fail before any process is started
+    base.compile_filters(
+        filters.get("device_type"),
+        filters.get("os"),
+        filters.get("navigator"),
+        **dict(
+            (x, y)
+            for x, y in filters.items()
+            if x not in ("device_type", "os", "navigator")
+        )
+    )
+    if chunk_size < 1:
+        raise ValueError("Invalid chunk size: %s" % chunk_size)
+    if seed is None:
+        seed = int(hashlib.sha256(os.urandom(32)).hexdigest(), 16)
+    if jobs is None:
+        jobs = get_cpu_count()
+    if max_pending is None:
+        max_pending = 2 * jobs
+    return iter_parallel(n, jobs, seed, chunk_size, max(max_pending, 1), filters)
+
+
+def iter_parallel(n, jobs, seed, chunk_size, max_pending, filters):
+    chunks = iter_chunks(n, chunk_size)
+    if jobs == 1:
+        for index, count in chunks:
+            for nav in generate_chunk(seed, index, count, chunk_size, filters):
+                yield nav
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import ProcessPoolExecutor
+
+    pool = ProcessPoolExecutor(jobs)
+    pending = deque()
+
+    def submit(num):
+        for index, count in islice(chunks, num):
+            pending.append(
+                pool.submit(generate_chunk, seed, index, count, chunk_size, filters)
+            )
+
+    try:
+        submit(max_pending)
+        while pending:
+            batch = pending.popleft().result()
+            submit(1)
+            for nav in batch:
+                yield nav
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown()
@@ -0,0 +1,289 @@
+"""
+Hot reload of version and device tables
+
+    >>> from user_agent import provider
+    >>> provider.dump_tables("tables.json")  # edit it, then
+    >>> watcher = provider.DataProvider("tables.json", interval=60)
+    >>> watcher.start()
+
+Tables are loaded from a JSON file or from all *.json files of a directory
+(later files override earlier ones). Only tables listed in RELOADABLE_TABLES
+could be given, missing ones keep their current values, dates are written
+as "YYYY-MM-DD".
+
+New tables are checked and all indexes derived from them are built before
+they are installed, then the module variables of `user_agent.base` are
+replaced with one `dict.update` call, which other threads can not observe
+half-done. Generation already running uses compiled filters referencing
+the old tables till it is done.
+
+Registries created by `user_agent.metrics` rebuild their indexes with
+the next counted config.
+"""
+from datetime import datetime
+import json
+import logging
+import os
+import threading
+
+from . import base
+from .error import InvalidData
+
+__all__ = (
+    "DataProvider",
+    "load_tables",
+    "install_tables",
+    "reload_tables",
+    "dump_tables",
+    "reset_tables",
+)
+
+LOG = logging.getLogger(__name__)
+RELOADABLE_TABLES = (
+    "FIREFOX_VERSION",
+    "CHROME_BUILD",
+    "CHROME_RELEASE_DATE",
+    "IE_VERSION",
+    "IE_RELEASE_DATE",
+    "OS_PLATFORM",
+    "ANDROID_RELEASE_DATE",
+    "MACOSX_CHROME_BUILD_RANGE",
+    "SMARTPHONE_DEV_EXT",
+    "TABLET_DEV_EXT",
+    "NAVIGATOR_OS",
+)
+DATE_FORMAT = "%Y-%m-%d"
+# Tables of the library at the moment the module was imported
+DEFAULT_TABLES = dict((x, getattr(base, x)) for x in RELOADABLE_TABLES)
+_INSTALL_LOCK = threading.Lock()
+
+
+def parse_date(value):
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def convert_table(name, value):
+    """
+    Convert table loaded from JSON into the format used in `user_agent.base`
+    """
+
+    if name == "FIREFOX_VERSION":
+        return tuple((ver, parse_date(date)) for ver, date in value)
+    if name in ("CHROME_BUILD", "IE_VERSION"):
+        return tuple(tuple(x) for x in value)
+    if name in ("CHROME_RELEASE_DATE", "IE_RELEASE_DATE"):
+        return dict((int(x), parse_date(y)) for x, y in value.items())
+    if name == "ANDROID_RELEASE_DATE":
+        return dict((x, parse_date(y)) for x, y in value.items())
+    if name == "OS_PLATFORM":
+        # oses which are not given keep current platforms
+        res = dict(base.OS_PLATFORM)
+        res.update((x, tuple(y)) for x, y in value.items())
+        return res
+    if name in ("MACOSX_CHROME_BUILD_RANGE", "NAVIGATOR_OS"):
+        return dict((x, tuple(y)) for x, y in value.items())
+    return list(value)
+
+
+def export_table(name, value):
+    """
+    Convert table into JSON-compatible format, reverse of `convert_table`
+    """
+
+    if name == "FIREFOX_VERSION":
+        return [[ver, date.strftime(DATE_FORMAT)] for ver, date in value]
+    if name in ("CHROME_RELEASE_DATE", "IE_RELEASE_DATE", "ANDROID_RELEASE_DATE"):
+        return dict((str(x), y.strftime(DATE_FORMAT)) for x, y in value.items())
+    return value
+
+
+def get_data_files(path):
+    if os.path.isdir(path):
+        return [
+            os.path.join(path, x)
+            for x in sorted(os.listdir(path))
+            if x.endswith(".json")
+        ]
+    return [path]
+
+
+def load_tables(path):
+    """
+    Load tables from JSON file or directory with JSON files
+
+    :return: dict {table name: table}
+    :raises InvalidData: if data is malformed
+    """
+
+    tables = {}
+    for filename in get_data_files(path):
+        try:
+            with open(filename) as inp:
+                data = json.load(inp)
+            for name, value in data.items():
+                if name not in RELOADABLE_TABLES:
+                    raise InvalidData("Unknown table %s" % name)
+                tables[name] = convert_table(name, value)
+        except (ValueError, TypeError, AttributeError) as ex:
+            raise InvalidData("Could not load %s: %s" % (filename, ex))
+    return tables
+
+
+def check_tables(ns):
+    """
+    Check consistency of tables given as dict {name: table}
+
+    :raises InvalidData: if tables are not consistent
+    """
+
+    for name in ("FIREFOX_VERSION", "CHROME_BUILD", "IE_VERSION"):
+        if not ns[name]:
+            raise InvalidData("Table %s is empty" % name)
+    for nav in ns["NAVIGATOR_OS"]:
+        if nav not in ns["NAVIGATOR_RULES"]:
+            raise InvalidData("No NAVIGATOR_RULES item for %s" % nav)
+    for os_id in base.OS_NAVIGATOR:
+        if not ns["OS_PLATFORM"].get(os_id):
+            raise InvalidData("No platforms of os %s" % os_id)
+    for platform in ns["OS_PLATFORM"]["mac"]:
+        ver = platform.split("OS X ")[-1]
+        if ver not in ns["MACOSX_CHROME_BUILD_RANGE"]:
+            raise InvalidData("No MACOSX_CHROME_BUILD_RANGE item for %s" % ver)
+    for build in ns["CHROME_BUILD"]:
+        if len(build) != 3 or build[1] > build[2]:
+            raise InvalidData("Invalid CHROME_BUILD item: %s" % (build,))
+
+
+def install_tables(tables):
+    """
+    Replace tables of `user_agent.base` with given ones
+
+    :param tables: dict {table name: table}, see `load_tables`
+    :raises InvalidData: if tables are not consistent
+    """
+
+    for name in tables:
+        if name not in RELOADABLE_TABLES:
+            raise InvalidData("Unknown table %s" % name)
+    with _INSTALL_LOCK:
+        ns = dict((x, getattr(base, x)) for x in base.TABLE_NAMES)
+        ns.update(tables)
+        check_tables(ns)
+        try:
+            update = {
+                "_VARIANT_MASKS": base.build_variant_masks(ns),
+                "_RELEASE_INDEX": base.build_release_index(ns),
+                "_DEVICE_INDEX": base.build_device_tables(ns),
+                "_FIREFOX_NEXT_DATE": base.build_firefox_next_dates(ns),
+                "_ENGINES": base.build_engines(ns),
+                "_FILTER_CACHE": {},
+            }
+        except (KeyError, ValueError, TypeError, IndexError) as ex:
+            raise InvalidData("Invalid tables: %s" % ex)
+        except base.InvalidOption as ex:
+            raise InvalidData("Invalid tables: %s" % ex)
+        update.update(tables)
+        # one C-level call: no thread sees part of tables replaced
+        vars(base).update(update)
+
+
+def reload_tables(path):
+    """
+    Load tables from `path` and install them
+    """
+
+    install_tables(load_tables(path))
+
+
+def reset_tables():
+    """
+    Install tables which the library had when this module was imported
+    """
+
+    install_tables(DEFAULT_TABLES)
+
+
+def dump_tables(path):
+    """
+    Save current reloadable tables into JSON file
+    """
+
+    data = dict(
+        (x, export_table(x, getattr(base, x))) for x in RELOADABLE_TABLES
+    )
+    with open(path, "w") as out:
+        json.dump(data, out, indent=1, sort_keys=True)
+
+
+class DataProvider(object):
+    """
+    Watches JSON file or directory and installs tables when
+    modification times of the files change
+
+    :param path: JSON file or directory with JSON files
+    :param interval: seconds between checks done by background thread
+    """
+
+    def __init__(self, path, interval=60.0):
+        self.path = path
+        self.interval = interval
+        self.signature = None
+        self.version = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_signature(self):
+        res = []
+        for filename in get_data_files(self.path):
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            res.append((filename, stat.st_mtime, stat.st_size))
+        return tuple(res)
+
+    def check(self):
+        """
+        Install tables if files have changed since last check
+
+        :return: True if new tables were installed
+        :raises InvalidData: if data is malformed, current tables are
+            kept in that case
+        """
+
+        signature = self.get_signature()
+        if signature == self.signature:
+            return False
+        tables = load_tables(self.path)
+        install_tables(tables)
+        self.signature = signature
+        self.version += 1
+        return True
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+                self.last_error = None
+            except Exception as ex: # pylint: disable=broad-except
+                self.last_error = ex
+                LOG.exception("Could not reload tables from %s", self.path)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """
+        Check for changes in background thread
+        """
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
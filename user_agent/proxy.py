@@ -0,0 +1,399 @@
+"""
+Local HTTP forward proxy replacing User-Agent header of passing requests
+
+Usage: ua proxy [--host HOST] [--port PORT] [--sticky connection|host]
+
+Plain HTTP requests get the User-Agent header of generated navigator
+config. The config is assigned per client connection (default) or per
+target host. HTTPS traffic passes through CONNECT tunnels untouched:
+headers inside TLS can not be rewritten.
+
+Request and response bodies are streamed without buffering. Connections
+to upstream servers are kept alive and reused.
+
+Requires Python 3.
+"""
+import asyncio
+from urllib.parse import urlsplit
+
+from .base import generate_navigator, navigator_for_key
+
+__all__ = ("UserAgentProxy", "run_proxy")
+
+STICKY_MODES = ("connection", "host")
+HOP_BY_HOP_HEADERS = frozenset(
+    (
+        b"connection",
+        b"keep-alive",
+        b"proxy-connection",
+        b"proxy-authorization",
+        b"te",
+        b"trailer",
+        b"upgrade",
+    )
+)
+MAX_HEAD_SIZE = 65536
+COPY_CHUNK_SIZE = 65536
+
+
+def navigator_headers(nav):
+    """
+    Default function building headers to set in proxied requests
+    """
+
+    return [(b"User-Agent", nav["user_agent"].encode("latin-1"))]
+
+
+class BadRequest(Exception):
+    pass
+
+
+def parse_status(status_line):
+    """
+    Return status code of response status line
+    """
+
+    try:
+        status = int(status_line.split(b" ", 2)[1])
+    except (ValueError, IndexError):
+        raise BadRequest("Invalid status line")
+    if not 100 <= status < 1000:
+        raise BadRequest("Invalid status line")
+    return status
+
+
+async def read_head(reader):
+    """
+    Read status/request line and headers
+
+    Returns (first line, list of (name, value) pairs) or None if
+    the connection was closed.
+    """
+
+    try:
+        data = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as ex:
+        if not ex.partial.strip():
+            return None
+        raise BadRequest("Incomplete message head")
+    except asyncio.LimitOverrunError:
+        raise BadRequest("Message head is too large")
+    lines = data[:-4].split(b"\r\n")
+    headers = []
+    for line in lines[1:]:
+        name, sep, value = line.partition(b":")
+        if not sep:
+            raise BadRequest("Invalid header line")
+        headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+
+def get_header(headers, name):
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def is_keep_alive(version, headers):
+    conn = (get_header(headers, b"connection") or b"").lower()
+    if version == b"HTTP/1.0":
+        return conn == b"keep-alive"
+    return conn != b"close"
+
+
+async def copy_exact(reader, writer, size):
+    while size > 0:
+        chunk = await reader.read(min(size, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise ConnectionError("Connection closed while copying body")
+        writer.write(chunk)
+        size -= len(chunk)
+        await writer.drain()
+
+
+async def copy_chunked(reader, writer):
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        writer.write(line)
+        size = int(line.split(b";", 1)[0].strip(), 16)
+        if size == 0:
+            # trailers
+            while True:
+                line = await reader.readuntil(b"\r\n")
+                writer.write(line)
+                if line == b"\r\n":
+                    break
+            await writer.drain()
+            return
+        await copy_exact(reader, writer, size + 2)
+
+
+async def copy_until_eof(reader, writer):
+    while True:
+        chunk = await reader.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            return
+        writer.write(chunk)
+        await writer.drain()
+
+
+async def copy_body(reader, writer, headers):
+    """
+    Copy message body framed according to `headers`
+
+    Returns False if body is delimited by closing of connection.
+    """
+
+    encoding = get_header(headers, b"transfer-encoding")
+    if encoding is not None and encoding.lower().endswith(b"chunked"):
+        await copy_chunked(reader, writer)
+        return True
+    length = get_header(headers, b"content-length")
+    if length is not None:
+        await copy_exact(reader, writer, int(length))
+        return True
+    return False
+
+
+def build_head(first_line, headers):
+    parts = [first_line, b"\r\n"]
+    for name, value in headers:
+        parts.extend((name, b": ", value, b"\r\n"))
+    parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+class UserAgentProxy(object):
+    """
+    Forward proxy rewriting User-Agent header
+
+    :param sticky: "connection" to assign navigator config per client
+        connection, "host" to assign config per target host
+    :param salt: salt passed to `navigator_for_key` in "host" mode
+    :param headers_func: function accepting navigator config and returning
+        list of (name, value) byte string pairs to set in requests
+    :param max_idle_per_host: max number of idle upstream connections
+        kept for each host
+    :param filters: options of `generate_navigator`
+    """
+
+    def __init__(
+        self,
+        sticky="connection",
+        salt=None,
+        headers_func=navigator_headers,
+        max_idle_per_host=64,
+        **filters
+    ):
+        if sticky not in STICKY_MODES:
+            raise ValueError("Invalid sticky mode: %s" % sticky)
+        self.sticky = sticky
+        self.salt = salt
+        self.headers_func = headers_func
+        self.max_idle_per_host = max_idle_per_host
+        self.filters = filters
+        self.idle = {}
+        self.host_headers = {}
+        self.stats = {"requests": 0, "tunnels": 0, "upstream_connections": 0}
+
+    def get_headers(self, host, conn_headers):
+        if self.sticky == "host":
+            try:
+                return self.host_headers[host]
+            except KeyError:
+                nav = navigator_for_key(host, salt=self.salt, **self.filters)
+                res = self.headers_func(nav)
+                if len(self.host_headers) >= 100000:
+                    self.host_headers.clear()
+                self.host_headers[host] = res
+                return res
+        return conn_headers
+
+    async def open_upstream(self, host, port):
+        pool = self.idle.get((host, port))
+        while pool:
+            reader, writer = pool.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        self.stats["upstream_connections"] += 1
+        reader, writer = await asyncio.open_connection(host, port)
+        return reader, writer, False
+
+    def release_upstream(self, host, port, reader, writer):
+        pool = self.idle.setdefault((host, port), [])
+        if len(pool) < self.max_idle_per_host:
+            pool.append((reader, writer))
+        else:
+            writer.close()
+
+    async def handle_client(self, reader, writer):
+        conn_headers = None
+        if self.sticky == "connection":
+            conn_headers = self.headers_func(generate_navigator(**self.filters))
+        try:
+            while True:
+                head = await read_head(reader)
+                if head is None:
+                    break
+                if not await self.handle_request(reader, writer, head, conn_headers):
+                    break
+        except BadRequest:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nConnection: close\r\n\r\n")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, reader, writer, head, conn_headers):
+        """
+        Proxy one request, return False if client connection must be closed
+        """
+
+        first_line, headers = head
+        try:
+            method, target, version = first_line.split(b" ")
+        except ValueError:
+            raise BadRequest("Invalid request line")
+        if method == b"CONNECT":
+            await self.tunnel(reader, writer, target)
+            return False
+        url = urlsplit(target.decode("latin-1"))
+        if url.scheme != "http" or not url.hostname:
+            writer.write(
+                b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            return False
+        self.stats["requests"] += 1
+        host, port = url.hostname, url.port or 80
+        client_keep_alive = is_keep_alive(version, headers)
+        replace = self.get_headers(host, conn_headers)
+        replace_names = set(x[0].lower() for x in replace)
+        out_headers = [
+            x
+            for x in headers
+            if x[0].lower() not in HOP_BY_HOP_HEADERS
+            and x[0].lower() not in replace_names
+        ]
+        out_headers.extend(replace)
+        out_headers.append((b"Connection", b"keep-alive"))
+        path = url.path or "/"
+        if url.query:
+            path += "?" + url.query
+        request_head = build_head(
+            b"%s %s HTTP/1.1" % (method, path.encode("latin-1")), out_headers
+        )
+        has_body = (
+            get_header(headers, b"content-length") is not None
+            or get_header(headers, b"transfer-encoding") is not None
+        )
+
+        for attempt in range(2):
+            up_writer, reused = None, False
+            try:
+                up_reader, up_writer, reused = await self.open_upstream(host, port)
+                up_writer.write(request_head)
+                if has_body:
+                    await copy_body(reader, up_writer, headers)
+                await up_writer.drain()
+                resp_head = await read_head(up_reader)
+                if resp_head is None:
+                    raise ConnectionError("Upstream closed connection")
+                status = parse_status(resp_head[0])
+                break
+            except (OSError, BadRequest, asyncio.IncompleteReadError):
+                if up_writer is not None:
+                    up_writer.close()
+                # stale pooled connection, retry once if request can be resent
+                if not reused or has_body or attempt:
+                    writer.write(
+                        b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n"
+                        b"Connection: close\r\n\r\n"
+                    )
+                    return False
+
+        status_line, resp_headers = resp_head
+        upstream_keep_alive = is_keep_alive(status_line.split(b" ", 1)[0], resp_headers)
+        no_body = method == b"HEAD" or status in (204, 304) or 100 <= status < 200
+        out_resp = [x for x in resp_headers if x[0].lower() not in HOP_BY_HOP_HEADERS]
+        if not no_body and get_header(resp_headers, b"content-length") is None and (
+            get_header(resp_headers, b"transfer-encoding") is None
+        ):
+            # body ends with the connection, client connection must be closed too
+            client_keep_alive = False
+            upstream_keep_alive = False
+        out_resp.append(
+            (b"Connection", b"keep-alive" if client_keep_alive else b"close")
+        )
+        writer.write(build_head(status_line, out_resp))
+        try:
+            if not no_body:
+                if not await copy_body(up_reader, writer, resp_headers):
+                    await copy_until_eof(up_reader, writer)
+            await writer.drain()
+        except BaseException:
+            up_writer.close()
+            raise
+        if upstream_keep_alive:
+            self.release_upstream(host, port, up_reader, up_writer)
+        else:
+            up_writer.close()
+        return client_keep_alive
+
+    async def tunnel(self, reader, writer, target):
+        self.stats["tunnels"] += 1
+        host, _, port = target.decode("latin-1").rpartition(":")
+        try:
+            up_reader, up_writer = await asyncio.open_connection(
+                host.strip("[]"), int(port)
+            )
+        except (OSError, ValueError):
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+            return
+        writer.write(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+
+        async def pipe(src, dst):
+            try:
+                await copy_until_eof(src, dst)
+            except ConnectionError:
+                pass
+            finally:
+                dst.close()
+
+        await asyncio.gather(pipe(reader, up_writer), pipe(up_reader, writer))
+
+    def close_idle(self):
+        """
+        Close all idle upstream connections
+        """
+
+        for pool in self.idle.values():
+            for _, writer in pool:
+                writer.close()
+        self.idle.clear()
+
+    async def start(self, host="127.0.0.1", port=8080):
+        return await asyncio.start_server(
+            self.handle_client, host, port, limit=MAX_HEAD_SIZE
+        )
+
+
+def run_proxy(host="127.0.0.1", port=8080, **kwargs):
+    """
+    Run the proxy until interrupted
+
+    :param kwargs: options of `UserAgentProxy`
+    """
+
+    proxy = UserAgentProxy(**kwargs)
+
+    async def main():
+        server = await proxy.start(host, port)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
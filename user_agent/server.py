@@ -0,0 +1,274 @@
+"""
+Local HTTP service generating user agents
+
+Usage: ua serve [--host HOST] [--port PORT] [--unix PATH]
+
+Request: GET /?os=win,linux&navigator=chrome&device_type=desktop&count=10&format=text
+
+Query options:
+* os, navigator, device_type: same as options of `generate_navigator`,
+    several values are separated with comma
+* count: number of items to return, 1 by default
+* format: "text" (default) - user agents separated with new line,
+    "navigator" - JSON with configs built by `generate_navigator`,
+    "navigator_js" - JSON with configs built by `generate_navigator_js`.
+    JSON response contains list of configs if `count` option is passed
+    and single config otherwise.
+
+Invalid options are reported with 400 status and error message in the body.
+
+Each combination of filters is validated once, its list of config variants
+is cached. Generated configs are taken from per-filter buffer which is
+refilled when the server has no requests to process.
+
+Requires Python 3.
+"""
+import asyncio
+from collections import deque
+import json
+import random
+from urllib.parse import urlsplit, parse_qsl
+
+from .base import get_config_variants, build_navigator, navigator_to_js
+from .error import InvalidOption
+
+__all__ = ("UserAgentService", "run_server")
+
+FILTER_OPTIONS = ("os", "navigator", "device_type")
+OUTPUT_FORMATS = ("text", "navigator", "navigator_js")
+MAX_COUNT = 10000
+MAX_CACHED_FILTERS = 1024
+MAX_REQUEST_SIZE = 16384
+STATUS_LINES = {
+    200: b"HTTP/1.1 200 OK\r\n",
+    400: b"HTTP/1.1 400 Bad Request\r\n",
+    404: b"HTTP/1.1 404 Not Found\r\n",
+    405: b"HTTP/1.1 405 Method Not Allowed\r\n",
+}
+
+
+class NavigatorBuffer(object):
+    """
+    Pre-generated navigator configs for one combination of filters
+    """
+
+    def __init__(self, variants, size, rng):
+        self.variants = variants
+        self.size = size
+        self.rng = rng
+        self.items = deque()
+
+    def fill(self, count=None):
+        if count is None:
+            count = self.size - len(self.items)
+        choice = self.rng.choice
+        variants = self.variants
+        rng = self.rng
+        self.items.extend(
+            build_navigator(*choice(variants), rng=rng) for _ in range(count)
+        )
+
+    def take(self, count):
+        items = self.items
+        if len(items) < count:
+            self.fill(count - len(items) + self.size)
+        return [items.popleft() for _ in range(count)]
+
+    @property
+    def needs_refill(self):
+        return len(self.items) < self.size // 2
+
+
+class UserAgentService(object):
+    """
+    Request handling logic of the user agent HTTP service
+
+    :param buffer_size: number of configs pre-generated for each
+        combination of filters
+    :param rng: random generator, `random` module by default
+    """
+
+    def __init__(self, buffer_size=1000, rng=None):
+        self.buffer_size = buffer_size
+        self.rng = rng or random
+        self.buffers = {}
+        self.refill_scheduled = False
+
+    def get_buffer(self, filters):
+        """
+        Return buffer for the filters given as tuple of
+        (os, navigator, device_type) query values
+
+        :raises InvalidOption: if filters are invalid
+        """
+
+        try:
+            buf = self.buffers[filters]
+        except KeyError:
+            opts = [None if x is None else tuple(x.split(",")) for x in filters]
+            variants = get_config_variants(opts[2], opts[0], opts[1])
+            buf = NavigatorBuffer(variants, self.buffer_size, self.rng)
+            if len(self.buffers) >= MAX_CACHED_FILTERS:
+                self.buffers.pop(next(iter(self.buffers)))
+            self.buffers[filters] = buf
+        return buf
+
+    def refill(self):
+        """
+        Fill buffers which are half-empty
+        """
+
+        self.refill_scheduled = False
+        for buf in list(self.buffers.values()):
+            if buf.needs_refill:
+                buf.fill()
+
+    def handle(self, target):
+        """
+        Process request to the `target` URL path
+
+        Returns (status, content type, body)
+        """
+
+        url = urlsplit(target)
+        if url.path not in ("/", "/ua"):
+            return 404, "text/plain", b"Not found"
+        query = dict(parse_qsl(url.query))
+        try:
+            fmt = query.get("format", "text")
+            if fmt not in OUTPUT_FORMATS:
+                raise InvalidOption("Invalid value of format option: %s" % fmt)
+            try:
+                count = int(query.get("count", 1))
+            except ValueError:
+                raise InvalidOption("Invalid value of count option")
+            if not 0 < count <= MAX_COUNT:
+                raise InvalidOption(
+                    "Value of count option must be in range 1..%d" % MAX_COUNT
+                )
+            buf = self.get_buffer(tuple(query.get(x) for x in FILTER_OPTIONS))
+        except InvalidOption as ex:
+            return 400, "text/plain", str(ex).encode("utf-8")
+        navs = buf.take(count)
+        if fmt == "text":
+            body = "\n".join(x["user_agent"] for x in navs) + "\n"
+            return 200, "text/plain; charset=utf-8", body.encode("utf-8")
+        if fmt == "navigator_js":
+            navs = [navigator_to_js(x) for x in navs]
+        data = navs if "count" in query else navs[0]
+        return 200, "application/json", json.dumps(data).encode("utf-8")
+
+
+class HttpProtocol(asyncio.Protocol):
+    """
+    Minimal HTTP/1.1 server protocol with keep-alive and pipelining
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.transport = None
+        self.buffer = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            pos = self.buffer.find(b"\r\n\r\n")
+            if pos == -1:
+                if len(self.buffer) > MAX_REQUEST_SIZE:
+                    self.transport.close()
+                return
+            head = self.buffer[:pos]
+            self.buffer = self.buffer[pos + 4 :]
+            if not self.process(head):
+                self.transport.close()
+                return
+
+    def process(self, head):
+        """
+        Respond to request with given head, return False if the
+        connection must be closed
+        """
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            self.respond(400, "text/plain", b"Bad request", False)
+            return False
+        keep_alive = version == "HTTP/1.1"
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            if name == "connection":
+                keep_alive = value.strip().lower() != "close"
+            elif name in ("content-length", "transfer-encoding"):
+                # requests with body are not supported
+                self.respond(405, "text/plain", b"Method not allowed", False)
+                return False
+        if method != "GET":
+            self.respond(405, "text/plain", b"Method not allowed", False)
+            return False
+        status, content_type, body = self.service.handle(target)
+        self.respond(status, content_type, body, keep_alive)
+        service = self.service
+        if not service.refill_scheduled:
+            service.refill_scheduled = True
+            asyncio.get_event_loop().call_soon(service.refill)
+        return keep_alive
+
+    def respond(self, status, content_type, body, keep_alive):
+        self.transport.write(
+            b"".join(
+                (
+                    STATUS_LINES[status],
+                    b"Content-Type: ",
+                    content_type.encode("ascii"),
+                    b"\r\nContent-Length: ",
+                    str(len(body)).encode("ascii"),
+                    b"\r\nConnection: keep-alive\r\n\r\n"
+                    if keep_alive
+                    else b"\r\nConnection: close\r\n\r\n",
+                    body,
+                )
+            )
+        )
+
+
+async def start_servers(service, host="127.0.0.1", port=8000, unix_path=None):
+    """
+    Start TCP server and, optionally, server on Unix socket
+
+    Returns list of asyncio servers.
+    """
+
+    loop = asyncio.get_event_loop()
+    servers = []
+    if port is not None:
+        servers.append(
+            await loop.create_server(lambda: HttpProtocol(service), host, port)
+        )
+    if unix_path is not None:
+        servers.append(
+            await loop.create_unix_server(lambda: HttpProtocol(service), unix_path)
+        )
+    return servers
+
+
+def run_server(host="127.0.0.1", port=8000, unix_path=None, buffer_size=1000):
+    """
+    Run the user agent HTTP service until interrupted
+    """
+
+    service = UserAgentService(buffer_size=buffer_size)
+
+    async def main():
+        servers = await start_servers(service, host, port, unix_path)
+        await asyncio.gather(*(x.serve_forever() for x in servers))
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
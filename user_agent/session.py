@@ -0,0 +1,150 @@
+"""
+Pool of HTTP sessions, one session per generated navigator config
+
+Every session keeps its own connection pool and has the request headers
+of its profile preset (User-Agent, Accept, Accept-Language and others in
+the order the browser sends them, see `build_headers`), so requests made
+with the same profile look like requests of the same browser and reuse
+keep-alive connections. The number of sessions is bounded, least recently
+used sessions are closed when the limit is reached.
+
+Sessions are created by `requests` library by default, `httpx` clients
+could be used via `httpx_session_factory`. Neither library is a required
+dependency of user_agent. Accept-Encoding of Chrome profiles includes
+"br": responses compressed with Brotli are decoded only if the HTTP
+library supports it (`brotli` package for `requests`). Use custom
+`session_factory` to set other headers.
+"""
+from collections import OrderedDict
+import random
+import threading
+
+from .base import build_headers, generate_navigator, navigator_for_key
+
+__all__ = ("SessionPool", "requests_session_factory", "httpx_session_factory")
+
+
+def requests_session_factory(nav):
+    """
+    Build `requests.Session` with request headers of given
+    navigator config
+    """
+
+    import requests # pylint: disable=import-outside-toplevel
+
+    sess = requests.Session()
+    sess.headers.clear()
+    sess.headers.update(OrderedDict(build_headers(nav)))
+    return sess
+
+
+def httpx_session_factory(nav):
+    """
+    Build `httpx.Client` with request headers of given
+    navigator config
+    """
+
+    import httpx # pylint: disable=import-outside-toplevel
+
+    return httpx.Client(headers=build_headers(nav))
+
+
+class AnonymousKey(object):
+    """
+    Key of session created for call without key
+    """
+
+    __slots__ = ()
+
+
+class SessionPool(object):
+    """
+    Bounded pool of HTTP sessions with headers of generated profiles
+
+    :param max_sessions: max number of open sessions
+    :param session_factory: function accepting navigator config and
+        returning new session object, the session object must have
+        `close` method
+    :param salt: salt passed to `navigator_for_key`
+    :param filters: options of `generate_navigator`
+    """
+
+    def __init__(self, max_sessions=10, session_factory=None, salt=None, **filters):
+        self.max_sessions = max_sessions
+        self.session_factory = session_factory or requests_session_factory
+        self.salt = salt
+        self.filters = filters
+        self._sessions = OrderedDict()
+        self._anon_keys = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _build_profile(self, key):
+        if key is None:
+            return generate_navigator(**self.filters)
+        return navigator_for_key(key, salt=self.salt, **self.filters)
+
+    def get(self, key=None):
+        """
+        Return (navigator config, session) pair for the `key`
+
+        If `key` is None then the session is chosen from sessions created
+        for previous calls without key: random one when the pool is full,
+        new one otherwise. Sessions bound to keys are never returned
+        for calls without key.
+        """
+
+        evicted = None
+        with self._lock:
+            sessions = self._sessions
+            anon_keys = self._anon_keys
+            anonymous = False
+            if key is None:
+                if len(sessions) >= self.max_sessions and anon_keys:
+                    key = random.choice(anon_keys)
+                else:
+                    anonymous = True
+                    key = AnonymousKey()
+                    anon_keys.append(key)
+            item = sessions.pop(key, None)
+            if item is None:
+                nav = self._build_profile(None if anonymous else key)
+                item = (nav, self.session_factory(nav))
+                if len(sessions) >= self.max_sessions:
+                    evicted_key, evicted = sessions.popitem(last=False)
+                    if isinstance(evicted_key, AnonymousKey):
+                        anon_keys.remove(evicted_key)
+            sessions[key] = item
+        if evicted is not None:
+            evicted[1].close()
+        return item
+
+    def session(self, key=None):
+        """
+        Return session for the `key`, see `get` for details
+        """
+
+        return self.get(key)[1]
+
+    def request(self, method, url, key=None, **kwargs):
+        """
+        Make HTTP request with the session assigned to the `key`
+        """
+
+        return self.session(key).request(method, url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            items = list(self._sessions.values())
+            self._sessions.clear()
+            del self._anon_keys[:]
+        for _, sess in items:
+            sess.close()
@@ -0,0 +1,254 @@
+"""
+Statistical conformance check of generated configs
+
+Usage: ua stats [--samples N] [-o OS] [-n NAVIGATOR] [-d DEVICE_TYPE]
+
+Draws positions of many configs with `base.draw_configs` (the draw stage
+of `generate_batch`), tallies categories (config variant, platform
+version, cpu, browser version) in counters indexed by position in the
+tables and compares observed frequencies with expected ones using
+chi-square test and total variation distance. Command exits with non-zero status
+if any test fails, so it could gate releases of changed tables.
+"""
+from __future__ import print_function
+from collections import Counter
+import math
+
+from . import base
+from .bulkrand import BulkRandom
+
+__all__ = ("check_conformance", "chi_square_test", "expected_distributions")
+
+BATCH_SIZE = 100000
+
+
+def regularized_gamma_q(a, x):
+    """
+    Upper regularized incomplete gamma function Q(a, x)
+    """
+
+    if x <= 0:
+        return 1.0
+    gln = math.lgamma(a)
+    if x < a + 1:
+        # series representation of P(a, x)
+        term = total = 1.0 / a
+        denom = a
+        for _ in range(10000):
+            denom += 1
+            term *= x / denom
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(-x + a * math.log(x) - gln))
+    # continued fraction representation of Q(a, x), modified Lentz method
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1.0 / tiny
+    d = 1.0 / b
+    h = d
+    for idx in range(1, 10000):
+        an = -idx * (idx - a)
+        b += 2
+        d = an * d + b
+        if abs(d) < tiny:
+            d = tiny
+        c = b + an / c
+        if abs(c) < tiny:
+            c = tiny
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(-x + a * math.log(x) - gln) * h
+
+
+def chi_square_test(observed, expected):
+    """
+    Compare observed counts with expected probabilities
+
+    :param observed: dict {category: count}
+    :param expected: dict {category: probability}
+    :return: dict with keys statistic, dof, p_value, tv_distance
+        and unexpected (categories observed but not expected)
+    """
+
+    total = sum(observed.values())
+    statistic = 0.0
+    tv_distance = 0.0
+    for cat, prob in expected.items():
+        count = observed.get(cat, 0)
+        exp_count = prob * total
+        if exp_count > 0:
+            statistic += (count - exp_count) ** 2 / exp_count
+        tv_distance += abs(float(count) / total - prob) if total else prob
+    unexpected = sorted(str(x) for x in observed if x not in expected)
+    for cat in observed:
+        if cat not in expected:
+            tv_distance += float(observed[cat]) / total
+    dof = max(len(expected) - 1, 1)
+    return {
+        "statistic": statistic,
+        "dof": dof,
+        "p_value": regularized_gamma_q(dof / 2.0, statistic / 2.0),
+        "tv_distance": tv_distance / 2,
+        "unexpected": unexpected,
+    }
+
+
+def uniform(values):
+    """
+    Return dict {value: probability} of uniform choice from the sequence,
+    repeated values get proportionally bigger probability
+    """
+
+    values = list(values)
+    res = {}
+    for val in values:
+        res[val] = res.get(val, 0) + 1.0 / len(values)
+    return res
+
+
+def get_build_labels(engine):
+    """
+    Return labels of version table entries of engine used
+    by `expected_distributions`
+    """
+
+    if engine.navigator_id == "ie":
+        return [x[1] for x in engine.versions.table]
+    return [x[0] for x in engine.versions.table]
+
+
+def expected_distributions(variants):
+    """
+    Return dict {category name: expected distribution} for given list of
+    config variants built by `get_config_variants`
+    """
+
+    res = {"variant": uniform(variants)}
+    for os_id in set(x[1] for x in variants):
+        res["cpu:%s" % os_id] = uniform(base.OS_CPU[os_id])
+        # mixture of platform distributions of the os variants, Chrome on
+        # Android uses only versions supported by devices
+        os_variants = [x for x in variants if x[1] == os_id]
+        platforms = {}
+        for dev, _, nav in os_variants:
+            if os_id == "android" and nav == "chrome":
+                dist = uniform(base.get_device_platforms(dev))
+            else:
+                dist = uniform(base.OS_PLATFORM[os_id])
+            for val, prob in dist.items():
+                platforms[val] = platforms.get(val, 0) + prob / len(os_variants)
+        res["platform_version:%s" % os_id] = platforms
+    builds = {
+        "chrome": [x[0] for x in base.CHROME_BUILD],
+        "firefox": [x[0] for x in base.FIREFOX_VERSION],
+        "ie": [x[1] for x in base.IE_VERSION],
+    }
+    for nav in set(x[2] for x in variants):
+        res["build_version:%s" % nav] = uniform(builds[nav])
+    return res
+
+
+def check_conformance(
+    samples=100000, alpha=0.001, rng=None, os=None, navigator=None, device_type=None
+):
+    """
+    Draw `samples` configs and test their distribution
+
+    :param alpha: significance level, test fails if its p-value is
+        less than `alpha`
+    :param rng: source of randomness, `user_agent.bulkrand.BulkRandom`
+        by default
+    :return: dict {category name: result of `chi_square_test` extended
+        with "passed" key}
+    """
+
+    if rng is None:
+        rng = BulkRandom()
+    spec = base.compile_filters(device_type, os, navigator)
+    variants = [tuple(x) for x in spec.variants]
+    # {variant: (platform counts, cpu counts, build counts)}
+    tallies = {}
+    for variant in variants:
+        engine = spec.plans[variant][0]
+        tallies[variant] = (
+            [0] * len(engine.platforms),
+            [0] * len(engine.cpus),
+            [0] * len(engine.versions.table),
+        )
+    done = 0
+    while done < samples:
+        batch = min(BATCH_SIZE, samples - done)
+        for engine, positions in base.draw_configs(spec, batch, rng):
+            platforms, cpus, builds = tallies[engine.variant]
+            platforms[positions[0]] += 1
+            cpus[positions[1]] += 1
+            builds[positions[3]] += 1
+        done += batch
+    counters = dict((x, Counter()) for x in expected_distributions(variants))
+    for variant, (platforms, cpus, builds) in tallies.items():
+        _, os_id, nav = variant
+        engine = spec.plans[variant][0]
+        counters["variant"][variant] = sum(platforms)
+        for key, labels, counts in (
+            ("platform_version:" + os_id, engine.platforms, platforms),
+            ("cpu:" + os_id, base.OS_CPU[os_id], cpus),
+            ("build_version:" + nav, get_build_labels(engine), builds),
+        ):
+            counter = counters[key]
+            for label, count in zip(labels, counts):
+                if count:
+                    counter[label] += count
+    res = {}
+    for key, expected in expected_distributions(variants).items():
+        item = chi_square_test(counters[key], expected)
+        item["samples"] = sum(counters[key].values())
+        item["passed"] = item["p_value"] >= alpha and not item["unexpected"]
+        res[key] = item
+    return res
+
+
+def main(args=None):
+    from argparse import ArgumentParser # pylint: disable=import-outside-toplevel
+    import sys # pylint: disable=import-outside-toplevel
+
+    parser = ArgumentParser(prog="ua stats")
+    parser.add_argument("-s", "--samples", type=int, default=100000)
+    parser.add_argument("-a", "--alpha", type=float, default=0.001)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("-o", "--os")
+    parser.add_argument("-n", "--navigator")
+    parser.add_argument("-d", "--device-type")
+    opts = parser.parse_args(args)
+    res = check_conformance(
+        samples=opts.samples,
+        alpha=opts.alpha,
+        rng=BulkRandom(opts.seed),
+        os=opts.os,
+        navigator=opts.navigator,
+        device_type=opts.device_type,
+    )
+    failed = 0
+    for key in sorted(res):
+        item = res[key]
+        failed += not item["passed"]
+        print(
+            "%-32s %-4s n=%-9d chi2=%10.2f dof=%-4d p=%.4f tv=%.4f"
+            % (
+                key,
+                "ok" if item["passed"] else "FAIL",
+                item["samples"],
+                item["statistic"],
+                item["dof"],
+                item["p_value"],
+                item["tv_distance"],
+            )
+        )
+        if item["unexpected"]:
+            print("    unexpected values: %s" % ", ".join(item["unexpected"][:10]))
+    if failed:
+        print("%d test(s) failed" % failed)
+        sys.exit(1)
@@ -0,0 +1,309 @@
+"""
+Persistent storage of generated navigator configs
+
+Profiles are kept in a local SQLite file keyed by session id. An in-process
+LRU cache sits in front of the database and new profiles are written to
+the disk in batches, one transaction per batch.
+
+Unlike `navigator_for_key` the stored profiles do not change when version
+tables of the library are updated.
+"""
+from collections import OrderedDict
+import json
+import sqlite3
+import threading
+
+from .base import generate_navigator
+from .error import StoreClosed
+
+__all__ = ("ProfileStore", "dump_navigator", "load_navigator")
+
+# Keys of `generate_navigator` result which are saved to the storage.
+# Other keys have constant values.
+NAVIGATOR_FIELDS = (
+    "os_id",
+    "navigator_id",
+    "platform",
+    "oscpu",
+    "build_version",
+    "build_id",
+    "app_version",
+    "app_name",
+    "product_sub",
+    "vendor",
+    "user_agent",
+)
+NAVIGATOR_CONST_FIELDS = {
+    "app_code_name": "Mozilla",
+    "product": "Gecko",
+    "vendor_sub": "",
+}
+
+
+def dump_navigator(nav):
+    """
+    Serialize `generate_navigator` result into compact string
+    """
+
+    return json.dumps(
+        [nav[x] for x in NAVIGATOR_FIELDS], separators=(",", ":"), ensure_ascii=False
+    )
+
+
+def load_navigator(data):
+    """
+    Restore `generate_navigator` result from string built with `dump_navigator`
+    """
+
+    nav = dict(zip(NAVIGATOR_FIELDS, json.loads(data)))
+    nav.update(NAVIGATOR_CONST_FIELDS)
+    return nav
+
+
+class ProfileStore(object):
+    """
+    Navigator configs stored by session id
+
+    :param path: path to SQLite database file, ":memory:" is allowed
+    :param cache_size: max number of profiles kept in the LRU cache
+    :param batch_size: number of pending writes (puts and deletes) which
+        triggers flushing them to the database in one transaction
+
+    Dicts returned from the store are shared with the cache, do not
+    modify them.
+    """
+
+    def __init__(self, path, cache_size=100000, batch_size=1000):
+        self.path = path
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._deleted = set()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS profile"
+            " (key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            db = self._get_db()
+            count = db.execute("SELECT COUNT(*) FROM profile").fetchone()[0]
+            count += len(self._pending) - self._count_stored(self._pending)
+            count -= self._count_stored(self._deleted)
+            return count
+
+    def _get_db(self):
+        if self._db is None:
+            raise StoreClosed("Profile store %s is closed" % self.path)
+        return self._db
+
+    def _count_stored(self, keys):
+        """
+        Count how many of given keys are saved in the database
+        """
+
+        keys = list(keys)
+        count = 0
+        # SQLite limits number of query parameters, 999 in old versions
+        for pos in range(0, len(keys), 500):
+            chunk = keys[pos : pos + 500]
+            count += self._get_db().execute(
+                "SELECT COUNT(*) FROM profile WHERE key IN (%s)"
+                % ",".join("?" * len(chunk)),
+                chunk,
+            ).fetchone()[0]
+        return count
+
+    def _schedule_write(self):
+        if len(self._pending) + len(self._deleted) >= self.batch_size:
+            self.flush()
+
+    def _cache_put(self, key, nav):
+        cache = self._cache
+        cache[key] = nav
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def get(self, key, default=None):
+        """
+        Return profile stored for the `key` or `default`
+        """
+
+        with self._lock:
+            db = self._get_db()
+            try:
+                nav = self._cache.pop(key)
+            except KeyError:
+                nav = self._pending.get(key)
+                if nav is None:
+                    if key in self._deleted:
+                        return default
+                    row = db.execute(
+                        "SELECT data FROM profile WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is None:
+                        return default
+                    nav = load_navigator(row[0])
+                self._cache_put(key, nav)
+            else:
+                self._cache[key] = nav
+            return nav
+
+    def get_many(self, keys):
+        """
+        Return dict of profiles stored for given keys
+
+        Keys with no profile are absent in the result.
+        """
+
+        res = {}
+        missing = []
+        with self._lock:
+            db = self._get_db()
+            cache = self._cache
+            for key in keys:
+                try:
+                    nav = cache.pop(key)
+                except KeyError:
+                    nav = self._pending.get(key)
+                    if nav is None:
+                        if key not in self._deleted:
+                            missing.append(key)
+                        continue
+                cache[key] = nav
+                res[key] = nav
+            for pos in range(0, len(missing), 500):
+                chunk = missing[pos : pos + 500]
+                rows = db.execute(
+                    "SELECT key, data FROM profile WHERE key IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    chunk,
+                )
+                for key, data in rows:
+                    nav = load_navigator(data)
+                    self._cache_put(key, nav)
+                    res[key] = nav
+            if len(cache) > self.cache_size:
+                for _ in range(len(cache) - self.cache_size):
+                    cache.popitem(last=False)
+        return res
+
+    def put(self, key, nav):
+        """
+        Save profile for the `key`
+
+        The profile is written to the database when the number of pending
+        writes reaches `batch_size` or when `flush` is called.
+        """
+
+        with self._lock:
+            self._get_db()
+            self._cache.pop(key, None)
+            self._cache_put(key, nav)
+            self._pending[key] = nav
+            self._deleted.discard(key)
+            self._schedule_write()
+
+    def put_many(self, items):
+        """
+        Save profiles from dict or iterable of (key, profile) pairs
+        """
+
+        if isinstance(items, dict):
+            items = items.items()
+        with self._lock:
+            self._get_db()
+            for key, nav in items:
+                self._cache.pop(key, None)
+                self._cache_put(key, nav)
+                self._pending[key] = nav
+                self._deleted.discard(key)
+            self._schedule_write()
+
+    def get_or_create(self, key, **filters):
+        """
+        Return profile stored for the `key`, generate and save new
+        profile if there is no one
+
+        :param filters: options of `generate_navigator` used to generate
+            new profile
+        """
+
+        with self._lock:
+            nav = self.get(key)
+            if nav is None:
+                nav = generate_navigator(**filters)
+                self.put(key, nav)
+            return nav
+
+    def get_or_create_many(self, keys, **filters):
+        """
+        Bulk version of `get_or_create`, returns dict {key: profile}
+        """
+
+        keys = list(keys)
+        with self._lock:
+            res = self.get_many(keys)
+            new = {}
+            for key in keys:
+                if key not in res:
+                    new[key] = generate_navigator(**filters)
+            if new:
+                self.put_many(new)
+                res.update(new)
+            return res
+
+    def delete(self, key):
+        """
+        Delete profile of the `key`
+
+        Deletion is written to the database in the same batch with
+        pending puts.
+        """
+
+        with self._lock:
+            self._get_db()
+            self._cache.pop(key, None)
+            self._pending.pop(key, None)
+            self._deleted.add(key)
+            self._schedule_write()
+
+    def flush(self):
+        """
+        Write all pending profiles to the database in one transaction
+        """
+
+        with self._lock:
+            db = self._get_db()
+            if self._pending or self._deleted:
+                with db:
+                    db.executemany(
+                        "DELETE FROM profile WHERE key = ?",
+                        [(x,) for x in self._deleted],
+                    )
+                    db.executemany(
+                        "INSERT OR REPLACE INTO profile (key, data) VALUES (?, ?)",
+                        [(x, dump_navigator(y)) for x, y in self._pending.items()],
+                    )
+                self._pending.clear()
+                self._deleted.clear()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self.flush()
+                self._db.close()
+                self._db = None
@@ -0,0 +1,260 @@
+"""
+Consistency checks of navigator configs
+
+    >>> from user_agent.validate import validate_navigators
+    >>> for nav, errors in validate_navigators(records):
+    ...     if errors:
+    ...         print(nav["user_agent"], errors)
+
+Config is valid if `generate_navigator` could generate it with the
+current tables: browser version and build id are rendered from an entry
+of the version table, app fields match the version, the user agent has
+the structure of the version's template (USER_AGENT_TEMPLATE) with
+the same app components, the system part of the user agent is one of
+systems of the config variant (platform and cpu from OS_PLATFORM and
+OS_CPU, Mac minor version from MACOSX_CHROME_BUILD_RANGE, Android device
+supporting the Android version), platform and oscpu belong to the same
+system and app_version is built from them as `build_navigator_app_version`
+does.
+
+Rules are compiled once per config variant: templates become regular
+expressions, all systems of the variant are indexed by their user agent
+part. Checking a config is a few dict lookups and one regular
+expression match.
+"""
+import re
+
+import six
+
+from . import base
+from .writer import parse_template
+
+__all__ = ("validate_navigators", "validate_navigator", "VariantValidator")
+
+FIELDS = (
+    "os_id",
+    "navigator_id",
+    "platform",
+    "oscpu",
+    "build_version",
+    "build_id",
+    "app_version",
+    "app_name",
+    "app_code_name",
+    "product",
+    "product_sub",
+    "vendor",
+    "vendor_sub",
+    "user_agent",
+)
+CONSTANT_FIELDS = (
+    ("app_code_name", "Mozilla"),
+    ("product", "Gecko"),
+    ("vendor_sub", ""),
+)
+# (app component, config field)
+APP_FIELDS = (
+    ("name", "app_name"),
+    ("product_sub", "product_sub"),
+    ("vendor", "vendor"),
+)
+
+
+def compile_template(template):
+    """
+    Return regular expression matching user agents of template, every
+    field becomes a group named like "system_ua_platform"
+    """
+
+    parts = []
+    seen = set()
+    for literal, field in parse_template(template):
+        parts.append(re.escape(literal))
+        if field is not None:
+            name = "%s_%s" % field
+            if name in seen:
+                parts.append("(?P=%s)" % name)
+            else:
+                seen.add(name)
+                parts.append("(?P<%s>.+?)" % name)
+    return re.compile("".join(parts) + r"\Z")
+
+
+class VariantValidator(object):
+    """
+    Checks configs against rules of one `base.VariantEngine`
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        templates = sorted(set(engine.templates))
+        self.patterns = [compile_template(x) for x in templates]
+        self.pattern_ids = [templates.index(x) for x in engine.templates]
+        # {ua_platform: {(platform, oscpu): position of platform}}
+        self.systems = {}
+        for platform in range(len(engine.platforms)):
+            if engine.minor_ranges is not None:
+                details = range(*engine.minor_ranges[platform])
+            elif engine.devices is not None:
+                details = range(len(engine.devices[platform]))
+            else:
+                details = (0,)
+            for cpu in range(len(engine.cpus)):
+                for detail in details:
+                    system = engine.get_system(platform, cpu, detail)
+                    self.systems.setdefault(system["ua_platform"], {})[
+                        (system["platform"], system["oscpu"])
+                    ] = platform
+
+    def validate(self, nav):
+        """
+        Return list of errors of config, empty if it is valid
+        """
+
+        engine = self.engine
+        errors = []
+        build_version = nav["build_version"]
+        build_id = nav["build_id"]
+        build = engine.versions.parse(build_version, build_id)
+        if build is not None and engine.versions.render(*build) != (
+            build_version,
+            build_id,
+        ):
+            build = None
+        app = None
+        if build is None:
+            errors.append(
+                "build_version %r with build_id %r is not a known %s version"
+                % (build_version, build_id, engine.navigator_id)
+            )
+            patterns = self.patterns
+        else:
+            app = engine.get_app(*build)
+            for key, field in APP_FIELDS:
+                if nav[field] != app[key]:
+                    errors.append(
+                        "%s %r does not match %s %s, expected %r"
+                        % (
+                            field,
+                            nav[field],
+                            engine.navigator_id,
+                            build_version,
+                            app[key],
+                        )
+                    )
+            patterns = (self.patterns[self.pattern_ids[build[0]]],)
+
+        user_agent = nav["user_agent"]
+        for pattern in patterns:
+            match = pattern.match(user_agent)
+            if match is not None:
+                break
+        else:
+            errors.append("user_agent does not match template of the version")
+            return errors
+        groups = match.groupdict()
+        if app is not None:
+            for name, value in groups.items():
+                if name.startswith("app_") and value != app[name[4:]]:
+                    errors.append(
+                        "user_agent has %s %r, expected %r"
+                        % (name[4:], value, app[name[4:]])
+                    )
+        ua_platform = groups["system_ua_platform"]
+        systems = self.systems.get(ua_platform)
+        if systems is None:
+            errors.append("user_agent has unknown system %r" % ua_platform)
+            return errors
+        platform = systems.get((nav["platform"], nav["oscpu"]))
+        if platform is None:
+            errors.append(
+                "platform %r and oscpu %r do not match system %r of user_agent"
+                % (nav["platform"], nav["oscpu"], ua_platform)
+            )
+        elif nav["app_version"] != engine.get_app_version(platform, user_agent):
+            errors.append(
+                "app_version %r does not match user_agent" % nav["app_version"]
+            )
+        return errors
+
+
+# (engines, {(os_id, navigator_id): [VariantValidator]})
+_VALIDATORS = (None, None)
+
+
+def get_validators():
+    """
+    Return validators of all config variants by (os_id, navigator_id),
+    rebuilt when tables are replaced
+    """
+
+    global _VALIDATORS # pylint: disable=global-statement
+    engines, validators = _VALIDATORS
+    current = base.get_engines()
+    if engines is not current:
+        validators = {}
+        for (_, os_id, navigator_id), engine in sorted(current.items()):
+            validators.setdefault((os_id, navigator_id), []).append(
+                VariantValidator(engine)
+            )
+        _VALIDATORS = (current, validators)
+    return validators
+
+
+def check_navigator(validators, nav):
+    try:
+        missing = [x for x in FIELDS if x not in nav]
+    except TypeError:
+        return ["config is not a dict"]
+    if missing:
+        return ["missing fields: %s" % ", ".join(missing)]
+    invalid = [
+        x
+        for x in FIELDS
+        if nav[x] is not None and not isinstance(nav[x], six.string_types)
+    ]
+    if invalid or nav["user_agent"] is None:
+        return ["fields are not strings: %s" % ", ".join(invalid or ["user_agent"])]
+    errors = []
+    for field, value in CONSTANT_FIELDS:
+        if nav[field] != value:
+            errors.append("%s %r is not %r" % (field, nav[field], value))
+    try:
+        candidates = validators[(nav["os_id"], nav["navigator_id"])]
+    except (KeyError, TypeError):
+        errors.append(
+            "unknown os_id %r with navigator_id %r"
+            % (nav["os_id"], nav["navigator_id"])
+        )
+        return errors
+    best = None
+    for validator in candidates:
+        res = validator.validate(nav)
+        if not res:
+            return errors
+        if best is None or len(res) < len(best):
+            best = res
+    return errors + best
+
+
+def validate_navigator(nav):
+    """
+    Return list of errors of config in `generate_navigator` format,
+    empty if it is valid
+    """
+
+    return check_navigator(get_validators(), nav)
+
+
+def validate_navigators(navs):
+    """
+    Check configs in `generate_navigator` format
+
+    :param navs: iterable of configs
+    :return: iterator over (config, list of errors) pairs in the order
+        of `navs`, list of errors is empty for valid config
+    """
+
+    validators = get_validators()
+    for nav in navs:
+        yield nav, check_navigator(validators, nav)
@@ -0,0 +1,170 @@
+"""
+Bulk output of user agents as bytes
+
+    >>> from user_agent.writer import write_user_agents
+    >>> with open("agents.txt", "wb") as out:
+    ...     write_user_agents(out, 10 ** 6, os="win")
+
+User agents are rendered from positions drawn by `base.draw_configs`
+without building configs: every template of `USER_AGENT_TEMPLATE` is
+compiled into a bytes %-format, system components (the same for many
+configs) are substituted into it once and cached, app components are
+encoded once per browser version. Rendering one user agent is a single
+bytes formatting operation, results are collected in a `bytearray`
+which is flushed to the output in large chunks.
+
+Configs written this way are not counted by `user_agent.metrics`.
+"""
+from string import Formatter
+import random
+import weakref
+
+from . import base
+
+__all__ = ("write_user_agents", "BytesRenderer")
+
+FLUSH_SIZE = 1 << 20
+BATCH_SIZE = 1000
+SYSTEM_FIELDS = ("platform", "ua_platform", "oscpu", "platform_version")
+
+
+def parse_template(template):
+    """
+    Return list of (literal text, field) pairs of format string, field
+    is a tuple (component, key) like ("system", "ua_platform") or None
+    """
+
+    res = []
+    for literal, field, _, _ in Formatter().parse(template):
+        if field is not None:
+            component, key = field.rstrip("]").split("[")
+            field = (component, key)
+        res.append((literal, field))
+    return res
+
+
+def escape(value):
+    return value.encode("utf-8").replace(b"%", b"%%")
+
+
+class BytesRenderer(object):
+    """
+    Renders user agents of one `base.VariantEngine` from drawn positions
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        # Chrome build versions have random part, others do not
+        self.static_versions = not isinstance(engine.versions, base.ChromeVersions)
+        templates = sorted(set(engine.templates))
+        self.parsed = [parse_template(x) for x in templates]
+        self.template_ids = [templates.index(x) for x in engine.templates]
+        self.app_keys = [
+            tuple(f[1] for _, f in x if f is not None and f[0] == "app")
+            for x in self.parsed
+        ]
+        self._formats = {}
+        self._apps = {}
+
+    def get_format(self, template_id, platform, cpu, detail):
+        key = (template_id, platform, cpu, detail)
+        try:
+            return self._formats[key]
+        except KeyError:
+            pass
+        system = self.engine.get_system(platform, cpu, detail)
+        parts = []
+        for literal, field in self.parsed[template_id]:
+            parts.append(escape(literal))
+            if field is not None:
+                if field[0] == "system":
+                    parts.append(escape(system[field[1]]))
+                else:
+                    parts.append(b"%s")
+        fmt = self._formats[key] = b"".join(parts)
+        return fmt
+
+    def get_app_values(self, build, build_detail):
+        if self.static_versions:
+            try:
+                return self._apps[build]
+            except KeyError:
+                pass
+        app = self.engine.get_app(build, build_detail)
+        values = tuple(
+            app[x].encode("utf-8") for x in self.app_keys[self.template_ids[build]]
+        )
+        if self.static_versions:
+            self._apps[build] = values
+        return values
+
+    def render(self, platform, cpu, detail, build, build_detail):
+        """
+        Return user agent as bytes, see `base.VariantEngine.render`
+        """
+
+        fmt = self.get_format(self.template_ids[build], platform, cpu, detail)
+        return fmt % self.get_app_values(build, build_detail)
+
+
+# {VariantEngine: BytesRenderer}, engines are dropped on tables reload
+_RENDERERS = weakref.WeakKeyDictionary()
+
+
+def get_renderer(engine):
+    try:
+        return _RENDERERS[engine]
+    except KeyError:
+        renderer = _RENDERERS[engine] = BytesRenderer(engine)
+        return renderer
+
+
+def write_user_agents(
+    out, n, sep=b"\n", rng=None, flush_size=FLUSH_SIZE, **filters
+):
+    """
+    Generate `n` user agents and write them as UTF-8 bytes each followed
+    by `sep`
+
+    :param out: bytearray which user agents are appended to or binary
+        file-like object with `write` method
+    :param rng: source of randomness, `user_agent.bulkrand.BulkRandom`
+        draws batches faster, the `random` module by default
+    :param flush_size: write to `out` when this number of bytes
+        is collected
+    :param filters: options of `generate_navigator`
+    :return: number of written bytes
+    :raises InvalidOption: if filters are invalid
+    """
+
+    if rng is None:
+        rng = random
+    spec = base.compile_filters(**filters)
+    if isinstance(out, bytearray):
+        buf = out
+        start = len(out)
+    else:
+        buf = bytearray()
+        start = 0
+    written = 0
+    renderers = {}
+    for offset in range(0, n, BATCH_SIZE):
+        for engine, positions in base.draw_configs(
+            spec, min(BATCH_SIZE, n - offset), rng
+        ):
+            try:
+                render = renderers[engine]
+            except KeyError:
+                render = renderers[engine] = get_renderer(engine).render
+            buf += render(*positions)
+            buf += sep
+        if buf is not out and len(buf) >= flush_size:
+            out.write(buf)
+            written += len(buf)
+            del buf[:]
+    if buf is out:
+        return len(out) - start
+    if buf:
+        out.write(buf)
+        written += len(buf)
+    return written